@@ -0,0 +1,409 @@
+"""
+Benchmarks the parsing and writing of RenderWare4 files outside Blender, using synthetic models of increasing size.
+Every benchmark also checks that reading and writing the data again gives exactly the same bytes.
+
+	python __benchmark_rw4.py --sizes 1000 10000 100000 --json results.json
+	python __benchmark_rw4.py --baseline results.json
+
+With --baseline, the results are compared against a previous run, and the script fails if any benchmark got
+slower than the tolerance. This needs the 'numpy' and 'mathutils' packages; it is not included in releases.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import types
+
+if not __package__:
+	# Load the add-on folder as a package without executing its __init__.py, which needs Blender
+	__package__ = "sporemodder"
+	if __package__ not in sys.modules:
+		_package = types.ModuleType(__package__)
+		_package.__path__ = [os.path.dirname(os.path.abspath(__file__))]
+		sys.modules[__package__] = _package
+
+import numpy as np
+from mathutils import Matrix, Quaternion, Vector
+from . import rw4_base, rw4_enums, rw4_kdtree
+from .file_io import ArrayFileReader, ArrayFileWriter
+
+SHAPE_COUNT = 4
+BONE_COUNT = 64
+KEYFRAME_COUNT = 120
+
+
+def create_vertex_description(render_ware):
+	"""Creates the same vertex format used by the exporter for skinned meshes."""
+	description = rw4_base.VertexDescription(render_ware)
+	elements = (
+		(rw4_enums.D3DDECLTYPE_FLOAT3, rw4_enums.D3DDECLUSAGE_POSITION, rw4_enums.RWDECL_POSITION, 12),
+		(rw4_enums.D3DDECLTYPE_UBYTE4, rw4_enums.D3DDECLUSAGE_NORMAL, rw4_enums.RWDECL_NORMAL, 4),
+		(rw4_enums.D3DDECLTYPE_UBYTE4, rw4_enums.D3DDECLUSAGE_TANGENT, rw4_enums.RWDECL_TANGENT, 4),
+		(rw4_enums.D3DDECLTYPE_FLOAT2, rw4_enums.D3DDECLUSAGE_TEXCOORD, rw4_enums.RWDECL_TEXCOORD0, 8),
+		(rw4_enums.D3DDECLTYPE_UBYTE4, rw4_enums.D3DDECLUSAGE_BLENDINDICES, rw4_enums.RWDECL_BLENDINDICES, 4),
+		(rw4_enums.D3DDECLTYPE_UBYTE4N, rw4_enums.D3DDECLUSAGE_BLENDWEIGHT, rw4_enums.RWDECL_BLENDWEIGHTS, 4),
+	)
+	offset = 0
+	for element_type, usage, rw_decl, size in elements:
+		description.vertex_elements.append(rw4_enums.VertexElement(
+			stream=0, offset=offset, element_type=element_type, method=rw4_enums.D3DDECLMETHOD_DEFAULT,
+			usage=usage, usage_index=0, rw_decl=rw_decl))
+		offset += size
+
+	description.vertex_size = offset
+	description.field_14 = 0x51010101
+	description.vertex_class = rw4_enums.create_rw_vertex_class(description.vertex_elements)
+	return description
+
+
+def create_grid(vertex_count, rng):
+	"""
+	:returns: A tuple (positions, triangles) of a bumpy grid with approximately `vertex_count` vertices.
+	"""
+	side = max(2, int(round(np.sqrt(vertex_count))))
+	x, y = np.meshgrid(np.linspace(-1.0, 1.0, side), np.linspace(-1.0, 1.0, side))
+	z = 0.1 * rng.standard_normal(x.shape)
+	positions = np.column_stack((x.ravel(), y.ravel(), z.ravel())).astype(np.float32)
+
+	corners = (np.arange(side - 1)[:, None] * side + np.arange(side - 1)[None, :]).ravel()
+	triangles = np.concatenate((
+		np.column_stack((corners, corners + 1, corners + side)),
+		np.column_stack((corners + 1, corners + side + 1, corners + side)),
+	)).astype(np.int32)
+	return positions, triangles
+
+
+def create_skeleton(render_ware, rng):
+	skeleton = rw4_base.Skeleton(render_ware, skeleton_id=0x12345678)
+	skin_matrix_buffer = rw4_base.SkinMatrixBuffer(render_ware)
+	animation_skin = rw4_base.AnimationSkin(render_ware)
+
+	for i in range(BONE_COUNT):
+		if i == 0:
+			bone = rw4_base.SkeletonBone(i, rw4_base.SkeletonBone.TYPE_ROOT, None)
+		else:
+			flags = rw4_base.SkeletonBone.TYPE_LEAF if i == BONE_COUNT - 1 else rw4_base.SkeletonBone.TYPE_BRANCH
+			bone = rw4_base.SkeletonBone(i, flags, skeleton.bones[-1])
+		skeleton.bones.append(bone)
+
+		skin_matrix_buffer.data.append(Matrix.Identity(4))
+		animation_skin.data.append(rw4_base.AnimationSkin.BonePose(
+			matrix=Matrix.Identity(3), translation=Vector(rng.standard_normal(3).tolist())))
+
+	skins_ink = rw4_base.SkinsInK(render_ware, skin_matrix_buffer=skin_matrix_buffer, skeleton=skeleton,
+								  animation_skin=animation_skin)
+	for obj in (skin_matrix_buffer, skeleton, animation_skin, skins_ink):
+		render_ware.add_object(obj)
+
+
+def create_keyframe_anim(render_ware, rng):
+	keyframe_anim = rw4_base.KeyframeAnim(render_ware, skeleton_id=0x12345678,
+										  length=(KEYFRAME_COUNT - 1) / rw4_base.KeyframeAnim.FPS)
+	keyframe_anim.flags = 3
+	for i in range(BONE_COUNT):
+		channel = rw4_base.AnimationChannel(rw4_base.LocRotScaleKeyframe)
+		channel.channel_id = i
+		for k in range(KEYFRAME_COUNT):
+			keyframe = channel.new_keyframe(k / rw4_base.KeyframeAnim.FPS)
+			keyframe.rot = Quaternion(rng.standard_normal(4).tolist()).normalized()
+			keyframe.loc = Vector(rng.standard_normal(3).tolist())
+			keyframe.scale = Vector(rng.uniform(0.5, 2.0, 3).tolist())
+		keyframe_anim.channels.append(channel)
+	return keyframe_anim
+
+
+def create_model(vertex_count, seed=0):
+	"""
+	Creates a RenderWare4 model with a vertex and index buffer, a skeleton, a bounding box and a KD-tree.
+	:returns: A tuple (render_ware, vertex_count, triangle_count).
+	"""
+	rng = np.random.default_rng(seed)
+	render_ware = rw4_base.RenderWare4()
+	render_ware.header.rw_type_code = rw4_enums.RW_MODEL
+
+	positions, triangles = create_grid(vertex_count, rng)
+	vertex_count = len(positions)
+
+	description = create_vertex_description(render_ware)
+	vertices = np.zeros(vertex_count, dtype=rw4_enums.create_rw_vertex_dtype(
+		description.vertex_elements, description.vertex_size))
+	vertices['position'] = positions
+	vertices['normal'] = rng.integers(0, 256, (vertex_count, 4))
+	vertices['tangent'] = rng.integers(0, 256, (vertex_count, 4))
+	vertices['texcoord0'] = rng.random((vertex_count, 2))
+	vertices['blendIndices'] = rng.integers(0, BONE_COUNT, (vertex_count, 4)) * 3
+	vertices['blendWeights'] = rng.integers(0, 256, (vertex_count, 4))
+
+	vertex_buffer = rw4_base.VertexBuffer(
+		render_ware, vertex_description=description, vertex_count=vertex_count, field_10=8,
+		vertex_size=description.vertex_size)
+	vertex_buffer.vertex_data = rw4_base.BaseResource(render_ware, data=vertices.tobytes())
+
+	index_buffer = rw4_base.IndexBuffer(
+		render_ware, primitive_count=triangles.size,
+		index_format=rw4_enums.D3DFMT_INDEX16 if vertex_count <= 0xFFFF else rw4_enums.D3DFMT_INDEX32)
+	index_dtype = '<u2' if index_buffer.format == rw4_enums.D3DFMT_INDEX16 else '<u4'
+	index_buffer.index_data = rw4_base.BaseResource(render_ware, data=triangles.astype(index_dtype).tobytes())
+
+	mesh = rw4_base.Mesh(render_ware, primitive_type=4, index_buffer=index_buffer, triangle_count=len(triangles),
+						 primitive_count=triangles.size, vertex_count=vertex_count)
+	mesh.vertex_buffers.append(vertex_buffer)
+
+	for obj in (description, vertex_buffer, vertex_buffer.vertex_data, index_buffer, index_buffer.index_data, mesh):
+		render_ware.add_object(obj)
+
+	create_skeleton(render_ware, rng)
+
+	bound_box = rw4_base.BoundingBox(
+		render_ware, bound_box=[positions.min(axis=0).tolist(), positions.max(axis=0).tolist()])
+	render_ware.add_object(bound_box)
+
+	kdtree = rw4_base.TriangleKDTreeProcedural(render_ware)
+	kdtree_vertices = np.zeros((vertex_count, 4), dtype=np.float32)
+	kdtree_vertices[:, :3] = positions
+	kdtree_triangles = np.zeros((len(triangles), 4), dtype=np.int32)
+	kdtree_triangles[:, :3] = triangles
+	order, kdtree.unknown_data = rw4_kdtree.build_kdtree(kdtree_vertices, kdtree_triangles)
+	kdtree.vertices = kdtree_vertices
+	kdtree.triangles = kdtree_triangles[order]
+	kdtree.triangle_unknowns = (rng.integers(0, 6, len(triangles)) * 2 + 1).astype(np.uint8)
+	kdtree.bound_box = bound_box
+	kdtree.bound_box_2 = bound_box
+	render_ware.add_object(kdtree)
+
+	return render_ware, vertex_count, len(triangles)
+
+
+def create_blend_shape_buffer(vertex_count, seed=0):
+	rng = np.random.default_rng(seed)
+	render_ware = rw4_base.RenderWare4()
+	buffer = rw4_base.BlendShapeBuffer(render_ware, shape_count=SHAPE_COUNT, vertex_count=vertex_count)
+	buffer.bone_indices_count = 4
+
+	data = ArrayFileWriter()
+	for index in (rw4_base.BlendShapeBuffer.INDEX_POSITION, rw4_base.BlendShapeBuffer.INDEX_NORMAL,
+				  rw4_base.BlendShapeBuffer.INDEX_TANGENT):
+		buffer.offsets[index] = data.tell()
+		block = np.zeros((SHAPE_COUNT + 1, vertex_count, 4), dtype=np.float32)
+		block[..., :3] = rng.standard_normal((SHAPE_COUNT + 1, vertex_count, 3))
+		data.write_array(block, '<f4')
+
+	buffer.offsets[rw4_base.BlendShapeBuffer.INDEX_TEXCOORD] = data.tell()
+	texcoords = np.zeros((vertex_count, 4), dtype='<u4')
+	texcoords[:, :2] = rng.random((vertex_count, 2)).astype('<f4').view('<u4')
+	texcoords[:, 3] = 1
+	data.write_array(texcoords, '<u4')
+
+	buffer.offsets[rw4_base.BlendShapeBuffer.INDEX_BLENDINDICES] = data.tell()
+	data.write_array(rng.integers(0, BONE_COUNT, (vertex_count, 4)), '<u2')
+	buffer.offsets[rw4_base.BlendShapeBuffer.INDEX_BLENDWEIGHTS] = data.tell()
+	data.write_array(rng.random((vertex_count, 4)), '<f4')
+
+	buffer.data = bytes(data.buffer)
+	render_ware.add_object(buffer)
+	return buffer
+
+
+def write_object(obj):
+	stream = ArrayFileWriter()
+	obj.write(stream)
+	return bytes(stream.buffer)
+
+
+def read_object(cls, data):
+	"""Reads an object alone from its own data, as if it was the only section of a file."""
+	obj = cls(rw4_base.RenderWare4())
+	obj.section_info = rw4_base.RWSectionInfo(obj.render_ware, data_size=len(data))
+	obj.read(ArrayFileReader(data, zero_copy=True))
+	return obj
+
+
+def write_render_ware(render_ware):
+	stream = ArrayFileWriter()
+	render_ware.write(stream)
+	# RenderWare4.write() adds the type codes every time it's called
+	render_ware.header.section_types.type_codes.clear()
+	return bytes(stream.buffer)
+
+
+def read_render_ware(data):
+	render_ware = rw4_base.RenderWare4()
+	render_ware.read(ArrayFileReader(data, zero_copy=True))
+	return render_ware
+
+
+def measure(function, repeat):
+	"""
+	Calls the function several times.
+	:returns: A tuple (best time in seconds, result of the last call).
+	"""
+	best_time = float('inf')
+	result = None
+	for _ in range(repeat):
+		start_time = time.perf_counter()
+		result = function()
+		best_time = min(best_time, time.perf_counter() - start_time)
+	return best_time, result
+
+
+def run_benchmarks(size, repeat):
+	"""
+	Runs all the benchmarks for a model with approximately `size` vertices.
+	:returns: A list of result dictionaries.
+	"""
+	results = []
+
+	def add_result(name, seconds, byte_count=None, item_count=None, item_name=None, round_trip=None):
+		result = {'name': name, 'size': size, 'seconds': seconds}
+		if byte_count is not None:
+			result['bytes'] = byte_count
+			result['mb_per_second'] = byte_count / seconds / 1e6 if seconds > 0 else float('inf')
+		if item_count is not None:
+			result[item_name] = item_count
+			result[f'{item_name}_per_second'] = item_count / seconds if seconds > 0 else float('inf')
+		if round_trip is not None:
+			result['round_trip'] = round_trip
+		results.append(result)
+
+	render_ware, vertex_count, triangle_count = create_model(size)
+
+	seconds, data = measure(lambda: write_render_ware(render_ware), repeat)
+	add_result("RenderWare4.write", seconds, byte_count=len(data))
+
+	seconds, read_back = measure(lambda: read_render_ware(data), repeat)
+	add_result("RenderWare4.read", seconds, byte_count=len(data),
+			   round_trip=write_render_ware(read_back) == data)
+
+	vertex_buffer = read_back.get_objects(rw4_base.VertexBuffer.type_code)[0]
+	vertex_bytes = vertex_count * vertex_buffer.vertex_size
+	# The per-vertex decoding is much slower, so it only runs once
+	seconds, _ = measure(lambda: vertex_buffer.process_data(None), 1)
+	add_result("VertexBuffer.process_data", seconds, byte_count=vertex_bytes,
+			   item_count=vertex_count, item_name='vertices')
+
+	def process_vertex_arrays():
+		arrays = vertex_buffer.process_data_arrays(None)
+		# Make a copy, like the importer does, so that the time includes the decoding itself
+		return {name: np.array(values) for name, values in arrays.items()}
+
+	seconds, arrays = measure(process_vertex_arrays, repeat)
+	original_vertices = render_ware.get_objects(rw4_base.VertexBuffer.type_code)[0].vertex_data.data
+	dtype = rw4_enums.create_rw_vertex_dtype(vertex_buffer.vertex_description.vertex_elements, vertex_buffer.vertex_size)
+	rebuilt = np.zeros(vertex_count, dtype=dtype)
+	for name, values in arrays.items():
+		rebuilt[name] = values
+	add_result("VertexBuffer.process_data_arrays", seconds, byte_count=vertex_bytes,
+			   item_count=vertex_count, item_name='vertices', round_trip=rebuilt.tobytes() == bytes(original_vertices))
+
+	index_buffer = read_back.get_objects(rw4_base.IndexBuffer.type_code)[0]
+	seconds, indices = measure(lambda: np.array(index_buffer.process_data(None)), repeat)
+	original_indices = render_ware.get_objects(rw4_base.IndexBuffer.type_code)[0].index_data.data
+	add_result("IndexBuffer.process_data", seconds, byte_count=len(original_indices),
+			   item_count=triangle_count * 3, item_name='indices',
+			   round_trip=indices.astype(indices.dtype.newbyteorder('<')).tobytes() == bytes(original_indices))
+
+	kdtree = render_ware.get_objects(rw4_base.TriangleKDTreeProcedural.type_code)[0]
+	seconds, _ = measure(lambda: rw4_kdtree.build_kdtree(kdtree.vertices, kdtree.triangles), 1)
+	add_result("rw4_kdtree.build_kdtree", seconds, item_count=triangle_count, item_name='triangles')
+
+	kdtree_data = write_object(kdtree)
+	seconds, kdtree_read = measure(lambda: read_object(rw4_base.TriangleKDTreeProcedural, kdtree_data), repeat)
+	add_result("TriangleKDTreeProcedural.read", seconds, byte_count=len(kdtree_data),
+			   round_trip=write_object(kdtree_read) == kdtree_data)
+
+	blend_shape_buffer = create_blend_shape_buffer(vertex_count)
+	blend_shape_data = write_object(blend_shape_buffer)
+	seconds, buffer_read = measure(lambda: read_object(rw4_base.BlendShapeBuffer, blend_shape_data), repeat)
+	add_result("BlendShapeBuffer.read", seconds, byte_count=len(blend_shape_data),
+			   round_trip=write_object(buffer_read) == blend_shape_data)
+
+	seconds, _ = measure(lambda: [buffer_read.get_shape_vectors(i).copy() for i in range(3)], repeat)
+	add_result("BlendShapeBuffer.get_shape_vectors", seconds, byte_count=3 * (SHAPE_COUNT + 1) * vertex_count * 16,
+			   item_count=(SHAPE_COUNT + 1) * vertex_count, item_name='vertices')
+
+	return results
+
+
+def run_animation_benchmarks(repeat):
+	keyframe_anim = create_keyframe_anim(rw4_base.RenderWare4(), np.random.default_rng(0))
+	keyframe_count = BONE_COUNT * KEYFRAME_COUNT
+	results = []
+
+	seconds, data = measure(lambda: write_object(keyframe_anim), repeat)
+	results.append({'name': "KeyframeAnim.write", 'size': keyframe_count, 'seconds': seconds, 'bytes': len(data),
+					'mb_per_second': len(data) / seconds / 1e6, 'keyframes_per_second': keyframe_count / seconds})
+
+	seconds, anim_read = measure(lambda: read_object(rw4_base.KeyframeAnim, data), repeat)
+	results.append({'name': "KeyframeAnim.read", 'size': keyframe_count, 'seconds': seconds, 'bytes': len(data),
+					'mb_per_second': len(data) / seconds / 1e6, 'keyframes_per_second': keyframe_count / seconds,
+					'round_trip': write_object(anim_read) == data})
+	return results
+
+
+def compare_with_baseline(results, baseline, tolerance):
+	"""
+	:returns: A list of messages describing the benchmarks that are slower than in the baseline.
+	"""
+	previous = {(result['name'], result['size']): result['seconds'] for result in baseline}
+	regressions = []
+	for result in results:
+		old_seconds = previous.get((result['name'], result['size']))
+		if old_seconds is not None and result['seconds'] > old_seconds * (1.0 + tolerance):
+			regressions.append(f"{result['name']} (size {result['size']}): "
+							   f"{old_seconds * 1000:.2f} ms -> {result['seconds'] * 1000:.2f} ms")
+	return regressions
+
+
+def print_results(results):
+	print(f"{'Benchmark':38} {'Size':>8} {'Time (ms)':>11} {'MB/s':>9} {'Items/s':>12}  Round trip")
+	for result in results:
+		mb_per_second = result.get('mb_per_second')
+		items_per_second = next((value for key, value in result.items()
+								 if key.endswith('_per_second') and key != 'mb_per_second'), None)
+		round_trip = result.get('round_trip')
+		print(f"{result['name']:38} {result['size']:>8} {result['seconds'] * 1000:>11.2f} "
+			  f"{'' if mb_per_second is None else f'{mb_per_second:.1f}':>9} "
+			  f"{'' if items_per_second is None else f'{items_per_second:.0f}':>12}  "
+			  f"{'' if round_trip is None else ('ok' if round_trip else 'FAILED')}")
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Benchmark the RenderWare4 parsing and writing code.")
+	parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 60000],
+						help="The approximate vertex counts of the synthetic models.")
+	parser.add_argument('--repeat', type=int, default=5, help="How many times each benchmark runs; the best is kept.")
+	parser.add_argument('--json', help="Write the results to this JSON file.")
+	parser.add_argument('--baseline', help="A JSON file from a previous run to compare against.")
+	parser.add_argument('--tolerance', type=float, default=0.25,
+						help="How much slower a benchmark can be than the baseline, as a fraction.")
+	args = parser.parse_args()
+
+	results = []
+	for size in args.sizes:
+		results.extend(run_benchmarks(size, args.repeat))
+	results.extend(run_animation_benchmarks(args.repeat))
+
+	print_results(results)
+
+	if args.json:
+		with open(args.json, 'w') as file:
+			json.dump(results, file, indent=4)
+
+	failed = [result['name'] for result in results if result.get('round_trip') is False]
+	if failed:
+		print(f"Round trip failed: {', '.join(failed)}")
+
+	regressions = []
+	if args.baseline:
+		with open(args.baseline) as file:
+			regressions = compare_with_baseline(results, json.load(file), args.tolerance)
+		for regression in regressions:
+			print(f"Slower than baseline: {regression}")
+
+	return 1 if failed or regressions else 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -3,7 +3,7 @@ import zipfile
 
 def create_zip():
 	blender_version = 4
-	blacklist = {".git", ".vscode", "__pycache__", "userscripts", "sporemodder-blender-addons_updater"}
+	blacklist = {".git", ".vscode", "__pycache__", "tests", "userscripts", "sporemodder-blender-addons_updater"}
 
 	script_path = os.path.abspath(__file__)
 	script_dir = os.path.dirname(script_path)
@@ -28,8 +28,8 @@ def create_zip():
 			dirs[:] = [d for d in dirs if d not in blacklist]
 
 			for file in files:
-				if file in {script_name, zip_filename}:
-					continue  # skip this script and the zip being written
+				if file in {script_name, zip_filename, "__benchmark_rw4.py"}:
+					continue  # skip the development scripts and the zip being written
 
 				file_path = os.path.join(root, file)
 				rel_path = os.path.relpath(file_path, script_dir)
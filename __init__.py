@@ -186,6 +186,27 @@ class ExportRW4(bpy.types.Operator, ExportHelper):
 		default=False
 	)
 
+	# Take shape key normals from the evaluated mesh, as older versions did; only used to compare results
+	evaluated_shape_normals: bpy.props.BoolProperty(
+		name="Evaluated Shape Normals",
+		description="Calculate shape key normals by evaluating the mesh once per shape key (slower)",
+		default=False,
+		options={'HIDDEN'}
+	)
+
+	# Measure how long every stage of the export takes
+	profile_export: bpy.props.BoolProperty(
+		name="Profile Export",
+		description="Measure the time of every export stage, and save the report as a .profile.json file next to the model",
+		default=False
+	)
+
+	profile_python: bpy.props.BoolProperty(
+		name="Use cProfile",
+		description="Also profile every Python function called during the export (slower)",
+		default=False
+	)
+
 	def invoke(self, context, event):
 		self.filepath = mod_paths.get_export_path(file = bpy.data.filepath, ext = self.filename_ext)
 		context.window_manager.fileselect_add(self)
@@ -193,15 +214,40 @@ class ExportRW4(bpy.types.Operator, ExportHelper):
 
 	def execute(self, context):
 		from .rw4_exporter import export_rw4
-
-		with open(self.filepath, 'bw') as file:
-			mod_paths.set_export_path(self.filepath)
-			return export_rw4(file, self.export_symmetric, self.export_as_lod1)
+		from .export_profiler import ExportProfiler, get_report_path
+
+		profiler = None
+		if self.profile_export:
+			profiler = ExportProfiler(use_cprofile=self.profile_python)
+			profiler.start()
+
+		try:
+			with open(self.filepath, 'bw') as file:
+				mod_paths.set_export_path(self.filepath)
+				result = export_rw4(file, self.export_symmetric, self.export_as_lod1, self.evaluated_shape_normals,
+									profiler=profiler)
+		finally:
+			# Stop cProfile even if the export fails, so it does not keep profiling Blender
+			if profiler is not None:
+				profiler.stop()
+
+		if profiler is not None:
+			report_path = get_report_path(self.filepath)
+			profiler.write_json(report_path)
+			for line in profiler.get_summary():
+				self.report({'INFO'}, line)
+			self.report({'INFO'}, f"Export profile saved to {report_path}")
+
+		return result
 
 	def draw(self, context):
 		layout = self.layout
 		layout.prop(self, "export_symmetric")
 		layout.prop(self, "export_as_lod1")
+		layout.prop(self, "profile_export")
+		row = layout.row()
+		row.enabled = self.profile_export
+		row.prop(self, "profile_python")
 
 """
 class ImportAnim(bpy.types.Operator, ImportHelper):
@@ -429,7 +475,9 @@ def register():
 def unregister():
 	addon_updater_ops.unregister()
 
-	from . import rw4_material_config, rw4_animation_config, anim_bone_config
+	from . import rw4_material_config, rw4_animation_config, anim_bone_config, texture_cache
+
+	texture_cache.texture_cache.clear()
 
 	rw4_material_config.unregister()
 	rw4_animation_config.unregister()
@@ -1,6 +1,6 @@
 import bpy
 import mathutils
-from . import anim_bone_config, mod_paths
+from . import anim_bone_config, mod_paths, pose_sampler
 from .message_box import show_message_box
 
 def requirements_to_string(item):
@@ -201,19 +201,19 @@ def info_keyframe_to_string(t, events, event_names, info_flags):
 	return text
 
 
-def get_position(armature_matrix, channel, bone, secondary_reference_bone):
-	bone_pos = armature_matrix @ bone.head
+def get_position(armature_matrix, channel, bone, bone_matrix, secondary_reference_bone, secondary_matrix):
+	bone_pos = armature_matrix @ bone_matrix.to_translation()
 	rest_pos = armature_matrix @ bone.bone.head_local
 	basis_matrix = mathutils.Matrix.Identity(3)
 	
 	if secondary_reference_bone is not None:
 		# Build a change of basis matrix for the secondary coordinate system
 		# X is direction towards secondary, Y is same as secondary Y, Z is perpendicular to both
-		secondary_pos = armature_matrix @ secondary_reference_bone.head
+		secondary_pos = armature_matrix @ secondary_matrix.to_translation()
 		#secondary_bone_matrix = armature_matrix @ secondary_reference_bone.matrix
 		secondary_X = secondary_pos - rest_pos
 		#secondary_Y = secondary_bone_matrix @ mathutils.Vector((0, 1, 0))
-		secondary_Y = secondary_reference_bone.y_axis
+		secondary_Y = secondary_matrix.to_3x3() @ mathutils.Vector((0.0, 1.0, 0.0))
 		secondary_Z = secondary_X.cross(secondary_Y)
 		basis_matrix = mathutils.Matrix([secondary_X, secondary_Y, secondary_Z]).transposed()
 		print("Basis matrix")
@@ -235,8 +235,8 @@ def get_position(armature_matrix, channel, bone, secondary_reference_bone):
 	return basis_matrix @ pos
 
 
-def get_rotation(armature_matrix, channel, bone):
-	bone_matrix = armature_matrix @ bone.matrix
+def get_rotation(armature_matrix, channel, bone, bone_matrix):
+	bone_matrix = armature_matrix @ bone_matrix
 	if channel.relative_rot:
 		rest_matrix = armature_matrix @ bone.bone.matrix_local
 		bone_matrix = bone_matrix @ rest_matrix.inverted()
@@ -278,15 +278,19 @@ class AnimChannelOutput:
 			return bone_query[0]
 		return None
 
-	def add_position_keyframe(self):
-		pos = get_position(self.armature_object.matrix_world, self.channel, self.bone, self.secondary_reference_bone)
+	def add_position_keyframe(self, pose_matrices):
+		secondary_matrix = None
+		if self.secondary_reference_bone is not None:
+			secondary_matrix = pose_matrices[self.secondary_reference_bone.name]
+		pos = get_position(self.armature_object.matrix_world, self.channel, self.bone, pose_matrices[self.bone.name],
+						   self.secondary_reference_bone, secondary_matrix)
 		text = f"\t\t({pos.x}, {pos.y}, {pos.z})"
 		if self.channel.position_weight != 1.0:
 			text += f" {self.channel.position_weight}"
 		self.position_text += text + "\n"
 
-	def add_rotation_keyframe(self):
-		rot = get_rotation(self.armature_object.matrix_world, self.channel, self.bone)
+	def add_rotation_keyframe(self, pose_matrices):
+		rot = get_rotation(self.armature_object.matrix_world, self.channel, self.bone, pose_matrices[self.bone.name])
 		text = f"\t\t({rot.x}, {rot.y}, {rot.z}, {rot.w})"
 		if self.channel.rotation_weight != 1.0:
 			text += f" {self.channel.rotation_weight}"
@@ -358,12 +362,13 @@ def export_anim(file):
 		channels_output.append(AnimChannelOutput(armature_object, channel, bone, events, channel_times, anim_names))
 
 	times = sorted(set(times))
-	for t in times:
-		scene.frame_set(t)
+	# Rigblock values and flags are animated by the armature data action, which needs the scene to be updated
+	use_fcurves = deforms_action is None or not deforms_action.fcurves
+	for t, pose_matrices in pose_sampler.sample_pose_matrices(armature_object, bones_action, times, use_fcurves):
 		for c in channels_output:
 			if c.has_time(t):
-				c.add_position_keyframe()
-				c.add_rotation_keyframe()
+				c.add_position_keyframe(pose_matrices)
+				c.add_rotation_keyframe(pose_matrices)
 				c.add_rigblock_keyframe()
 				c.channel_info_flags.append(c.channel.keyframe_info_flags)
 
@@ -0,0 +1,311 @@
+"""
+Exports many .blend files to RenderWare4 models in parallel, using a pool of background Blender processes.
+This can be run from the command line with any Python 3 interpreter, Blender is not needed to run it:
+
+	python batch_export.py --blender path/to/blender -j 8 --output-dir models --report summary.json parts/*.blend
+
+Every .blend file is exported in its own 'blender -b' process, which must have this add-on installed.
+The name of the installed add-on is found automatically; use --addon to choose it if several versions are installed.
+By default the active collection of every file is exported, named after the file; use --collection to export
+specific collections, or --each-collection to export every top-level collection of the scene, named after them.
+The summary report contains the warnings and the time of every export.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# The name of the add-on package inside Blender, or None when this runs as a script
+ADDON_PACKAGE = __package__ or None
+
+# Printed by Blender before the name of every installed add-on that contains this module
+ADDON_PACKAGE_PREFIX = "RW4_BATCH_ADDON="
+
+
+def get_output_path(blend_file, collection_name, output_dir):
+	"""
+	:returns: The path of the .rw4 file exported from the given collection, or from the active one if it is None.
+	"""
+	if output_dir is None:
+		output_dir = os.path.dirname(os.path.abspath(blend_file))
+	if collection_name is None:
+		name = os.path.splitext(os.path.basename(blend_file))[0]
+	else:
+		name = collection_name
+	return os.path.join(output_dir, name + ".rw4")
+
+
+def find_layer_collection(layer_collection, name):
+	if layer_collection.collection.name == name:
+		return layer_collection
+	for child in layer_collection.children:
+		found = find_layer_collection(child, name)
+		if found is not None:
+			return found
+	return None
+
+
+def export_collections(blend_file, collection_names, output_dir, export_symmetric, export_as_lod1):
+	"""
+	Exports collections of the currently open .blend file. This must run inside Blender.
+	:param collection_names: A list of collection names; None exports the active collection.
+	:returns: A list with the result of every export.
+	"""
+	import bpy
+	from . import rw4_exporter
+
+	results = []
+	for name in collection_names:
+		output_path = get_output_path(blend_file, name, output_dir)
+		result = {
+			'blend_file': blend_file,
+			'collection': name,
+			'output': output_path,
+			'status': 'failed',
+			'warnings': [],
+			'error': None,
+		}
+		warnings = set()
+		start_time = time.perf_counter()
+
+		try:
+			if name is not None:
+				layer_collection = find_layer_collection(bpy.context.view_layer.layer_collection, name)
+				if layer_collection is None:
+					raise ValueError(f"Collection '{name}' does not exist")
+				bpy.context.view_layer.active_layer_collection = layer_collection
+
+			with open(output_path, 'wb') as file:
+				status = rw4_exporter.export_rw4(file, export_symmetric, export_as_lod1, warnings=warnings)
+
+			result['status'] = 'finished' if 'FINISHED' in status else 'cancelled'
+		except Exception:
+			result['error'] = traceback.format_exc()
+
+		if result['status'] != 'finished' and os.path.exists(output_path):
+			os.remove(output_path)
+
+		result['warnings'] = sorted(warnings)
+		result['time'] = time.perf_counter() - start_time
+		results.append(result)
+
+	return results
+
+
+def run_worker():
+	"""
+	The entry point of the background Blender processes; the arguments are the ones after '--'.
+	"""
+	import bpy
+
+	parser = argparse.ArgumentParser(prog="batch_export worker")
+	parser.add_argument('--result', required=True)
+	parser.add_argument('--output-dir')
+	parser.add_argument('--collection', action='append', default=[])
+	parser.add_argument('--each-collection', action='store_true')
+	parser.add_argument('--symmetric', action='store_true')
+	parser.add_argument('--lod1', action='store_true')
+	args = parser.parse_args(sys.argv[sys.argv.index('--') + 1:])
+
+	if args.each_collection:
+		collection_names = [collection.name for collection in bpy.context.scene.collection.children]
+	elif args.collection:
+		collection_names = args.collection
+	else:
+		collection_names = [None]
+
+	results = export_collections(bpy.data.filepath, collection_names, args.output_dir, args.symmetric, args.lod1)
+
+	with open(args.result, 'w') as file:
+		json.dump(results, file)
+
+
+def find_addon_package(blender_path, timeout=60):
+	"""
+	Finds the name of the installed add-on that contains this module, which is the name of the folder or zip it
+	was installed from (or 'bl_ext.<repository>.<name>' for extensions).
+	:raises RuntimeError: If the add-on is not installed, or if several versions are.
+	:returns: The name of the add-on package.
+	"""
+	expression = (
+		"import addon_utils, os\n"
+		"for module in addon_utils.modules():\n"
+		"\tif os.path.isfile(os.path.join(os.path.dirname(module.__file__), 'batch_export.py')):\n"
+		f"\t\tprint('{ADDON_PACKAGE_PREFIX}' + module.__name__)\n"
+	)
+	try:
+		process = subprocess.run([blender_path, '-b', '--python-exit-code', '1', '--python-expr', expression],
+								 stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, timeout=timeout)
+	except (OSError, subprocess.TimeoutExpired) as e:
+		raise RuntimeError(f"Could not run Blender to find the add-on: {e}")
+
+	packages = [line[len(ADDON_PACKAGE_PREFIX):].strip() for line in process.stdout.splitlines()
+				if line.startswith(ADDON_PACKAGE_PREFIX)]
+	if not packages:
+		raise RuntimeError(f"The SporeModder add-on is not installed in '{blender_path}'. "
+						   f"Install it, or use --addon with the name of the add-on package.")
+	if len(packages) > 1:
+		raise RuntimeError(f"Several versions of the SporeModder add-on are installed ({', '.join(packages)}). "
+						   f"Use --addon to choose one.")
+	return packages[0]
+
+
+def run_job(blender_path, blend_file, worker_args, addon, timeout):
+	"""
+	Exports a .blend file in a background Blender process.
+	:returns: A dictionary with the results of the job.
+	"""
+	fd, result_path = tempfile.mkstemp(suffix=".json", prefix="rw4_batch_")
+	os.close(fd)
+
+	expression = f"import importlib; importlib.import_module('{addon}.batch_export').run_worker()"
+	command = [
+		blender_path, '-b', '--addons', addon, blend_file,
+		'--python-exit-code', '1', '--python-expr', expression,
+		'--', '--result', result_path, *worker_args
+	]
+
+	job = {'blend_file': blend_file, 'exports': [], 'error': None}
+	start_time = time.perf_counter()
+	try:
+		process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+								 timeout=timeout)
+		job['return_code'] = process.returncode
+
+		with open(result_path) as file:
+			contents = file.read()
+		if contents:
+			job['exports'] = json.loads(contents)
+		else:
+			# The worker didn't get to write the results; keep the end of the log to know why
+			job['error'] = process.stdout[-4000:]
+
+	except subprocess.TimeoutExpired:
+		job['return_code'] = None
+		job['error'] = f"Timed out after {timeout} seconds"
+	except (OSError, ValueError) as e:
+		# Blender could not be started, or the results are not valid JSON; the other jobs must still run
+		job.setdefault('return_code', None)
+		job['error'] = f"{type(e).__name__}: {e}"
+	finally:
+		os.remove(result_path)
+
+	job['time'] = time.perf_counter() - start_time
+	return job
+
+
+def run_batch(blend_files, blender_path, output_dir=None, collections=(), each_collection=False,
+			  export_symmetric=False, export_as_lod1=False, max_workers=None, addon=ADDON_PACKAGE, timeout=None,
+			  progress=None):
+	"""
+	Exports several .blend files at the same time, each one in a background Blender process.
+
+	:param blend_files: The list of .blend files to export.
+	:param blender_path: The path to the Blender executable.
+	:param output_dir: The folder where models are exported; by default, the folder of every .blend file.
+	:param collections: The names of the collections to export from every file; by default, the active one.
+	:param each_collection: If True, every top-level collection of the scene is exported as a separate model.
+	:param export_symmetric: Also export a mirrored variant of every model.
+	:param export_as_lod1: Export the models without morphs.
+	:param max_workers: The maximum number of Blender processes running at the same time; by default, the CPU count.
+	:param addon: The name of the add-on package in Blender; by default, it's found with find_addon_package().
+	:param timeout: The maximum number of seconds that the export of a single file can take.
+	:param progress: A function called with the results of every job when it finishes.
+	:raises RuntimeError: If the add-on package is not given and it cannot be found.
+	:returns: A dictionary with the summary of the export, including the results of every job.
+	"""
+	if addon is None:
+		addon = find_addon_package(blender_path)
+
+	blend_files = [os.path.abspath(blend_file) for blend_file in blend_files]
+	worker_args = []
+	if output_dir is not None:
+		os.makedirs(output_dir, exist_ok=True)
+		worker_args += ['--output-dir', os.path.abspath(output_dir)]
+	for collection in collections:
+		worker_args += ['--collection', collection]
+	if each_collection:
+		worker_args.append('--each-collection')
+	if export_symmetric:
+		worker_args.append('--symmetric')
+	if export_as_lod1:
+		worker_args.append('--lod1')
+
+	start_time = time.perf_counter()
+	jobs = []
+	with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+		futures = [
+			executor.submit(run_job, blender_path, blend_file, worker_args, addon, timeout)
+			for blend_file in blend_files
+		]
+		for future in as_completed(futures):
+			job = future.result()
+			jobs.append(job)
+			if progress is not None:
+				progress(job)
+
+	file_order = {blend_file: i for i, blend_file in enumerate(blend_files)}
+	jobs.sort(key=lambda job: file_order[job['blend_file']])
+	exports = [export for job in jobs for export in job['exports']]
+	return {
+		'total_time': time.perf_counter() - start_time,
+		'files': len(jobs),
+		'exported': sum(1 for export in exports if export['status'] == 'finished'),
+		'failed': sum(1 for job in jobs if job['error'] is not None) +
+				  sum(1 for export in exports if export['status'] != 'finished'),
+		'warnings': sum(len(export['warnings']) for export in exports),
+		'jobs': jobs,
+	}
+
+
+def print_job(job):
+	if job['error'] is not None:
+		print(f"FAILED   {job['blend_file']} ({job['time']:.1f}s)")
+	for export in job['exports']:
+		print(f"{export['status'].upper():8} {export['output']} ({export['time']:.1f}s, {len(export['warnings'])} warnings)")
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Export .blend files to RenderWare4 models in parallel.")
+	parser.add_argument('blend_files', nargs='+', help="The .blend files to export.")
+	parser.add_argument('--blender', default="blender", help="The path to the Blender executable.")
+	parser.add_argument('-j', '--jobs', type=int, default=None, help="The number of Blender processes to use.")
+	parser.add_argument('-o', '--output-dir', help="The folder where models are exported.")
+	parser.add_argument('--collection', action='append', default=[], help="The name of a collection to export.")
+	parser.add_argument('--each-collection', action='store_true',
+						help="Export every top-level collection as a separate model.")
+	parser.add_argument('--symmetric', action='store_true', help="Also export a mirrored variant of every model.")
+	parser.add_argument('--lod1', action='store_true', help="Export the models without morphs.")
+	parser.add_argument('--addon', default=ADDON_PACKAGE,
+						help="The name of the add-on package in Blender; by default, the installed one is found.")
+	parser.add_argument('--timeout', type=float, default=None, help="The maximum time to export a file, in seconds.")
+	parser.add_argument('--report', help="Write a JSON summary report to this file.")
+	args = parser.parse_args()
+
+	try:
+		summary = run_batch(
+			args.blend_files, args.blender,
+			output_dir=args.output_dir, collections=args.collection, each_collection=args.each_collection,
+			export_symmetric=args.symmetric, export_as_lod1=args.lod1, max_workers=args.jobs, addon=args.addon,
+			timeout=args.timeout, progress=print_job)
+	except RuntimeError as e:
+		parser.error(str(e))
+
+	print(f"Exported {summary['exported']} models in {summary['total_time']:.1f}s, "
+		  f"{summary['failed']} failed, {summary['warnings']} warnings.")
+
+	if args.report:
+		with open(args.report, 'w') as file:
+			json.dump(summary, file, indent=4)
+
+	return 1 if summary['failed'] else 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+Optional instrumentation for the RW4 exporter. It measures the time of every stage of an export, for every
+object and action, counts the exported vertices and triangles, and can run cProfile around the whole export.
+When it is disabled, stages are not measured, so the exporter can always use it.
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import time
+from contextlib import contextmanager
+
+
+def get_report_path(export_path):
+	"""
+	:returns: The path of the JSON report for the given exported file, next to it.
+	"""
+	return os.path.splitext(export_path)[0] + ".profile.json"
+
+
+class ExportProfiler:
+	def __init__(self, enabled=True, use_cprofile=False, cprofile_limit=50):
+		"""
+		:param enabled: If False, nothing is measured.
+		:param use_cprofile: If True, cProfile runs between start() and stop().
+		:param cprofile_limit: How many functions from cProfile are included in the report.
+		"""
+		self.enabled = enabled
+		self.use_cprofile = enabled and use_cprofile
+		self.cprofile_limit = cprofile_limit
+		# One dictionary per measured stage, in the order they finished
+		self.stages = []
+		# Totals of exported elements, such as 'vertices' or 'triangles'
+		self.counts = {}
+		self.total_time = 0.0
+		self._start_time = None
+		self._profile = None
+
+	def start(self):
+		if not self.enabled:
+			return
+		self._start_time = time.perf_counter()
+		if self.use_cprofile:
+			self._profile = cProfile.Profile()
+			self._profile.enable()
+
+	def stop(self):
+		if not self.enabled or self._start_time is None:
+			return
+		if self._profile is not None:
+			self._profile.disable()
+		self.total_time = time.perf_counter() - self._start_time
+		self._start_time = None
+
+	@contextmanager
+	def stage(self, name, target=None):
+		"""
+		Measures the time of a block of code. Numbers can be added to the returned dictionary:
+
+			with profiler.stage('process_mesh', obj.name) as record:
+				record['vertices'] = ...
+
+		:param name: The name of the stage, usually the function being measured.
+		:param target: The name of the object or action being exported, or None.
+		"""
+		if not self.enabled:
+			yield {}
+			return
+
+		record = {'stage': name, 'target': target}
+		start_time = time.perf_counter()
+		try:
+			yield record
+		finally:
+			record['seconds'] = time.perf_counter() - start_time
+			self.stages.append(record)
+
+	def count(self, name, value):
+		"""Adds `value` to the total count of `name`, such as the number of exported vertices."""
+		if self.enabled:
+			self.counts[name] = self.counts.get(name, 0) + value
+
+	def get_stage_totals(self):
+		"""
+		:returns: A dictionary that maps every stage name to its number of calls and total time,
+		sorted from the slowest stage.
+		"""
+		totals = {}
+		for record in self.stages:
+			total = totals.setdefault(record['stage'], {'calls': 0, 'seconds': 0.0})
+			total['calls'] += 1
+			total['seconds'] += record['seconds']
+		return dict(sorted(totals.items(), key=lambda item: item[1]['seconds'], reverse=True))
+
+	def get_cprofile_functions(self):
+		"""
+		:returns: A list with the functions that took the most cumulative time according to cProfile.
+		"""
+		if self._profile is None:
+			return []
+
+		stats = pstats.Stats(self._profile).stats
+		functions = []
+		for (file_name, line, function_name), (_, call_count, own_time, cumulative_time, _) in stats.items():
+			functions.append({
+				'function': f"{function_name} ({os.path.basename(file_name)}:{line})",
+				'calls': call_count,
+				'own_seconds': own_time,
+				'cumulative_seconds': cumulative_time,
+			})
+		functions.sort(key=lambda function: function['cumulative_seconds'], reverse=True)
+		return functions[:self.cprofile_limit]
+
+	def get_report(self):
+		return {
+			'total_time': self.total_time,
+			'counts': self.counts,
+			'stage_totals': self.get_stage_totals(),
+			'stages': self.stages,
+			'cprofile': self.get_cprofile_functions(),
+		}
+
+	def get_summary(self, stage_count=5):
+		"""
+		:returns: A list of lines that summarize the report, with the slowest stages.
+		"""
+		counts = ", ".join(f"{value} {name}" for name, value in self.counts.items())
+		lines = [f"Export took {self.total_time:.2f}s" + (f" ({counts})" if counts else "")]
+		for name, total in list(self.get_stage_totals().items())[:stage_count]:
+			lines.append(f"{name}: {total['seconds']:.2f}s in {total['calls']} calls")
+		return lines
+
+	def write_json(self, path):
+		with open(path, 'w') as file:
+			json.dump(self.get_report(), file, indent=4)
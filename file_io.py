@@ -1,4 +1,102 @@
+import os
 import struct
+import sys
+from collections import namedtuple
+import numpy as np
+
+
+# Precompiled structs for the basic types, by endianness and type code
+_BASIC_STRUCTS = {endian: {code: struct.Struct(endian + code) for code in 'bBhHiIfd?'} for endian in '<>=!@'}
+_STRUCTS = {}
+
+
+def get_struct(fmt):
+	"""Returns a precompiled struct.Struct for the given format string, which must include the endianness."""
+	compiled = _STRUCTS.get(fmt)
+	if compiled is None:
+		compiled = _STRUCTS[fmt] = struct.Struct(fmt)
+	return compiled
+
+
+# A range of bytes of a file on disk, which writers copy directly from the file instead of loading it in memory
+FileRange = namedtuple('FileRange', ('path', 'offset', 'size'))
+
+# The size of the blocks used to copy file ranges when the operating system cannot copy them directly
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def read_file_range(file_range):
+	"""
+	:returns: The bytes of the file range.
+	"""
+	with open(file_range.path, 'rb') as file:
+		file.seek(file_range.offset)
+		data = file.read(file_range.size)
+	if len(data) != file_range.size:
+		raise IOError(f"'{file_range.path}' is smaller than expected, it might have been modified")
+	return data
+
+
+def check_file_range(file_range):
+	"""
+	Checks that the file of a range still contains all its bytes.
+	:raises IOError: If the file is smaller than the end of the range.
+	"""
+	if os.stat(file_range.path).st_size < file_range.offset + file_range.size:
+		raise IOError(f"'{file_range.path}' is smaller than expected, it might have been modified")
+
+
+def _copy_with_system_calls(src_fd, dst_fd, offset, size):
+	"""
+	Copies bytes between two file descriptors without passing them through Python, writing them at the current
+	position of the destination.
+	:returns: The number of bytes copied, which is less than `size` if the system calls are not supported.
+	"""
+	copied = 0
+	try:
+		while copied < size:
+			if hasattr(os, 'copy_file_range'):
+				count = os.copy_file_range(src_fd, dst_fd, size - copied, offset + copied)
+			elif sys.platform.startswith('linux'):
+				count = os.sendfile(dst_fd, src_fd, offset + copied, size - copied)
+			else:
+				break
+			if count == 0:
+				break
+			copied += count
+	except OSError:
+		# For example, copy_file_range between different file systems in older kernels; the rest is copied in chunks
+		pass
+	return copied
+
+
+def copy_file_range_to(file_range, dst):
+	"""
+	Copies a file range into a binary file object without loading the whole range in memory. If the destination
+	is a file on disk, the operating system copies the data directly when possible; otherwise it's copied in chunks.
+	"""
+	with open(file_range.path, 'rb') as src:
+		copied = 0
+		try:
+			dst_fd = dst.fileno()
+		except (AttributeError, OSError):
+			dst_fd = None
+
+		if dst_fd is not None:
+			dst.flush()
+			start = dst.tell()
+			copied = _copy_with_system_calls(src.fileno(), dst_fd, file_range.offset, file_range.size)
+			# The file object does not know that the position has changed
+			dst.seek(start + copied)
+
+		src.seek(file_range.offset + copied)
+		remaining = file_range.size - copied
+		while remaining > 0:
+			chunk = src.read(min(COPY_CHUNK_SIZE, remaining))
+			if not chunk:
+				raise IOError(f"'{file_range.path}' is smaller than expected, it might have been modified")
+			dst.write(chunk)
+			remaining -= len(chunk)
 
 
 class FileReader:
@@ -9,35 +107,43 @@ class FileReader:
 		return len(self.buffer)
 
 	def read_byte(self, endian='<'):
-		return struct.unpack(endian + 'b', self.buffer.read(1))[0]
+		return _BASIC_STRUCTS[endian]['b'].unpack(self.buffer.read(1))[0]
 
 	def read_ubyte(self, endian='<'):
-		return struct.unpack(endian + 'B', self.buffer.read(1))[0]
+		return _BASIC_STRUCTS[endian]['B'].unpack(self.buffer.read(1))[0]
 
 	def read_short(self, endian='<'):
-		return struct.unpack(endian + 'h', self.buffer.read(2))[0]
+		return _BASIC_STRUCTS[endian]['h'].unpack(self.buffer.read(2))[0]
 
 	def read_ushort(self, endian='<'):
-		return struct.unpack(endian + 'H', self.buffer.read(2))[0]
+		return _BASIC_STRUCTS[endian]['H'].unpack(self.buffer.read(2))[0]
 
 	def read_int(self, endian='<'):
-		return struct.unpack(endian + 'i', self.buffer.read(4))[0]
+		return _BASIC_STRUCTS[endian]['i'].unpack(self.buffer.read(4))[0]
 
 	def read_uint(self, endian='<'):
-		return struct.unpack(endian + 'I', self.buffer.read(4))[0]
+		return _BASIC_STRUCTS[endian]['I'].unpack(self.buffer.read(4))[0]
 
 	def read_float(self, endian='<'):
-		return struct.unpack(endian + 'f', self.buffer.read(4))[0]
+		return _BASIC_STRUCTS[endian]['f'].unpack(self.buffer.read(4))[0]
 
 	def read_double(self, endian='<'):
-		return struct.unpack(endian + 'd', self.buffer.read(8))[0]
+		return _BASIC_STRUCTS[endian]['d'].unpack(self.buffer.read(8))[0]
 
 	def read_boolean(self, endian='<'):
-		return struct.unpack(endian + '?', self.buffer.read(1))[0]
+		return _BASIC_STRUCTS[endian]['?'].unpack(self.buffer.read(1))[0]
 
 	def read(self, n):
 		return self.buffer.read(n)
 
+	def read_array(self, dtype, count):
+		"""
+		Reads `count` consecutive values of the given NumPy dtype. Use explicit endianness in the dtype, like '<u2'.
+		The returned array might be read-only.
+		"""
+		dtype = np.dtype(dtype)
+		return np.frombuffer(self.buffer.read(dtype.itemsize * count), dtype=dtype, count=count)
+
 	def seek(self, offset):
 		self.buffer.seek(offset)
 
@@ -45,49 +151,61 @@ class FileReader:
 		self.buffer.seek(n_bytes, 1)
 
 	def unpack(self, fmt):
-		size = struct.calcsize(fmt)
-		return struct.unpack(fmt, self.buffer.read(size))
+		compiled = get_struct(fmt)
+		return compiled.unpack(self.buffer.read(compiled.size))
 
 	def tell(self):
 		return self.buffer.tell()
 
 
 class ArrayFileReader(FileReader):
-	def __init__(self, data):
+	def __init__(self, data, zero_copy=False):
+		"""
+		:param data: The bytes-like object to read from.
+		:param zero_copy: If True, the data is wrapped in a memoryview, and read() returns views of it instead of copies.
+		The views keep the data alive, and they must not be modified.
+		"""
+		if zero_copy:
+			data = memoryview(data).cast('B')
 		super(ArrayFileReader, self).__init__(data)
 		self.offset = 0
+		self.zero_copy = zero_copy
 
 	def read_byte(self, endian='<'):
 		self.offset += 1
-		return struct.unpack_from(endian + 'b', self.buffer, self.offset - 1)[0]
+		return _BASIC_STRUCTS[endian]['b'].unpack_from(self.buffer, self.offset - 1)[0]
 
 	def read_ubyte(self, endian='<'):
 		self.offset += 1
-		return struct.unpack_from(endian + 'B', self.buffer, self.offset - 1)[0]
+		return _BASIC_STRUCTS[endian]['B'].unpack_from(self.buffer, self.offset - 1)[0]
 
 	def read_short(self, endian='<'):
 		self.offset += 2
-		return struct.unpack_from(endian + 'h', self.buffer, self.offset - 2)[0]
+		return _BASIC_STRUCTS[endian]['h'].unpack_from(self.buffer, self.offset - 2)[0]
 
 	def read_ushort(self, endian='<'):
 		self.offset += 2
-		return struct.unpack_from(endian + 'H', self.buffer, self.offset - 2)[0]
+		return _BASIC_STRUCTS[endian]['H'].unpack_from(self.buffer, self.offset - 2)[0]
 
 	def read_int(self, endian='<'):
 		self.offset += 4
-		return struct.unpack_from(endian + 'i', self.buffer, self.offset - 4)[0]
+		return _BASIC_STRUCTS[endian]['i'].unpack_from(self.buffer, self.offset - 4)[0]
 
 	def read_uint(self, endian='<'):
 		self.offset += 4
-		return struct.unpack_from(endian + 'I', self.buffer, self.offset - 4)[0]
+		return _BASIC_STRUCTS[endian]['I'].unpack_from(self.buffer, self.offset - 4)[0]
 
 	def read_float(self, endian='<'):
 		self.offset += 4
-		return struct.unpack_from(endian + 'f', self.buffer, self.offset - 4)[0]
+		return _BASIC_STRUCTS[endian]['f'].unpack_from(self.buffer, self.offset - 4)[0]
+
+	def read_double(self, endian='<'):
+		self.offset += 8
+		return _BASIC_STRUCTS[endian]['d'].unpack_from(self.buffer, self.offset - 8)[0]
 
 	def read_boolean(self, endian='<'):
 		self.offset += 1
-		return struct.unpack_from(endian + '?', self.buffer, self.offset - 1)[0]
+		return _BASIC_STRUCTS[endian]['?'].unpack_from(self.buffer, self.offset - 1)[0]
 
 	def skip_bytes(self, n_bytes):
 		self.offset += n_bytes
@@ -100,14 +218,33 @@ class ArrayFileReader(FileReader):
 		self.offset += n_bytes
 		return result
 
+	def read_array(self, dtype, count):
+		"""
+		Reads `count` consecutive values of the given NumPy dtype. Use explicit endianness in the dtype, like '<u2'.
+		In zero-copy mode the result is a read-only view of the data, otherwise it is a copy.
+		"""
+		dtype = np.dtype(dtype)
+		result = np.frombuffer(self.buffer, dtype=dtype, count=count, offset=self.offset)
+		self.offset += dtype.itemsize * count
+		return result if self.zero_copy else result.copy()
+
 	def unpack(self, fmt):
-		result = struct.unpack_from(fmt, self.buffer, self.offset)
-		self.offset += struct.calcsize(fmt)
+		compiled = get_struct(fmt)
+		result = compiled.unpack_from(self.buffer, self.offset)
+		self.offset += compiled.size
 		return result
 
 	def tell(self):
 		return self.offset
 
+	def close(self):
+		"""
+		In zero-copy mode, releases the memoryview of the data, so the data (for example, a memory mapping)
+		can be closed once the views returned by read() and read_array() are released too.
+		"""
+		if self.zero_copy:
+			self.buffer.release()
+
 
 class FileWriter:
 	def __init__(self, buffer):
@@ -117,37 +254,47 @@ class FileWriter:
 		return len(self.buffer)
 
 	def write_byte(self, value, endian='<'):
-		self.buffer.write(struct.pack(endian + 'b', value))
+		self.buffer.write(_BASIC_STRUCTS[endian]['b'].pack(value))
 
 	def write_ubyte(self, value, endian='<'):
-		self.buffer.write(struct.pack(endian + 'B', value))
+		self.buffer.write(_BASIC_STRUCTS[endian]['B'].pack(value))
 
 	def write_short(self, value, endian='<'):
-		self.buffer.write(struct.pack(endian + 'h', value))
+		self.buffer.write(_BASIC_STRUCTS[endian]['h'].pack(value))
 
 	def write_ushort(self, value, endian='<'):
-		self.buffer.write(struct.pack(endian + 'H', value))
+		self.buffer.write(_BASIC_STRUCTS[endian]['H'].pack(value))
 
 	def write_int(self, value, endian='<'):
-		self.buffer.write(struct.pack(endian + 'i', value))
+		self.buffer.write(_BASIC_STRUCTS[endian]['i'].pack(value))
 
 	def write_uint(self, value, endian='<'):
-		self.buffer.write(struct.pack(endian + 'I', value))
+		self.buffer.write(_BASIC_STRUCTS[endian]['I'].pack(value))
 
 	def write_float(self, value, endian='<'):
-		self.buffer.write(struct.pack(endian + 'f', value))
+		self.buffer.write(_BASIC_STRUCTS[endian]['f'].pack(value))
 
 	def write_double(self, value, endian='<'):
-		self.buffer.write(struct.pack(endian + 'd', value))
+		self.buffer.write(_BASIC_STRUCTS[endian]['d'].pack(value))
 
 	def write_boolean(self, value, endian='<'):
-		self.buffer.write(struct.pack(endian + '?', value))
+		self.buffer.write(_BASIC_STRUCTS[endian]['?'].pack(value))
 
 	def write(self, array):
 		self.buffer.write(array)
 
+	def write_array(self, values, dtype):
+		"""
+		Writes all the values at once, converted to the given NumPy dtype. Use explicit endianness in the dtype, like '<u2'.
+		"""
+		self.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+
 	def pack(self, fmt, *args):
-		self.buffer.write(struct.pack(fmt, *args))
+		self.buffer.write(get_struct(fmt).pack(*args))
+
+	def write_file_range(self, file_range):
+		"""Writes the bytes of a FileRange, copying them directly from their file."""
+		copy_file_range_to(file_range, self.buffer)
 
 	def tell(self):
 		return self.buffer.tell()
@@ -157,44 +304,146 @@ class FileWriter:
 
 
 class ArrayFileWriter(FileWriter):
-	def __init__(self):
-		super(ArrayFileWriter, self).__init__(bytearray())
+	"""
+	Writes into a growable in-memory buffer. Values are packed in place, and the writer supports seeking back
+	to patch data that was already written, so a whole file can be built in memory and then written at once.
+
+	File ranges are not copied into the buffer: they are only copied from their files by write_to(). Positions
+	(tell() and seek()) include them, but they can only be added at the end of the data.
+	"""
+	def __init__(self, capacity=4096):
+		"""
+		:param capacity: The initial size of the buffer, in bytes. It grows as needed.
+		"""
+		self._buffer = bytearray(capacity)
+		# The position and size in the buffer, not counting the file ranges
+		self.position = 0
+		self.size = 0
+		# A list of (buffer position, file position, FileRange), in order
+		self.file_ranges = []
+		self._file_ranges_size = 0
+		# How many file ranges are before the current position; a range and the data after it have the same
+		# buffer position, so it cannot be known from the position alone
+		self._ranges_before = 0
+
+	@property
+	def buffer(self):
+		"""The written data. This is the internal bytearray, trimmed to the written size, and not a copy."""
+		if self.file_ranges:
+			raise ValueError("The data contains file ranges, use write_to() instead")
+		if len(self._buffer) != self.size:
+			del self._buffer[self.size:]
+		return self._buffer
+
+	def __len__(self):
+		return self.size + self._file_ranges_size
+
+	def write_to(self, file):
+		"""
+		Writes all the data into a binary file object, copying the file ranges from their files.
+		The files of all the ranges are checked before writing anything, so if one of them has become smaller,
+		this raises IOError without leaving a partially written file; a file modified during the write itself
+		can still make it fail halfway.
+		"""
+		for _, _, file_range in self.file_ranges:
+			check_file_range(file_range)
+
+		start = 0
+		view = memoryview(self._buffer)
+		for buffer_position, _, file_range in self.file_ranges:
+			file.write(view[start:buffer_position])
+			copy_file_range_to(file_range, file)
+			start = buffer_position
+		file.write(view[start:self.size])
+
+	def _reserve(self, n_bytes):
+		"""Makes sure there is space for `n_bytes` in the current position, and returns the end position."""
+		end = self.position + n_bytes
+		if self._ranges_before < len(self.file_ranges) and end > self.file_ranges[self._ranges_before][0]:
+			raise ValueError("Cannot write over a file range")
+		if end > len(self._buffer):
+			self._buffer.extend(bytes(max(end, 2 * len(self._buffer)) - len(self._buffer)))
+		return end
+
+	def _advance(self, end):
+		self.position = end
+		if end > self.size:
+			self.size = end
+
+	def _pack(self, compiled, *args):
+		end = self._reserve(compiled.size)
+		compiled.pack_into(self._buffer, self.position, *args)
+		self._advance(end)
 
 	def write_byte(self, value, endian='<'):
-		self.buffer.extend(struct.pack(endian + 'b', value))
+		self._pack(_BASIC_STRUCTS[endian]['b'], value)
 
 	def write_ubyte(self, value, endian='<'):
-		self.buffer.extend(struct.pack(endian + 'B', value))
+		self._pack(_BASIC_STRUCTS[endian]['B'], value)
 
 	def write_short(self, value, endian='<'):
-		self.buffer.extend(struct.pack(endian + 'h', value))
+		self._pack(_BASIC_STRUCTS[endian]['h'], value)
 
 	def write_ushort(self, value, endian='<'):
-		self.buffer.extend(struct.pack(endian + 'H', value))
+		self._pack(_BASIC_STRUCTS[endian]['H'], value)
 
 	def write_int(self, value, endian='<'):
-		self.buffer.extend(struct.pack(endian + 'i', value))
+		self._pack(_BASIC_STRUCTS[endian]['i'], value)
 
 	def write_uint(self, value, endian='<'):
-		self.buffer.extend(struct.pack(endian + 'I', value))
+		self._pack(_BASIC_STRUCTS[endian]['I'], value)
 
 	def write_float(self, value, endian='<'):
-		self.buffer.extend(struct.pack(endian + 'f', value))
+		self._pack(_BASIC_STRUCTS[endian]['f'], value)
+
+	def write_double(self, value, endian='<'):
+		self._pack(_BASIC_STRUCTS[endian]['d'], value)
 
 	def write_boolean(self, value, endian='<'):
-		self.buffer.extend(struct.pack(endian + '?', value))
+		self._pack(_BASIC_STRUCTS[endian]['?'], value)
 
 	def write(self, array):
-		self.buffer.extend(array)
+		array = memoryview(array).cast('B')
+		end = self._reserve(len(array))
+		self._buffer[self.position:end] = array
+		self._advance(end)
+
+	def write_array(self, values, dtype):
+		"""
+		Writes all the values at once, converted to the given NumPy dtype. Use explicit endianness in the dtype, like '<u2'.
+		"""
+		self.write(np.ascontiguousarray(values, dtype=dtype))
 
 	def pack(self, fmt, *args):
-		self.buffer.extend(struct.pack(fmt, *args))
+		self._pack(get_struct(fmt), *args)
+
+	def write_file_range(self, file_range):
+		"""Adds a FileRange at the end of the data; it will be copied from its file when calling write_to()."""
+		if self.position != self.size:
+			raise ValueError("File ranges can only be added at the end of the data")
+		if file_range.size > 0:
+			self.file_ranges.append((self.position, self.tell(), file_range))
+			self._file_ranges_size += file_range.size
+			self._ranges_before = len(self.file_ranges)
 
 	def tell(self):
-		return len(self.buffer)
+		if not self._ranges_before:
+			return self.position
+		return self.position + sum(file_range.size for _, _, file_range in self.file_ranges[:self._ranges_before])
 
 	def seek(self, n):
-		raise NotImplementedError()
+		position = n
+		ranges_before = 0
+		for _, file_position, file_range in self.file_ranges:
+			if n >= file_position + file_range.size:
+				position -= file_range.size
+				ranges_before += 1
+			elif n >= file_position:
+				raise ValueError("Cannot seek inside a file range")
+			else:
+				break
+		self.position = position
+		self._ranges_before = ranges_before
 
 
 class ResourceKey:
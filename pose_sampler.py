@@ -0,0 +1,177 @@
+"""
+Evaluates the pose of an armature directly from the fcurves of an action.
+Calling scene.frame_set() for every sampled frame updates every object of the scene, so exporting an animation
+could take much longer in scenes with other heavy objects; this only evaluates the bones of one armature.
+
+When the armature uses features that this module does not evaluate (bone constraints, drivers, NLA tracks,
+non-default bone inheritance, object transform animation...), sample_pose_matrices() falls back to frame_set().
+"""
+
+import bpy
+from mathutils import Matrix, Quaternion, Euler, Vector
+
+TRANSFORM_PROPERTIES = ('location', 'rotation_quaternion', 'rotation_euler', 'rotation_axis_angle', 'scale')
+
+
+class PoseSampler:
+	def __init__(self, armature_object, action):
+		"""
+		:param armature_object: The Blender armature object.
+		:param action: The action applied to the armature object, or None.
+		"""
+		self.armature_object = armature_object
+		self.action = action
+		# Maps (bone name, property) to a list with the fcurve of every component, or None if it is not animated
+		self.fcurves = {}
+		# The pose bones sorted so that parents come before their children, with their rest matrix
+		# relative to the parent (or to the armature, for root bones)
+		self.bones = []
+
+		self.is_supported = self._can_evaluate_object() and self._collect_fcurves()
+		if self.is_supported:
+			self._sort_bones()
+
+	def _can_evaluate_object(self):
+		animation_data = self.armature_object.animation_data
+		if animation_data is not None:
+			if animation_data.drivers:
+				return False
+			if animation_data.use_nla and any(not track.mute for track in animation_data.nla_tracks):
+				return False
+			# These properties only exist since Blender 2.91; before, the action always replaced the pose
+			if getattr(animation_data, 'action_influence', 1.0) != 1.0 or \
+					getattr(animation_data, 'action_blend_type', 'REPLACE') != 'REPLACE':
+				return False
+
+		if self.armature_object.data.animation_data is not None and self.armature_object.data.animation_data.drivers:
+			return False
+
+		for pose_bone in self.armature_object.pose.bones:
+			bone = pose_bone.bone
+			if pose_bone.constraints:
+				return False
+			if bone.parent is not None and (bone.inherit_scale != 'FULL' or not bone.use_inherit_rotation):
+				return False
+			if not bone.use_local_location or bone.use_relative_parent:
+				return False
+
+		return True
+
+	def _collect_fcurves(self):
+		"""
+		Maps every fcurve of the action to the bone property it animates.
+		:returns: False if the action animates something other than bone transforms.
+		"""
+		if self.action is None:
+			return True
+
+		paths = {}
+		for pose_bone in self.armature_object.pose.bones:
+			for prop in TRANSFORM_PROPERTIES:
+				paths[pose_bone.path_from_id(prop)] = (pose_bone.name, prop)
+
+		for fcurve in self.action.fcurves:
+			if fcurve.mute:
+				continue
+
+			key = paths.get(fcurve.data_path)
+			if key is None:
+				# Blender ignores fcurves whose path does not exist, such as bones that were removed
+				if fcurve.is_valid:
+					return False
+				continue
+
+			if key not in self.fcurves:
+				self.fcurves[key] = [None] * len(getattr(self.armature_object.pose.bones[key[0]], key[1]))
+			self.fcurves[key][fcurve.array_index] = fcurve
+
+		return True
+
+	def _sort_bones(self):
+		def add_bone(pose_bone):
+			bone = pose_bone.bone
+			if bone.parent is None:
+				rest_matrix = bone.matrix_local.copy()
+			else:
+				rest_matrix = bone.parent.matrix_local.inverted() @ bone.matrix_local
+
+			self.bones.append((pose_bone, rest_matrix))
+			for child in pose_bone.children:
+				add_bone(child)
+
+		for pose_bone in self.armature_object.pose.bones:
+			if pose_bone.parent is None:
+				add_bone(pose_bone)
+
+	def _evaluate_property(self, pose_bone, prop, frame):
+		values = list(getattr(pose_bone, prop))
+		fcurves = self.fcurves.get((pose_bone.name, prop))
+		if fcurves is not None:
+			for i, fcurve in enumerate(fcurves):
+				if fcurve is not None:
+					values[i] = fcurve.evaluate(frame)
+		return values
+
+	def get_channel_matrix(self, pose_bone, frame):
+		"""
+		:returns: The transform of the bone relative to its rest pose, the equivalent of pose_bone.matrix_basis
+		(except for the location of connected bones, which Blender ignores).
+		"""
+		if pose_bone.bone.use_connect:
+			# Blender ignores the location of bones connected to their parent
+			location = (0.0, 0.0, 0.0)
+		else:
+			location = self._evaluate_property(pose_bone, 'location', frame)
+		scale = self._evaluate_property(pose_bone, 'scale', frame)
+
+		rotation_mode = pose_bone.rotation_mode
+		if rotation_mode == 'QUATERNION':
+			rotation = Quaternion(self._evaluate_property(pose_bone, 'rotation_quaternion', frame)).normalized().to_matrix()
+		elif rotation_mode == 'AXIS_ANGLE':
+			angle, x, y, z = self._evaluate_property(pose_bone, 'rotation_axis_angle', frame)
+			axis = Vector((x, y, z))
+			rotation = Matrix.Rotation(angle, 3, axis.normalized()) if axis.length > 0.0 else Matrix.Identity(3)
+		else:
+			rotation = Euler(self._evaluate_property(pose_bone, 'rotation_euler', frame), rotation_mode).to_matrix()
+
+		scale_matrix = Matrix.Diagonal(scale)
+		matrix = (rotation @ scale_matrix).to_4x4()
+		matrix.translation = location
+		return matrix
+
+	def evaluate(self, frame):
+		"""
+		:param frame: The frame of the action.
+		:returns: A dictionary that maps the name of every bone to its pose matrix, the equivalent of pose_bone.matrix.
+		"""
+		matrices = {}
+		for pose_bone, rest_matrix in self.bones:
+			matrix = rest_matrix @ self.get_channel_matrix(pose_bone, frame)
+			if pose_bone.parent is not None:
+				matrix = matrices[pose_bone.parent.name] @ matrix
+			matrices[pose_bone.name] = matrix
+
+		return matrices
+
+
+def sample_pose_matrices(armature_object, action, frames, use_fcurves=True):
+	"""
+	Evaluates the pose of the armature at several frames. If the pose cannot be evaluated from the fcurves,
+	this sets the scene frame instead; in that case, the current frame is not restored.
+
+	:param armature_object: The Blender armature object.
+	:param action: The action applied to the armature object, or None.
+	:param frames: The list of frames to sample.
+	:param use_fcurves: If False, always use scene.frame_set(), for example if other animated properties are needed.
+	:returns: An iterator of (frame, matrices) tuples, where `matrices` maps every bone name to its pose matrix.
+	"""
+	sampler = PoseSampler(armature_object, action) if use_fcurves else None
+
+	if sampler is not None and sampler.is_supported:
+		for frame in frames:
+			yield frame, sampler.evaluate(frame)
+	else:
+		scene = bpy.context.scene
+		for frame in frames:
+			scene.frame_set(frame)
+			yield frame, {pose_bone.name: pose_bone.matrix.copy() for pose_bone in armature_object.pose.bones}
@@ -7,10 +7,13 @@ This module contains:
 
 __author__ = 'Eric'
 
-import struct
+import mmap
+import os
+import numpy as np
 from mathutils import Matrix, Vector, Quaternion
 from collections import namedtuple
-from .file_io import FileReader, FileWriter, ArrayFileReader, write_alignment, get_hash
+from contextlib import contextmanager
+from .file_io import FileReader, FileWriter, ArrayFileReader, write_alignment, get_hash, read_file_range, FileRange
 from . import rw4_enums
 
 
@@ -139,6 +142,12 @@ class RenderWare4:
 		self.objects = []
 		self.header = RWHeader(self)
 		self.excluded_types = []
+		# id(object) -> index in self.objects, covering the first self._indexed_objects objects
+		self._object_indices = {}
+		self._indexed_objects = 0
+		# id(object) -> index of its first sub reference, covering the first self._indexed_sub_references ones
+		self._sub_reference_indices = {}
+		self._indexed_sub_references = 0
 
 	def get_objects(self, type_code):
 		return [x for x in self.objects if x is not None and x.type_code == type_code]
@@ -152,7 +161,7 @@ class RenderWare4:
 		elif section_type == INDEX_NO_OBJECT and (index & 0x3FFFF) == 0:
 			return None
 		else:
-			raise NameError("Unsupported index %x" % index)
+			raise ModelError("Unsupported index %x" % index)
 
 	def get_handles(self):
 		return [x for x in self.objects if x is not None and x.type_code == MorphHandle.type_code]
@@ -161,31 +170,66 @@ class RenderWare4:
 		if index_type == INDEX_OBJECT:
 			if rw_object is None:
 				return -1
-			return self.objects.index(rw_object)
+			self._update_object_indices()
+			index = self._object_indices.get(id(rw_object))
+			if index is None or self.objects[index] is not rw_object:
+				# The list was modified in place; this also raises ValueError for objects that are not in the list
+				return self.objects.index(rw_object)
+			return index
 		elif index_type == INDEX_SUB_REFERENCE:
-			index = INDEX_SUB_REFERENCE << 0x16
-			for reference in self.header.section_sub_references.sub_references:
-				if reference.rw_object == rw_object:
-					return index
-				index += 1
-			else:
-				return -1
+			sub_references = self.header.section_sub_references.sub_references
+			self._update_sub_reference_indices()
+			index = self._sub_reference_indices.get(id(rw_object))
+			if index is None or sub_references[index].rw_object is not rw_object:
+				index = next((i for i, reference in enumerate(sub_references) if reference.rw_object == rw_object), None)
+				if index is None:
+					return -1
+			return index | (INDEX_SUB_REFERENCE << 0x16)
 		elif index_type == INDEX_NO_OBJECT and rw_object is None:
 			return INDEX_NO_OBJECT << 0x16
 		else:
 			raise NameError(f"Unsupported get_index for index_type {index_type}")
 
+	def _update_object_indices(self):
+		"""Indexes the objects appended to the list since the last call."""
+		if self._indexed_objects > len(self.objects):
+			self._object_indices.clear()
+			self._indexed_objects = 0
+
+		for i in range(self._indexed_objects, len(self.objects)):
+			if self.objects[i] is not None:
+				self._object_indices.setdefault(id(self.objects[i]), i)
+		self._indexed_objects = len(self.objects)
+
+	def _update_sub_reference_indices(self):
+		"""Indexes the sub references appended to the list since the last call."""
+		sub_references = self.header.section_sub_references.sub_references
+		if self._indexed_sub_references > len(sub_references):
+			self._sub_reference_indices.clear()
+			self._indexed_sub_references = 0
+
+		for i in range(self._indexed_sub_references, len(sub_references)):
+			self._sub_reference_indices.setdefault(id(sub_references[i].rw_object), i)
+		self._indexed_sub_references = len(sub_references)
+
+	def _append_object(self, obj):
+		self.objects.append(obj)
+		if self._indexed_objects == len(self.objects) - 1:
+			if obj is not None:
+				self._object_indices.setdefault(id(obj), self._indexed_objects)
+			self._indexed_objects += 1
+
 	def create_object(self, type_code):
 		"""
 		Creates an instance of an object, whose type depends on the given type code.
 		:param type_code:
 		:return:
 		"""
-		for supportedObject in RWObject.__subclasses__():
-			if supportedObject.type_code == type_code:
-				obj = supportedObject(self)
-				self.objects.append(obj)
-				return obj
+		object_class = get_object_class(type_code)
+		if object_class is not None:
+			obj = object_class(self)
+			self._append_object(obj)
+			return obj
 
 		return None
 
@@ -195,7 +239,7 @@ class RenderWare4:
 		:param obj:
 		:return:
 		"""
-		self.objects.append(obj)
+		self._append_object(obj)
 
 	def add_sub_reference(self, rw_object, offset):
 		"""
@@ -206,8 +250,12 @@ class RenderWare4:
 		self.header.section_sub_references.sub_references.append(reference)
 		return (len(self.header.section_sub_references.sub_references) - 1) | (INDEX_SUB_REFERENCE << 0x16)
 
-	def read(self, file: FileReader):
-
+	def read(self, file: FileReader, lazy_resources=False):
+		"""
+		Reads all the objects of the file, except those whose type is in `excluded_types`.
+		:param file: The reader, positioned at the start of the RW4 data.
+		:param lazy_resources: If True, BaseResource data is not read until it is accessed; the file must stay open.
+		"""
 		self.header.read(file)
 
 		file.seek(self.header.p_section_infos)
@@ -220,12 +268,15 @@ class RenderWare4:
 				obj.section_info = section_info
 			else:
 				# add a None object anyways so indices work correctly
-				self.objects.append(None)
+				self._append_object(None)
 
 		for obj in self.objects:
 			if obj is not None and obj.type_code not in self.excluded_types:
 				self.seek_to_data(file, obj)
-				obj.read(file)
+				if lazy_resources and obj.type_code == BaseResource.type_code:
+					obj.read_lazy(file)
+				else:
+					obj.read(file)
 
 	def write(self, file: FileWriter):
 		# First we need to create the list with all the type_codes
@@ -238,13 +289,17 @@ class RenderWare4:
 		self.header.section_types.type_codes.append(0x10010)
 
 		# We do them in a separate list because apparently they have to be sorted
-		used_type_codes = []
+		used_type_codes = set()
 		for obj in self.objects:
-			if obj.type_code not in used_type_codes and obj.type_code != 0x10030:
-				used_type_codes.append(obj.type_code)
+			if obj.type_code != 0x10030:
+				used_type_codes.add(obj.type_code)
 
 		self.header.section_types.type_codes.extend(sorted(used_type_codes))
 
+		type_code_indices = {}
+		for i, type_code in enumerate(self.header.section_types.type_codes):
+			type_code_indices.setdefault(type_code, i)
+
 		# Now write the header
 		self.header.write(file, 0)
 
@@ -254,7 +309,7 @@ class RenderWare4:
 				self,
 				field_04=0,
 				alignment=obj.alignment,
-				type_code_index=self.header.section_types.type_codes.index(obj.type_code),
+				type_code_index=type_code_indices[obj.type_code],
 				type_code=obj.type_code
 			)
 
@@ -304,6 +359,16 @@ class RenderWare4:
 		file.seek(0)
 		self.header.write(file, buffers_size)
 
+	def detach(self, path=None):
+		"""
+		Copies all the data that is still a view of the file this was read from, so the file can be closed.
+		:param path: The path of the file. If given, the lazy BaseResources that have not been loaded yet are
+		read from it when they are used; otherwise, they are loaded now.
+		"""
+		for obj in self.objects:
+			if obj is not None:
+				obj.detach(path)
+
 	def seek_to_data(self, file, rw_object):
 		if self.header is not None and rw_object is not None and rw_object.section_info is not None:
 			if rw_object.section_info.type_code == BaseResource.type_code:
@@ -312,6 +377,61 @@ class RenderWare4:
 				file.seek(rw_object.section_info.p_data)
 
 
+@contextmanager
+def open_render_ware(file, lazy_resources=True, excluded_types=()):
+	"""
+	Reads a RW4 file by memory-mapping it, so only the parts of the file that are actually used are loaded
+	from disk: inside the `with` block, all the data buffers are zero-copy views of the mapping. On Windows,
+	where mapped files cannot be overwritten, the file is read into memory instead.
+	When the block ends, the data still used by the RenderWare4 is copied (see RenderWare4.detach) and the
+	mapping is closed, so the views obtained from it, like the arrays returned by process_data(), must not
+	be kept after the block.
+	:param file: A binary file object opened for reading.
+	:param lazy_resources: If True, BaseResource data is not read until it is accessed.
+	:param excluded_types: The type codes of the objects that must not be read.
+	:returns: A context manager that gives the RenderWare4 object.
+	"""
+	if os.fstat(file.fileno()).st_size == 0:
+		raise ModelError("The file is empty.")
+
+	if os.name == 'nt':
+		data = file.read()
+	else:
+		data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+	path = file.name if isinstance(file.name, str) else None
+	file_reader = ArrayFileReader(data, zero_copy=True)
+	render_ware = RenderWare4()
+	render_ware.excluded_types.extend(excluded_types)
+	try:
+		render_ware.read(file_reader, lazy_resources=lazy_resources)
+		yield render_ware
+	finally:
+		render_ware.detach(path)
+		try:
+			file_reader.close()
+			if isinstance(data, mmap.mmap):
+				data.close()
+		except BufferError:
+			# Some views are still referenced, for example by the traceback of an error;
+			# the mapping is closed when the last of them is released
+			pass
+
+
+def read_render_ware(file, lazy_resources=True, excluded_types=()):
+	"""
+	Reads a RW4 file with open_render_ware(), so the file is memory-mapped while it's read. The returned object
+	does not depend on the mapping: the lazy BaseResources are read from the file when they are used, so it
+	must not change until then.
+	:param file: A binary file object opened for reading.
+	:param lazy_resources: If True, BaseResource data is not read until it is accessed.
+	:param excluded_types: The type codes of the objects that must not be read.
+	:returns: The RenderWare4 object.
+	"""
+	with open_render_ware(file, lazy_resources, excluded_types) as render_ware:
+		return render_ware
+
+
 class RWSectionInfo:
 	def __init__(self, render_ware: RenderWare4, p_data=0, field_04=0, data_size=0, alignment=0, type_code_index=0,
 				 type_code=0):
@@ -340,6 +460,21 @@ class RWSectionInfo:
 		file.write_int(self.type_code)
 
 
+_object_classes = {}
+
+
+def get_object_class(type_code):
+	"""
+	:returns: The RWObject subclass that handles the given type code, or None if it is not supported.
+	"""
+	object_class = _object_classes.get(type_code)
+	if object_class is None:
+		for supported_object in RWObject.__subclasses__():
+			_object_classes.setdefault(supported_object.type_code, supported_object)
+		object_class = _object_classes.get(type_code)
+	return object_class
+
+
 class RWObject:
 	type_code = 0
 	alignment = 4
@@ -353,6 +488,12 @@ class RWObject:
 
 	def write(self, file: FileWriter):
 		pass
+
+	def detach(self, path=None):
+		"""
+		Copies the data that is still a view of the file this object was read from. See RenderWare4.detach
+		"""
+		pass
 	
 	
 class RWBaseResourceDescriptor:
@@ -535,13 +676,65 @@ class BaseResource(RWObject):
 
 	def __init__(self, render_ware: RenderWare4, data=None):
 		super().__init__(render_ware)
-		self.data = data
+		self._data = data
+		# (file, offset) from where the data will be read the first time it's accessed
+		self._lazy_source = None
+		# A FileRange that is copied directly from its file when writing, unless the data is accessed before
+		self._file_range = None
+
+	@property
+	def data(self):
+		if self._lazy_source is not None:
+			file, offset = self._lazy_source
+			position = file.tell()
+			file.seek(offset)
+			self._data = file.read(self.section_info.data_size)
+			file.seek(position)
+			self._lazy_source = None
+		elif self._file_range is not None:
+			self._data = read_file_range(self._file_range)
+			self._file_range = None
+		return self._data
+
+	@data.setter
+	def data(self, value):
+		self._data = value
+		self._lazy_source = None
+		self._file_range = None
+
+	def set_file_range(self, file_range):
+		"""
+		Uses a range of a file on disk as the data, without loading it in memory. When writing, it's copied
+		directly from the file, so the file must not change until then.
+		:param file_range: The FileRange with the data.
+		"""
+		self._data = None
+		self._lazy_source = None
+		self._file_range = file_range
 
 	def read(self, file: FileReader):
 		self.data = file.read(self.section_info.data_size)
 
+	def read_lazy(self, file: FileReader):
+		"""
+		Remembers the position of the data instead of reading it; it will be read the first time `data`
+		is accessed, so the file must stay open until then.
+		"""
+		self._lazy_source = (file, file.tell())
+
+	def detach(self, path=None):
+		if self._lazy_source is not None and path is not None:
+			self._data = None
+			self._file_range = FileRange(path, self._lazy_source[1], self.section_info.data_size)
+			self._lazy_source = None
+		elif self._file_range is None and self.data is not None:
+			self._data = bytes(self.data)
+
 	def write(self, file: FileWriter):
-		file.write(self.data)
+		if self._file_range is not None:
+			file.write_file_range(self._file_range)
+		else:
+			file.write(self.data)
 
 
 # Used by the ModAPI
@@ -767,6 +960,27 @@ class VertexBuffer(RWObject):
 
 		return vertices
 
+	def process_data_arrays(self, file: FileReader):
+		"""
+		Decodes all the vertices at once, without creating a Python object per vertex.
+		The arrays are views of the vertex data, so they must be copied before being modified.
+		:returns: A dictionary that maps every element name ('position', 'texcoord0',...)
+		to an array of shape (vertex_count, n)
+		"""
+		if self.vertex_description is None:
+			raise ModelError("Cannot process vertices without a vertex description.", self)
+		elif self.vertex_data is None:
+			raise ModelError("Cannot process vertices without a data buffer.", self)
+
+		vertex_size = self.vertex_size if self.vertex_size != 0 else self.vertex_description.vertex_size
+		dtype = rw4_enums.create_rw_vertex_dtype(self.vertex_description.vertex_elements, vertex_size)
+
+		if len(self.vertex_data.data) < dtype.itemsize * self.vertex_count:
+			raise ModelError("The vertex data buffer is smaller than the vertex count.", self)
+
+		vertices = np.frombuffer(self.vertex_data.data, dtype=dtype, count=self.vertex_count)
+		return {name: vertices[name] for name in dtype.names}
+
 	def has_element(self, rw_decl) -> bool:
 		for e in self.vertex_description.vertex_elements:
 			if e.rw_decl == rw_decl:
@@ -809,17 +1023,19 @@ class IndexBuffer(RWObject):
 		file.write_int(self.render_ware.get_index(self.index_data))
 
 	def process_data(self, file: FileReader):
+		"""
+		Decodes the indices of this buffer.
+		:returns: An array of primitive_count indices
+		"""
 		if self.index_data is None:
 			raise ModelError("Cannot process indices without a data buffer.", self)
 
-		indices = []
-		index_stream = ArrayFileReader(self.index_data.data)
+		dtype = np.dtype('<u2' if self.format == rw4_enums.D3DFMT_INDEX16 else '<u4')
+		if len(self.index_data.data) < dtype.itemsize * self.primitive_count:
+			raise ModelError("The index data buffer is smaller than the primitive count.", self)
 
-		fmt = '<H' if self.format == rw4_enums.D3DFMT_INDEX16 else '<I'
-		for i in range(self.primitive_count):
-			indices.append(index_stream.unpack(fmt)[0])
-
-		return indices
+		# This is a read-only view of the index data
+		return np.frombuffer(self.index_data.data, dtype=dtype, count=self.primitive_count)
 
 
 class SkinMatrixBuffer(RWObject):
@@ -1006,6 +1222,9 @@ class CompiledState(RWObject):
 		size = file.read_int()
 		self.data = file.read(size - 4)
 
+	def detach(self, path=None):
+		self.data = bytes(self.data)
+
 	def write(self, file: FileWriter):
 		file.write_int(len(self.data) + 4)
 		file.write(self.data)
@@ -1184,16 +1403,20 @@ class TriangleKDTreeProcedural(RWObject):
 	def __init__(self, render_ware: RenderWare4):
 		super().__init__(render_ware)
 		self.bound_box = None
-		self.triangles = []
-		self.vertices = []
+		# (triangle_count, 4) int32 array; the last value is usually 0 (?)
+		self.triangles = np.empty((0, 4), dtype=np.int32)
+		# (vertex_count, 4) float32 array; the last value is padding
+		self.vertices = np.empty((0, 4), dtype=np.float32)
 		self.field_20 = 0x00D59208
 		self.field_24 = 8
 		# 28h: triangle_count
 		self.field_2C = 0
 		# 30h: vertex_count
 
-		self.triangle_unknowns = []
+		# One 4-bit value per triangle, as an uint8 array
+		self.triangle_unknowns = np.empty(0, dtype=np.uint8)
 		self.bound_box_2 = None
+		# The branch nodes of the tree, as tuples of 6 ints and 2 floats; see rw4_kdtree for their meaning
 		self.unknown_data = []
 
 	def read(self, file: FileReader):
@@ -1219,35 +1442,32 @@ class TriangleKDTreeProcedural(RWObject):
 
 		# Read vertices
 		file.seek(p_vertex_offsets)
-		for i in range(vertex_count):
-			self.vertices.append((file.read_float(), file.read_float(), file.read_float()))
-			file.read_int()
+		self.vertices = file.read_array('<f4', vertex_count * 4).reshape(vertex_count, 4)
 
 		# Read triangles
 		file.seek(p_triangles)
-		for i in range(triangle_count):
-			# it has one integer more, which is usually 0 (?)
-			self.triangles.append((file.read_int(), file.read_int(), file.read_int(), file.read_int()))
+		self.triangles = file.read_array('<i4', triangle_count * 4).reshape(triangle_count, 4)
 
+		# The triangle unknowns are 4-bit values, packed in groups of 8
 		file.seek(p3)
-		x = 0
-		for i in range(triangle_count):
-			if i & 7 == 0:
-				x = file.read_int()
-
-			self.triangle_unknowns.append((x >> ((i & 7) * 4)) & 0xf)
+		packs = file.read_array('<u4', (triangle_count + 7) // 8)
+		nibbles = (packs[:, None] >> np.arange(0, 32, 4, dtype=np.uint32)) & 0xf
+		self.triangle_unknowns = nibbles.astype(np.uint8).ravel()[:triangle_count]
 
+		# The nodes block starts with p_vertices - 8 * 4 (its meaning is unknown, it's always written like that),
+		# the node count, the triangle count and 0, followed by the bounds of the tree and the nodes
 		file.seek(p4)
-		file.read_int()  # self.vertexPos - 8 * 4
+		file.read_int()  # p_vertices - 8 * 4
 		unknown_count = file.read_int()
 		file.read_int()  # self.triCount
 		file.read_int()  # 0
 		self.bound_box_2.read(file)
 		for i in range(unknown_count):
-			self.unknown_data.append(
-				(file.read_int(), file.read_int(), file.read_int(), file.read_int(), file.read_int(), file.read_int(),
-				 file.read_float(), file.read_float())
-			)
+			self.unknown_data.append(file.unpack('<6i2f'))
+
+	def detach(self, path=None):
+		self.vertices = self.vertices.copy()
+		self.triangles = self.triangles.copy()
 
 	def write(self, file: FileWriter):
 		self.bound_box.write(file)
@@ -1276,41 +1496,23 @@ class TriangleKDTreeProcedural(RWObject):
 
 		file.write(bytearray(p_vertices - pos))
 
-		for vertex in self.vertices:
-			file.write_float(vertex[0])
-			file.write_float(vertex[1])
-			file.write_float(vertex[2])
-			file.write_int(0)
+		# The last value of each vertex is always written as 0
+		vertices = np.zeros((len(self.vertices), 4), dtype='<f4')
+		vertices[:, :3] = np.asarray(self.vertices).reshape(len(self.vertices), -1)[:, :3]
+		file.write_array(vertices, '<f4')
 
 		# Write triangles
 		p_triangles = file.tell()
-		for triangle in self.triangles:
-			file.write_int(triangle[0])
-			file.write_int(triangle[1])
-			file.write_int(triangle[2])
-			file.write_int(triangle[3])
+		file.write_array(np.asarray(self.triangles).reshape(len(self.triangles), 4), '<i4')
 
 		p3 = file.tell()
 
-		count = len(self.triangle_unknowns) // 8
-		packs = []
-		for i in range(count):
-			packs.append(self.triangle_unknowns[i * 8] + (self.triangle_unknowns[i * 8 + 1] << 4) +
-						 (self.triangle_unknowns[i * 8 + 2] << 8) + (self.triangle_unknowns[i * 8 + 3] << 12) +
-						 (self.triangle_unknowns[i * 8 + 4] << 16) + (self.triangle_unknowns[i * 8 + 5] << 20) +
-						 (self.triangle_unknowns[i * 8 + 6] << 24) + (self.triangle_unknowns[i * 8 + 7] << 28))
-
-		tri_pack = len(self.triangle_unknowns) % 8
-		if tri_pack > 0:
-			pack = 0
-			for i in range(tri_pack):
-				pack += self.triangle_unknowns[count * 8 + i] << (i * 4)
-			for i in range(8 - tri_pack):
-				pack += 15 << ((i + tri_pack) * 4)
-			packs.append(pack)
-
-		for p in packs:
-			file.write(struct.pack('I', p))
+		# Pack the 4-bit unknowns in groups of 8, filling the last group with 15
+		unknowns = np.asarray(self.triangle_unknowns, dtype=np.uint32)
+		nibbles = np.full(((len(unknowns) + 7) // 8) * 8, 15, dtype=np.uint32)
+		nibbles[:len(unknowns)] = unknowns
+		packs = np.bitwise_or.reduce(nibbles.reshape(-1, 8) << np.arange(0, 32, 4, dtype=np.uint32), axis=1)
+		file.write_array(packs, '<u4')
 
 		pos = file.tell()
 		p4 = (pos + 15) & ~15
@@ -1323,15 +1525,8 @@ class TriangleKDTreeProcedural(RWObject):
 
 		self.bound_box_2.write(file)
 
-		for i in range(len(self.unknown_data)):
-			file.write_int(self.unknown_data[i][0])
-			file.write_int(self.unknown_data[i][1])
-			file.write_int(self.unknown_data[i][2])
-			file.write_int(self.unknown_data[i][3])
-			file.write_int(self.unknown_data[i][4])
-			file.write_int(self.unknown_data[i][5])
-			file.write_float(self.unknown_data[i][6])
-			file.write_float(self.unknown_data[i][7])
+		for data in self.unknown_data:
+			file.pack('<6i2f', *data)
 
 		# Write the pointer offsets
 		final_pos = file.tell()
@@ -1744,6 +1939,10 @@ class BlendShapeBuffer(RWObject):
 
 		self.data = file.read(self.section_info.data_size - 64)
 
+	def detach(self, path=None):
+		if self.data is not None:
+			self.data = bytes(self.data)
+
 	def write(self, file: FileWriter):
 		file.write_int(1)
 		for offset in self.offsets:
@@ -1760,6 +1959,59 @@ class BlendShapeBuffer(RWObject):
 		write_alignment(file, 16)
 		file.write(self.data)
 
+	def get_element_array(self, index, dtype, columns, block_count=1):
+		"""
+		Returns a view of the data of one element, such as positions or blend weights.
+		The view must be copied before being modified.
+		:param index: The index of the element in the offsets table, such as INDEX_POSITION.
+		:param dtype: The type of every value.
+		:param columns: The number of values of every vertex.
+		:param block_count: The number of consecutive blocks of vertex_count vertices.
+		:returns: An array of shape (block_count, vertex_count, columns), or None if the element is not present.
+		"""
+		offset = self.offsets[index]
+		if offset == -1:
+			return None
+
+		dtype = np.dtype(dtype)
+		count = block_count * self.vertex_count * columns
+		if offset + count * dtype.itemsize > len(self.data):
+			raise ModelError("The blend shape buffer is smaller than its vertex count.", self)
+
+		return np.frombuffer(self.data, dtype=dtype, count=count, offset=offset).reshape(
+			block_count, self.vertex_count, columns)
+
+	def get_shape_vectors(self, index):
+		"""
+		Returns the position, normal or tangent values of the base mesh and every shape.
+		For positions, the shape values are offsets relative to the base mesh.
+		:param index: INDEX_POSITION, INDEX_NORMAL or INDEX_TANGENT.
+		:returns: A (shape_count + 1, vertex_count, 3) float32 view, or None if the element is not present.
+		"""
+		vectors = self.get_element_array(index, '<f4', 4, self.shape_count + 1)
+		return None if vectors is None else vectors[:, :, :3]
+
+	def get_texcoords(self):
+		"""
+		:returns: A (vertex_count, 2) float32 view of the texture coordinates, or None if there are none.
+		"""
+		texcoords = self.get_element_array(self.INDEX_TEXCOORD, '<f4', 4)
+		return None if texcoords is None else texcoords[0, :, :2]
+
+	def get_blend_indices(self):
+		"""
+		:returns: A (vertex_count, bone_indices_count) uint16 view of the bone indices, or None if there are none.
+		"""
+		indices = self.get_element_array(self.INDEX_BLENDINDICES, '<u2', self.bone_indices_count)
+		return None if indices is None else indices[0]
+
+	def get_blend_weights(self):
+		"""
+		:returns: A (vertex_count, bone_indices_count) float32 view of the bone weights, or None if there are none.
+		"""
+		weights = self.get_element_array(self.INDEX_BLENDWEIGHTS, '<f4', self.bone_indices_count)
+		return None if weights is None else weights[0]
+
 
 class DDSTexture:
 	DDSD_CAPS = 0x1
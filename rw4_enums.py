@@ -1,5 +1,6 @@
 from .file_io import FileReader, FileWriter
 from collections import namedtuple
+import numpy as np
 
 # intIdentifier, argType, default value, (range)
 
@@ -78,6 +79,23 @@ D3DDECLTYPE_FORMATS = [
 	# last four are not supported
 ]
 
+# The same formats as NumPy (type, count) pairs, used to decode whole vertex buffers at once
+D3DDECLTYPE_DTYPES = [
+	('<f4', 1),  # float1
+	('<f4', 2),  # float2
+	('<f4', 3),  # float3
+	('<f4', 4),  # float4
+	('<u4', 1),  # D3DCOLOR
+	('u1', 4),  # ubyte4
+	('<i2', 2),  # short2
+	('<i2', 4),  # short4
+	('u1', 4),  # ubyte4n
+	('<i2', 2),  # short2n
+	('<i2', 4),  # short4n
+	('<u2', 2),  # ushort2n
+	('<u2', 4),  # ushort4n
+]
+
 # D3DDECLMETHOD
 D3DDECLMETHOD_DEFAULT = 0
 D3DDECLMETHOD_PARTIALU = 1
@@ -577,6 +595,27 @@ def create_rw_vertex_class(elements):
 	return namedtuple('Vertex', [RWDECLUSAGE_NAMES[e.rw_decl] for e in elements])
 
 
+def create_rw_vertex_dtype(elements, vertex_size):
+	"""
+	Creates a structured NumPy dtype with the memory layout of a vertex made of the given elements.
+	Every field has the name of the element (as in RWDECLUSAGE_NAMES) and a shape of (n,), so that
+	a whole buffer can be viewed with np.frombuffer and each field is a (vertex_count, n) column.
+	:param elements: The list of VertexElement objects.
+	:param vertex_size: The size of each vertex in bytes, including any padding.
+	:return: The NumPy dtype.
+	"""
+	names = []
+	formats = []
+	offsets = []
+	for element in elements:
+		base_type, count = D3DDECLTYPE_DTYPES[element.type]
+		names.append(RWDECLUSAGE_NAMES[element.rw_decl])
+		formats.append((base_type, (count,)))
+		offsets.append(element.offset)
+
+	return np.dtype({'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': vertex_size})
+
+
 def read_rw_vertex(elements, vertex_class, file: FileReader):
 	values = []
 	for element in elements:
@@ -600,3 +639,13 @@ def unpack_normals(values):
 	:return:
 	"""
 	return unpack_normal(values[0]), unpack_normal(values[1]), unpack_normal(values[2])
+
+
+def unpack_normals_array(values):
+	"""
+	Converts an array of packed 0-255 normals, with shape (n, 3) or (n, 4), into a (n, 3) array
+	of -1.0 to 1.0 float normals. This is the vectorized version of unpack_normals.
+	:param values:
+	:return:
+	"""
+	return (np.asarray(values[:, :3], dtype=np.float32) - 127.5) / 127.5
@@ -1,23 +1,28 @@
 __author__ = 'Eric'
 
 import bpy
-from . import rw4_base, rw4_enums, file_io, rw4_validation
+from . import rw4_base, rw4_enums, file_io, rw4_validation, rw4_kdtree, pose_sampler, export_profiler, texture_cache
 from . import rw4_material_config
 from mathutils import Matrix, Quaternion, Vector
-from random import choice
+import numpy as np
 import re
 from .message_box import show_message_box, show_multi_message_box
 
 def write_index_buffer(data, fmt):
-	file = file_io.ArrayFileWriter()
+	data = np.asarray(data)
 	if fmt == rw4_enums.D3DFMT_INDEX16:
-		for x in data:
-			file.write_ushort(x)
+		dtype = np.dtype('<u2')
 	elif fmt == rw4_enums.D3DFMT_INDEX32:
-		for x in data:
-			file.write_uint(x)
+		dtype = np.dtype('<u4')
+	else:
+		return bytearray()
 
-	return file.buffer
+	if len(data) > 0 and (data.min() < 0 or data.max() > np.iinfo(dtype).max):
+		raise OverflowError(f"Index out of range for a {dtype.itemsize * 8}-bit index buffer")
+
+	# Indices that already have the buffer's dtype are copied once, into the bytearray; other dtypes
+	# (such as the int32 triangles from process_mesh) are converted first, which is one more copy
+	return bytearray(memoryview(np.ascontiguousarray(data, dtype=dtype)))
 
 
 def write_vertex_buffer(data, vertex_elements):
@@ -48,6 +53,28 @@ def pack_ubyte_vec3(values):
 		0)
 
 
+def pack_ubyte_vec3_array(values):
+	"""
+	Vectorized version of pack_ubyte_vec3, converts a (n, 3) array of -1.0 to 1.0 values
+	into a list of n [x, y, z, 0] lists of 0-255 integers.
+	"""
+	values = np.asarray(values, dtype=np.float64).reshape(-1, 3)
+	packed = np.zeros((len(values), 4), dtype=np.int64)
+	packed[:, :3] = np.round(values * 127.5 + 127.5).astype(np.int64) & 0xFF
+	return packed.tolist()
+
+
+def pad_vec3_array(values):
+	"""
+	Converts an array of 3D vectors, with shape (..., 3), into a float32 array with shape (..., 4)
+	whose last value is 0, which is how vectors are stored in blend shape buffers.
+	"""
+	values = np.asarray(values)
+	padded = np.zeros(values.shape[:-1] + (4,), dtype=np.float32)
+	padded[..., :3] = values
+	return padded
+
+
 def mesh_triangulate(me):
 	"""
 	Creates a triangulated copy of `me` and stores it on `me`.
@@ -61,6 +88,103 @@ def mesh_triangulate(me):
 	bm.free()
 
 
+def compute_tangents(positions, texcoords, normals, faces):
+	"""
+	Calculates per-vertex tangents from the positions, UVs and normals of a triangulated mesh.
+	The tangent of every face is accumulated into its three vertices, and the result is orthonormalized
+	against the vertex normal. Vertices whose tangent cannot be determined (for example, because all the
+	UVs around them are degenerate) get a zero tangent, like the previous per-face implementation did.
+
+	:param positions: A (N, 3) array of vertex positions.
+	:param texcoords: A (N, 2) array of vertex UVs.
+	:param normals: A (N, 3) array of unit vertex normals.
+	:param faces: A (F, 3) array of vertex indices; extra columns, such as the material index, are ignored.
+	:return: A (N, 3) float array of unit tangents.
+	"""
+	positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+	texcoords = np.asarray(texcoords, dtype=np.float64).reshape(-1, 2)
+	normals = np.asarray(normals, dtype=np.float64).reshape(-1, 3)
+	faces = np.asarray(faces, dtype=np.int64).reshape(len(faces), -1)[:, :3] if len(faces) else np.empty((0, 3), dtype=np.int64)
+
+	dco1 = positions[faces[:, 1]] - positions[faces[:, 0]]
+	dco2 = positions[faces[:, 2]] - positions[faces[:, 0]]
+	duv1 = texcoords[faces[:, 1]] - texcoords[faces[:, 0]]
+	duv2 = texcoords[faces[:, 2]] - texcoords[faces[:, 0]]
+
+	face_tangents = dco2 * duv1[:, 1, None] - dco1 * duv2[:, 1, None]
+	face_bitangents = dco2 * duv1[:, 0, None] - dco1 * duv2[:, 0, None]
+	# Keep the tangent frame consistent with the winding of the face
+	flip = np.einsum('ij,ij->i', np.cross(dco2, dco1), np.cross(face_bitangents, face_tangents)) < 0
+	face_tangents[flip] *= -1.0
+
+	tangents = np.zeros_like(positions)
+	for corner in range(3):
+		np.add.at(tangents, faces[:, corner], face_tangents)
+
+	tangents -= normals * np.einsum('ij,ij->i', tangents, normals)[:, None]
+	lengths = np.linalg.norm(tangents, axis=1)
+
+	# Degenerate tangents stay as zero vectors, as mathutils' Vector.normalized() does
+	degenerate = lengths <= 1e-12
+	tangents[degenerate] = 0.0
+	lengths[degenerate] = 1.0
+	return tangents / lengths[:, None]
+
+
+def compute_vertex_normals(positions, loop_vertices, loop_starts, loop_totals):
+	"""
+	Calculates per-vertex normals the same way Blender does: the normal of every polygon is accumulated
+	into its vertices, weighted by the angle of the polygon corner at that vertex.
+	Vertices that are not used by any polygon get their normalized position as normal.
+
+	:param positions: A (N, 3) array of vertex positions.
+	:param loop_vertices: An array with the vertex index of every loop (polygon corner).
+	:param loop_starts: An array with the index of the first loop of every polygon.
+	:param loop_totals: An array with the number of loops of every polygon.
+	:return: A (N, 3) float array of unit normals.
+	"""
+	positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+	loop_vertices = np.asarray(loop_vertices, dtype=np.int64)
+	loop_starts = np.asarray(loop_starts, dtype=np.int64)
+	loop_totals = np.asarray(loop_totals, dtype=np.int64)
+
+	normals = np.zeros_like(positions)
+	if len(loop_totals):
+		polygon_ids = np.repeat(np.arange(len(loop_totals)), loop_totals)
+		offsets = np.cumsum(loop_totals) - loop_totals
+		corners = np.arange(len(polygon_ids)) - offsets[polygon_ids]
+		starts = loop_starts[polygon_ids]
+		totals = loop_totals[polygon_ids]
+
+		vertex_indices = loop_vertices[starts + corners]
+		co = positions[vertex_indices]
+		co_next = positions[loop_vertices[starts + (corners + 1) % totals]]
+		co_prev = positions[loop_vertices[starts + (corners - 1) % totals]]
+
+		# Newell's method, which for triangles is the usual cross product
+		polygon_normals = np.add.reduceat(np.cross(co, co_next), offsets, axis=0)
+		lengths = np.linalg.norm(polygon_normals, axis=1)
+		lengths[lengths == 0.0] = 1.0
+		polygon_normals /= lengths[:, None]
+
+		edges_prev = co_prev - co
+		edges_next = co_next - co
+		edge_lengths = np.linalg.norm(edges_prev, axis=1) * np.linalg.norm(edges_next, axis=1)
+		edge_lengths[edge_lengths == 0.0] = 1.0
+		angles = np.arccos(np.clip(np.einsum('ij,ij->i', edges_prev, edges_next) / edge_lengths, -1.0, 1.0))
+
+		np.add.at(normals, vertex_indices, polygon_normals[polygon_ids] * angles[:, None])
+
+	lengths = np.linalg.norm(normals, axis=1)
+	loose = lengths == 0.0
+	if np.any(loose):
+		normals[loose] = positions[loose]
+		lengths[loose] = np.linalg.norm(positions[loose], axis=1)
+
+	lengths[lengths == 0.0] = 1.0
+	return normals / lengths[:, None]
+
+
 def calculate_tangents(vertices, faces):
 	"""
 	Calculates the tangents of a processed mesh, storing them on `vertices['tangent']`
@@ -69,42 +193,8 @@ def calculate_tangents(vertices, faces):
 	:param vertices: A dictionary of vertices attributes lists.
 	:param faces: A list of [i, j, k, material_index] faces
 	"""
-	positions = vertices["position"]
-	texcoord0 = vertices["texcoord0"]
-	normals = vertices["normal"]
-	vertex_count = len(positions)
-	tangents = [Vector((0.0, 0.0, 0.0)) for _ in range(vertex_count)]
-	bitangents = [Vector((0.0, 0.0, 0.0)) for _ in range(vertex_count)]
-
-	for f, face in enumerate(faces):
-		v0_co = positions[face[0]]
-		v1_co = positions[face[1]]
-		v2_co = positions[face[2]]
-
-		v0_uv = texcoord0[face[0]]
-		v1_uv = texcoord0[face[1]]
-		v2_uv = texcoord0[face[2]]
-
-		dco1 = v1_co - v0_co
-		dco2 = v2_co - v0_co
-		duv1 = Vector((v1_uv[0], v1_uv[1])) - Vector((v0_uv[0], v0_uv[1]))
-		duv2 = Vector((v2_uv[0], v2_uv[1])) - Vector((v0_uv[0], v0_uv[1]))
-		tangent = dco2 * duv1.y - dco1 * duv2.y
-		bitangent = dco2 * duv1.x - dco1 * duv2.x
-		if dco2.cross(dco1).dot(bitangent.cross(tangent)) < 0:
-			tangent.negate()
-			bitangent.negate()
-		tangents[face[0]] += tangent
-		tangents[face[1]] += tangent
-		tangents[face[2]] += tangent
-		bitangents[face[0]] += bitangent
-		bitangents[face[1]] += bitangent
-		bitangents[face[2]] += bitangent
-
-	for i in range(len(tangents)):
-		tangents[i] = (tangents[i] - normals[i] * tangents[i].dot(normals[i])).normalized()
-
-	vertices["tangent"] = tangents
+	vertices["tangent"] = compute_tangents(
+		vertices["position"], vertices["texcoord0"], vertices["normal"], faces).tolist()
 
 
 def convert_vertices(vertices, vertex_elements):
@@ -120,10 +210,10 @@ def convert_vertices(vertices, vertex_elements):
 	:return:
 	"""
 	if 'normal' in vertices:
-		vertices['normal'] = [pack_ubyte_vec3(v) for v in vertices['normal']]
+		vertices['normal'] = pack_ubyte_vec3_array(vertices['normal'])
 
 	if 'tangent' in vertices:
-		vertices['tangent'] = [pack_ubyte_vec3(v) for v in vertices['tangent']]
+		vertices['tangent'] = pack_ubyte_vec3_array(vertices['tangent'])
 
 	vertex_class = rw4_enums.create_rw_vertex_class(vertex_elements)
 	return [vertex_class(**dict(zip(vertices, v))) for v in zip(*vertices.values())]
@@ -143,6 +233,8 @@ class RW4Exporter:
 		self.warnings = set()
 
 		self.added_textures = {}
+		# The CachedTexture of every exported .dds file, whose data is copied from the file when writing
+		self.cached_textures = []
 
 		self.b_armature_object = None
 		self.b_mesh_objects = []
@@ -159,12 +251,16 @@ class RW4Exporter:
 
 		self.bound_box = None
 
-		# for TriangleKDTreeProcedural
+		# for TriangleKDTreeProcedural; they contain one array per exported mesh
 		self.triangles = []
 		self.vertices = []
 		self.triangle_unknowns = []
 
 		self.blend_shape = None
+		# If True, the normals of shape keys are taken from the evaluated mesh instead of being computed
+		self.evaluated_shape_normals = False
+		# Measures the time of every export stage; disabled unless the export is being profiled
+		self.profiler = export_profiler.ExportProfiler(enabled=False)
 
 	def has_skeleton(self):
 		"""
@@ -230,13 +326,15 @@ class RW4Exporter:
 					self.warnings.add(error)     
 		elif path:
 			try:
-				with open(bpy.path.abspath(path), 'rb') as file:
-					dds_texture = rw4_base.DDSTexture()
-					dds_texture.read(file_io.FileReader(file))
+				# Textures are kept between exports, so they are only read again if they change
+				with self.profiler.stage('add_texture', path):
+					cached_texture = texture_cache.texture_cache.get(bpy.path.abspath(path))
 
-					raster.from_dds(dds_texture)
-					data_buffer.data = dds_texture.data
-					use_emtpy_texture = False
+				cached_texture.apply(raster)
+				# The pixel data is copied from the file when writing, it's never loaded in memory
+				data_buffer.set_file_range(cached_texture.file_range)
+				self.cached_textures.append(cached_texture)
+				use_emtpy_texture = False
 
 			except FileNotFoundError as _:
 				error = rw4_validation.error_texture_does_not_exist(path)
@@ -266,89 +364,119 @@ class RW4Exporter:
 
 		return raster
 
-	def process_vertex_bones(self, obj, b_vertex, vertex_dict, base255):
+	def process_vertex_bones(self, obj, mesh, indices_map, base255):
 		"""
-		Adds the bone indices and weights of the given vertex into the vertex attributes.
+		Calculates the bone indices and weights of the processed vertices. The vertex groups are mapped to bones
+		only once, and all the weights are then processed at the same time.
+		Every vertex uses at most 4 bones, in the order of its vertex groups.
 
 		:param obj: The Blender mesh object.
-		:param b_vertex: The Blender vertex.
-		:param vertex_dict: A dictionary of vertex attributes lists.
+		:param mesh: The triangulated Blender mesh.
+		:param indices_map: An array with the index of the Blender vertex for every processed vertex.
 		:param base255: If True, weights will be converted to 0-255 integer range
-		:returns: False if there was an error with the bones and exporting must stop
+		:returns: A tuple of (blend_indices, blend_weights) arrays, with 4 values per processed vertex,
+		or (None, None) if there was an error with the bones and exporting must stop
 		"""
-		indices = [0, 0, 0, 0]
-		# Special case: if there are no bone weights, we must do this or the model will be invisible
-		weights = [255, 0, 0, 0] if base255 else [1.0, 0, 0, 0]
-		total_weight = 0
-		for i, gr in enumerate(b_vertex.groups):
-			if gr.group < len(obj.vertex_groups):
-				v_group = obj.vertex_groups[gr.group]
-			else:
-				# TODO: add a warning or skip this group
-				continue
-			bone_query = [j for j, bone in enumerate(self.b_armature_object.data.bones) if bone.name == v_group.name]
-			if not bone_query:
-				error = rw4_validation.error_no_bone_for_vertex_group(v_group)
-				if error not in self.warnings:
-					self.warnings.add(error)
-				continue
-				
-			index = bone_query[0]
-			
-			if index * 3 > 255:
-				error = rw4_validation.error_too_many_bones(self.b_armature_object)
-				if error not in self.warnings:
-					self.warnings.add(error)
-				break
+		vertex_count = len(mesh.vertices)
+
+		bone_indices = {}
+		for j, bone in enumerate(self.b_armature_object.data.bones):
+			bone_indices.setdefault(bone.name, j)
+		# For every vertex group, the index of its bone, or -1 if there is no bone with that name
+		group_bones = np.array([bone_indices.get(v_group.name, -1) for v_group in obj.vertex_groups], dtype=np.int64)
+
+		vertex_indices = []
+		group_indices = []
+		group_weights = []
+		for b_vertex in mesh.vertices:
+			for gr in b_vertex.groups:
+				vertex_indices.append(b_vertex.index)
+				group_indices.append(gr.group)
+				group_weights.append(gr.weight)
+
+		vertex_indices = np.array(vertex_indices, dtype=np.int64)
+		group_indices = np.array(group_indices, dtype=np.int64)
+		group_weights = np.array(group_weights, dtype=np.float64)
+
+		# Only the vertices that are used by the processed mesh matter
+		used_vertices = np.zeros(vertex_count, dtype=bool)
+		used_vertices[indices_map] = True
+		# TODO: add a warning for groups that don't belong to the object
+		mask = used_vertices[vertex_indices] & (group_indices < len(group_bones))
+		vertex_indices = vertex_indices[mask]
+		group_indices = group_indices[mask]
+		group_weights = group_weights[mask]
+		bones = group_bones[group_indices]
+
+		missing = bones == -1
+		if np.any(missing):
+			groups, counts = np.unique(group_indices[missing], return_counts=True)
+			for group, count in zip(groups.tolist(), counts.tolist()):
+				self.warnings.add(rw4_validation.error_no_bone_for_vertex_group(obj.vertex_groups[group], count))
+
+		too_many_bones = bones * 3 > 255
+		if np.any(too_many_bones):
+			error = rw4_validation.error_too_many_bones(self.b_armature_object)
+			if error not in self.warnings:
+				self.warnings.add(error)
 
-			if i == 4:
-				error = rw4_validation.error_vertex_bone_limit(obj)
-				if error not in self.warnings:
-					self.warnings.add(error)
-				break
+		mask = ~missing & ~too_many_bones
+		vertex_indices = vertex_indices[mask]
+		bones = bones[mask]
+		group_weights = group_weights[mask]
 
-			weight = round(gr.weight * 255) if base255 else gr.weight
-			total_weight += weight
-			indices[i] = index * 3
-			weights[i] = weight
+		# The position of every influence inside its vertex; influences are sorted by vertex
+		influence_counts = np.bincount(vertex_indices, minlength=vertex_count)
+		slots = np.arange(len(vertex_indices)) - (np.cumsum(influence_counts) - influence_counts)[vertex_indices]
 
-		if base255:
-			if total_weight == 256:
-				for i in range(4):
-					if weights[i] != 0:
-						weights[i] = weights[i] - 1
-						total_weight -= 1
-						break
-			elif total_weight == 254:
-				for i in range(4):
-					if weights[i] != 0:
-						weights[i] = weights[i] + 1
-						total_weight += 1
-						break
+		over_limit = influence_counts > 4
+		if np.any(over_limit):
+			self.warnings.add(rw4_validation.error_vertex_bone_limit(obj, int(np.count_nonzero(over_limit))))
+			mask = slots < 4
+			vertex_indices = vertex_indices[mask]
+			bones = bones[mask]
+			group_weights = group_weights[mask]
+			slots = slots[mask]
 
-			if total_weight != 255:
-				error = rw4_validation.error_not_normalized(obj)
-				if error not in self.warnings:
-					self.warnings.add(error)
-					return False
+		indices = np.zeros((vertex_count, 4), dtype=np.int64)
+		weights = np.zeros((vertex_count, 4), dtype=np.float64)
+		indices[vertex_indices, slots] = bones * 3
+		weights[vertex_indices, slots] = np.round(group_weights * 255) if base255 else group_weights
+
+		total_weights = weights.sum(axis=1)
+
+		# Special case: if there are no bone weights, we must do this or the model will be invisible
+		weights[influence_counts == 0, 0] = 255 if base255 else 1.0
+
+		if base255:
+			# Correct rounding errors on the first non-zero weight
+			first_nonzero = np.argmax(weights != 0, axis=1)
+			for total, correction in ((256, -1), (254, 1)):
+				rows = np.flatnonzero(total_weights == total)
+				weights[rows, first_nonzero[rows]] += correction
+				total_weights[rows] += correction
+
+			not_normalized = used_vertices & (total_weights != 255)
+			if np.any(not_normalized):
+				self.warnings.add(rw4_validation.error_not_normalized(obj, int(np.count_nonzero(not_normalized))))
+				return None, None
+
+			weights = weights.astype(np.int64)
 		else:
 			epsilon = 0.002
-			if total_weight > 1.0 + epsilon or total_weight < 1.0 - epsilon:
-				error = rw4_validation.error_not_normalized(obj)
-				if error not in self.warnings:
-					self.warnings.add(error)
+			not_normalized = used_vertices & ((total_weights > 1.0 + epsilon) | (total_weights < 1.0 - epsilon))
+			if np.any(not_normalized):
+				self.warnings.add(rw4_validation.error_not_normalized(obj, int(np.count_nonzero(not_normalized))))
 
-		vertex_dict['blendIndices'].append(indices)
-		vertex_dict['blendWeights'].append(weights)
-		return True
+		return indices[indices_map], weights[indices_map]
 
 	def process_mesh(self, obj, mesh, use_texcoord, use_bones, base255):
 		"""
 		Spore models only have one UV per-vertex, whereas Blender can have more than just one.
 		This method converts a Blender mesh into a valid Spore mesh.
 
-		The output vertices is a dictionary that assigns a list of values for each vertex attribute ('position', etc)
-		The output triangles is a list of [i, j, k, material_index] elements.
+		The output vertices is a dictionary that assigns an array of values for each vertex attribute ('position', etc)
+		The output triangles is a (triangle_count, 4) array of [i, j, k, material_index] elements.
 		The output indices_map is such as indices_map[i] is the index of the original vertex that
 		corresponds to the new vertex of index i.
 
@@ -361,81 +489,84 @@ class RW4Exporter:
 		:param base255: If True, bone weights will be converted to 0-255 integer range.
 		:returns: A tuple of (vertices, triangles, indices_map)
 		"""
-		# The result; triangles are (i, j, k, material_index)
-		triangles = [None] * len(mesh.polygons)
-		positions = []
-		normals = []
-		texcoords = []
-		indices_map = []
-		vertices = {'position': positions, 'normal': normals}
-
-		if use_bones:
-			vertices['blendIndices'] = []
-			vertices['blendWeights'] = []
-
-		if not use_texcoord:
-			# No need to process if we don't have UV coords
-
-			for t, face in enumerate(mesh.polygons):
-				triangles[t] = (mesh.loops[face.loop_start].vertex_index,
-								mesh.loops[face.loop_start + 1].vertex_index,
-								mesh.loops[face.loop_start + 2].vertex_index,
-								face.material_index)
-
-			for i, b_vertex in enumerate(mesh.vertices):
-				positions.append(Vector((b_vertex.co[0], b_vertex.co[1], b_vertex.co[2])))
-				normals.append(Vector((b_vertex.normal[0], b_vertex.normal[1], b_vertex.normal[2])))
-				if use_bones:
-					if not self.process_vertex_bones(obj, b_vertex, vertices, base255):
-						return None, None, None
+		vertex_count = len(mesh.vertices)
+		triangle_count = len(mesh.polygons)
 
-				indices_map.append(i)
+		positions = np.empty(vertex_count * 3, dtype=np.float32)
+		mesh.vertices.foreach_get("co", positions)
+		positions = positions.reshape(vertex_count, 3)
 
-		else:
-			# Each item of this list is a list of all the new vertex indices that
-			# represent that vertex
-			new_vertex_indices = [[] for _ in range(len(mesh.vertices))]
-			current_processed_index = 0
+		normals = np.empty(vertex_count * 3, dtype=np.float32)
+		mesh.vertices.foreach_get("normal", normals)
+		normals = normals.reshape(vertex_count, 3)
 
-			uv_data = mesh.uv_layers.active.data
+		loop_vertices = np.empty(len(mesh.loops), dtype=np.int32)
+		mesh.loops.foreach_get("vertex_index", loop_vertices)
 
-			for t, face in enumerate(mesh.polygons):
+		loop_starts = np.empty(triangle_count, dtype=np.int32)
+		mesh.polygons.foreach_get("loop_start", loop_starts)
 
-				triangles[t] = [-1, -1, -1, face.material_index]
+		material_indices = np.empty(triangle_count, dtype=np.int32)
+		mesh.polygons.foreach_get("material_index", material_indices)
 
-				for i in range(face.loop_start, face.loop_start + 3):
-					index = mesh.loops[i].vertex_index
+		# The loop index of every triangle corner, in face order
+		corner_loops = (loop_starts[:, None] + np.arange(3, dtype=np.int32)).ravel()
+		corner_vertices = loop_vertices[corner_loops]
 
-					# Has a vertex with these UV coordinates been already processed?
-					for processed_index in new_vertex_indices[index]:
-						uv = texcoords[processed_index]
-						if uv[0] == uv_data[i].uv[0] and uv[1] == -uv_data[i].uv[1]:
-							triangles[t][i - face.loop_start] = processed_index
-							break
+		if not use_texcoord:
+			# No need to process if we don't have UV coords
+			indices_map = np.arange(vertex_count, dtype=np.int32)
+			corner_indices = corner_vertices
 
-					# If no vertex with UVs has been processed
-					else:
-						b_vertex = mesh.vertices[index]
+		else:
+			uvs = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+			mesh.uv_layers.active.data.foreach_get("uv", uvs)
+			# Adding 0.0 turns -0.0 into 0.0, so that both are considered the same UV
+			corner_uvs = uvs.reshape(-1, 2)[corner_loops] + np.float32(0.0)
+
+			# A new vertex is needed for every distinct (vertex index, UV) pair
+			keys = np.empty((len(corner_loops), 3), dtype=np.uint32)
+			keys[:, 0] = corner_vertices
+			keys[:, 1:] = corner_uvs.view(np.uint32)
+			_, first_corners, inverse = np.unique(
+				keys.view(np.dtype((np.void, keys.dtype.itemsize * 3))).ravel(),
+				return_index=True, return_inverse=True)
+
+			# Number the new vertices in order of first appearance
+			order = np.argsort(first_corners, kind='stable')
+			new_indices = np.empty(len(order), dtype=np.int32)
+			new_indices[order] = np.arange(len(order), dtype=np.int32)
+			first_corners = first_corners[order]
+
+			indices_map = corner_vertices[first_corners]
+			corner_indices = new_indices[inverse.ravel()]
+
+			# Flip vertical UV coordinates so it uses DirectX system
+			texcoords = corner_uvs[first_corners]
+			texcoords[:, 1] *= -1.0
 
-						# We will calculate the tangents later, once we have everything
-						positions.append(Vector((b_vertex.co[0], b_vertex.co[1], b_vertex.co[2])))
-						normals.append(Vector((b_vertex.normal[0], b_vertex.normal[1], b_vertex.normal[2])))
-						# Flip vertical UV coordinates so it uses DirectX system
-						texcoords.append(Vector((uv_data[i].uv[0], -uv_data[i].uv[1])))
+		# The result; triangles are (i, j, k, material_index)
+		triangles = np.empty((triangle_count, 4), dtype=np.int32)
+		triangles[:, :3] = corner_indices.reshape(triangle_count, 3)
+		triangles[:, 3] = material_indices
 
-						if use_bones:
-							if not self.process_vertex_bones(obj, b_vertex, vertices, base255):
-								return None, None, None
+		vertices = {'position': positions[indices_map], 'normal': normals[indices_map]}
 
-						indices_map.append(index)
-						triangles[t][i - face.loop_start] = current_processed_index
-						new_vertex_indices[index].append(current_processed_index)
-						current_processed_index += 1
+		if use_bones:
+			with self.profiler.stage('process_vertex_bones', obj.name):
+				blend_indices, blend_weights = self.process_vertex_bones(obj, mesh, indices_map, base255)
+			if blend_indices is None:
+				return None, None, None
+			vertices['blendIndices'] = blend_indices
+			vertices['blendWeights'] = blend_weights
 
+		if use_texcoord:
 			vertices['texcoord0'] = texcoords
-			calculate_tangents(vertices, triangles)
+			# We calculate the tangents now that we have everything
+			with self.profiler.stage('calculate_tangents', obj.name):
+				calculate_tangents(vertices, triangles)
 
-		if len(vertices) > 65536:
+		if len(vertices['position']) > 65536:
 			error = rw4_validation.error_vertices_limit(obj)
 			if error not in self.warnings:
 				self.warnings.add(error)
@@ -578,7 +709,6 @@ class RW4Exporter:
 		:param indices_map: A list that contains the index to the Blender vertices for every processed vertex index.
 		:param obj: The Blender mesh object being exported.
 		"""
-		#TODO remove influence from bones, to avoid problems when using to_mesh
 		self.blend_shape = rw4_base.BlendShape(
 			self.render_ware,
 			object_id=file_io.get_hash(obj.name),
@@ -593,83 +723,75 @@ class RW4Exporter:
 			vertex_count=vertex_count
 		)
 
-		positions = vertices['position']
+		positions = np.asarray(vertices['position'], dtype=np.float32)
+		key_blocks = obj.data.shape_keys.key_blocks
+		original_vertex_count = len(obj.data.vertices)
 
 		data = file_io.ArrayFileWriter()
 		blend_shape_buffer.offsets[rw4_base.BlendShapeBuffer.INDEX_POSITION] = data.tell()
 
-		for v in positions:
-			data.pack('<fff', *v)
-			data.write_int(0)
-
-		for shape_key in obj.data.shape_keys.key_blocks[1:]:
-			for i in range(vertex_count):
-				data.pack('<fff', *(Vector(shape_key.data[indices_map[i]].co) - Vector(positions[i])))
-				data.write_int(0)
+		# Each block has the base values followed by the values of every shape
+		position_block = np.empty((len(key_blocks), vertex_count, 3), dtype=np.float32)
+		position_block[0] = positions
+		shape_positions = np.empty(original_vertex_count * 3, dtype=np.float32)
+		for i, shape_key in enumerate(key_blocks[1:]):
+			shape_key.data.foreach_get("co", shape_positions)
+			position_block[i + 1] = shape_positions.reshape(-1, 3)[indices_map] - positions
+
+		data.write_array(pad_vec3_array(position_block), '<f4')
+
+		use_tangents = 'tangent' in vertices
+		normal_block = np.empty((len(key_blocks), vertex_count, 3), dtype=np.float32)
+		normal_block[0] = vertices['normal']
+		if use_tangents:
+			tangent_block = np.empty((len(key_blocks), vertex_count, 3), dtype=np.float32)
+			tangent_block[0] = vertices['tangent']
+
+		if self.evaluated_shape_normals:
+			self.evaluate_shape_normals(vertices, faces, indices_map, obj, normal_block,
+										tangent_block if use_tangents else None)
+		else:
+			loop_vertices = np.empty(len(obj.data.loops), dtype=np.int32)
+			loop_starts = np.empty(len(obj.data.polygons), dtype=np.int32)
+			loop_totals = np.empty(len(obj.data.polygons), dtype=np.int32)
+			obj.data.loops.foreach_get("vertex_index", loop_vertices)
+			obj.data.polygons.foreach_get("loop_start", loop_starts)
+			obj.data.polygons.foreach_get("loop_total", loop_totals)
+
+			for i, shape_key in enumerate(key_blocks[1:]):
+				shape_key.data.foreach_get("co", shape_positions)
+				shape_normals = compute_vertex_normals(shape_positions, loop_vertices, loop_starts, loop_totals)
+				normal_block[i + 1] = shape_normals[indices_map]
+
+				if use_tangents:
+					tangent_block[i + 1] = compute_tangents(
+						shape_positions.reshape(-1, 3)[indices_map], vertices['texcoord0'], normal_block[i + 1], faces)
 
 		blend_shape_buffer.offsets[rw4_base.BlendShapeBuffer.INDEX_NORMAL] = data.tell()
-		for v in vertices['normal']:
-			data.pack('<fff', *v)
-			data.write_int(0)
-
-		tangent_data = file_io.ArrayFileWriter() if 'tangent' in vertices else None
-		# For normals and tangents, we need to use to_mesh using the shape influence
-		# Save the old ones to restore them later
-		shape_values = [shape_key.value for shape_key in obj.data.shape_keys.key_blocks[1:]]
-
-		for shape_key in obj.data.shape_keys.key_blocks[1:]:
-			shape_key.value = 0.0
-
-		for shape_key in obj.data.shape_keys.key_blocks[1:]:
-			shape_key.value = 1.0
-			blender_mesh = obj.to_mesh()
-
-			for i in range(vertex_count):
-				data.pack('<fff', *blender_mesh.vertices[indices_map[i]].normal)
-				data.write_int(0)
-
-			if tangent_data is not None:
-				blended_vertices = dict(**vertices)
-				blended_vertices['position'] = [blender_mesh.vertices[indices_map[i]].co for i in range(vertex_count)]
-				blended_vertices['normal'] = [blender_mesh.vertices[indices_map[i]].normal for i in range(vertex_count)]
-				calculate_tangents(blended_vertices, faces)
+		data.write_array(pad_vec3_array(normal_block), '<f4')
 
-				for v in blended_vertices['tangent']:
-					tangent_data.pack('<fff', *v)
-					tangent_data.write_int(0)
-
-			obj.to_mesh_clear()
-			shape_key.value = 0.0
-
-		for shape_key, value in zip(obj.data.shape_keys.key_blocks[1:], shape_values):
-			shape_key.value = value
-
-		if 'tangent' in vertices:
+		if use_tangents:
 			blend_shape_buffer.offsets[rw4_base.BlendShapeBuffer.INDEX_TANGENT] = data.tell()
-			for v in vertices['tangent']:
-				data.pack('<fff', *v)
-				data.write_int(0)
-			data.write(tangent_data.buffer)
+			data.write_array(pad_vec3_array(tangent_block), '<f4')
 
 		if 'texcoord0' in vertices:
 			blend_shape_buffer.offsets[rw4_base.BlendShapeBuffer.INDEX_TEXCOORD] = data.tell()
-			for v in vertices['texcoord0']:
-				data.pack('<ff', *v)
-				data.write_int(0)
-				data.write_int(1)
+			# Each texcoord is followed by the integers 0 and 1
+			texcoord_block = np.zeros((vertex_count, 4), dtype='<u4')
+			texcoord_block[:, :2] = np.ascontiguousarray(vertices['texcoord0'], dtype='<f4').view('<u4')
+			texcoord_block[:, 3] = 1
+			data.write_array(texcoord_block, '<u4')
 
 		if 'blendIndices' in vertices:
 			blend_shape_buffer.bone_indices_count = 4
 			blend_shape_buffer.offsets[rw4_base.BlendShapeBuffer.INDEX_BLENDINDICES] = data.tell()
-			for v in vertices['blendIndices']:
-				data.pack('<HHHH', *v)
+			data.write_array(vertices['blendIndices'], '<u2')
 		else:
 			blend_shape_buffer.bone_indices_count = 0
 
 		if 'blendWeights' in vertices:
 			blend_shape_buffer.offsets[rw4_base.BlendShapeBuffer.INDEX_BLENDWEIGHTS] = data.tell()
-			for v in vertices['blendWeights']:
-				data.pack('<ffff', v[0], v[1], v[2], v[3])
+			data.write_array(vertices['blendWeights'], '<f4')
 
 		blend_shape_buffer.data = data.buffer
 		self.render_ware.add_object(self.blend_shape)
@@ -679,6 +801,49 @@ class RW4Exporter:
 		self.blend_shape.shape_ids_index = \
 			self.render_ware.add_sub_reference(self.blend_shape, 0x1C + len(self.blend_shape.shape_ids) * 4)
 
+	def evaluate_shape_normals(self, vertices, faces, indices_map, obj, normal_block, tangent_block):
+		"""
+		Gets the normals and tangents of every shape key by evaluating the object with only that shape applied,
+		using to_mesh. This is slower than computing them from the shape key coordinates,
+		but it takes modifiers into account.
+
+		:param vertices: A dictionary of vertex attributes lists.
+		:param faces: A list of face indices tuples.
+		:param indices_map: A list that contains the index to the Blender vertices for every processed vertex index.
+		:param obj: The Blender mesh object being exported.
+		:param normal_block: The (shape_count + 1, vertex_count, 3) array where shape normals are stored.
+		:param tangent_block: The array where shape tangents are stored, or None if tangents are not exported.
+		"""
+		#TODO remove influence from bones, to avoid problems when using to_mesh
+		key_blocks = obj.data.shape_keys.key_blocks
+
+		# For normals and tangents, we need to use to_mesh using the shape influence
+		# Save the old ones to restore them later
+		shape_values = [shape_key.value for shape_key in key_blocks[1:]]
+
+		for shape_key in key_blocks[1:]:
+			shape_key.value = 0.0
+
+		for i, shape_key in enumerate(key_blocks[1:]):
+			shape_key.value = 1.0
+			blender_mesh = obj.to_mesh()
+
+			blended_normals = np.empty(len(blender_mesh.vertices) * 3, dtype=np.float32)
+			blender_mesh.vertices.foreach_get("normal", blended_normals)
+			normal_block[i + 1] = blended_normals.reshape(-1, 3)[indices_map]
+
+			if tangent_block is not None:
+				blended_positions = np.empty(len(blender_mesh.vertices) * 3, dtype=np.float32)
+				blender_mesh.vertices.foreach_get("co", blended_positions)
+				tangent_block[i + 1] = compute_tangents(
+					blended_positions.reshape(-1, 3)[indices_map], vertices['texcoord0'], normal_block[i + 1], faces)
+
+			obj.to_mesh_clear()
+			shape_key.value = 0.0
+
+		for shape_key, value in zip(key_blocks[1:], shape_values):
+			shape_key.value = value
+
 	def check_skinpaint_uv_bounds(self, obj, mesh, warnings):
 		"""
 		Checks if the given mesh uses any skinpaint material, and if so, checks that all UV coordinates
@@ -775,13 +940,19 @@ class RW4Exporter:
 		# When there is BlendShape, Spore does not add the bone indices to the vertex format, I don't know why
 		vertex_desc = self.create_vertex_description(use_texcoord, use_bones and not use_shape_keys)
 
-		vertices, triangles, indices_map = self.process_mesh(
-			obj, blender_mesh, use_texcoord, use_bones, not use_shape_keys)
+		with self.profiler.stage('process_mesh', obj.name) as record:
+			vertices, triangles, indices_map = self.process_mesh(
+				obj, blender_mesh, use_texcoord, use_bones, not use_shape_keys)
 		
 		if vertices is None:
 			# There was a critical error, stop exporting
 			return
 
+		record['vertices'] = len(vertices['position'])
+		record['triangles'] = len(triangles)
+		self.profiler.count('vertices', len(vertices['position']))
+		self.profiler.count('triangles', len(triangles))
+
 		# When it's only for exporting we must remove it
 		obj.to_mesh_clear()
 
@@ -798,34 +969,26 @@ class RW4Exporter:
 		# We will set the buffer data later, after we have ordered them by material
 
 		if use_shape_keys:
-			self.export_as_blend_shape(vertices, triangles, indices_map, obj)
+			with self.profiler.stage('export_as_blend_shape', obj.name) as record:
+				self.export_as_blend_shape(vertices, triangles, indices_map, obj)
+				record['shape_keys'] = len(obj.data.shape_keys.key_blocks) - 1
 			vertex_buffer = None
 
 		else:
 			vertex_buffer = self.export_as_vertex_buffer(vertices, vertex_desc)
 
 		index_data = []
+		first_index = 0
 
 		for material_index, blender_material in enumerate(obj.material_slots):
-			first_index = len(index_data)
-			triangle_count = 0
-
-			for tri in triangles:
-				if tri[3] == material_index:
-					index_data += tri[0:3]
-					triangle_count += 1
+			material_triangles = triangles[triangles[:, 3] == material_index, :3]
+			triangle_count = len(material_triangles)
 
 			# There's no need to create a mesh if there are no triangles
 			if triangle_count > 0:
-				first_vertex = index_data[first_index]
-				last_vertex = index_data[first_index]
-
-				for i in range(first_index, first_index + triangle_count * 3):
-					if index_data[i] < first_vertex:
-						first_vertex = index_data[i]
-
-					elif index_data[i] > last_vertex:
-						last_vertex = index_data[i]
+				index_data.append(material_triangles.ravel())
+				first_vertex = int(material_triangles.min())
+				last_vertex = int(material_triangles.max())
 
 				mesh = rw4_base.Mesh(
 					render_ware,
@@ -866,6 +1029,10 @@ class RW4Exporter:
 				render_ware.add_object(mesh_link)
 				render_ware.add_object(compiled_state)
 
+				first_index += triangle_count * 3
+
+		index_data = np.concatenate(index_data) if index_data else np.empty(0, dtype=np.int32)
+
 		index_buffer.index_data = rw4_base.BaseResource(
 			render_ware,
 			data=write_index_buffer(index_data, index_buffer.format)
@@ -879,16 +1046,17 @@ class RW4Exporter:
 		# Add required things for TriangleKDTreeProcedural
 
 		# How many vertices have previous objects added?
-		previous_vertex_count = len(self.vertices)
-		# Copy so it doesn't get deleted when removing temporary mesh
-		self.vertices += [(v[0], v[1], v[2]) for v in vertices['position']]
+		previous_vertex_count = sum(len(v) for v in self.vertices)
 
-		for i in range(0, len(index_data), 3):
-			self.triangles.append((index_data[i] + previous_vertex_count,
-								   index_data[i+1] + previous_vertex_count,
-								   index_data[i+2] + previous_vertex_count,
-								   0))
-			self.triangle_unknowns.append(choice(range(1, 13, 2)))
+		kd_vertices = np.zeros((len(vertices['position']), 4), dtype=np.float32)
+		kd_vertices[:, :3] = vertices['position']
+		self.vertices.append(kd_vertices)
+
+		kd_triangles = np.zeros((len(index_data) // 3, 4), dtype=np.int32)
+		kd_triangles[:, :3] = index_data.reshape(-1, 3) + previous_vertex_count
+		self.triangles.append(kd_triangles)
+		# Random odd values between 1 and 11
+		self.triangle_unknowns.append((np.random.randint(0, 6, len(kd_triangles)) * 2 + 1).astype(np.uint8))
 
 	def create_animation_skin(self, b_bone):
 		pose = rw4_base.AnimationSkin.BonePose()
@@ -1064,22 +1232,22 @@ class RW4Exporter:
 
 		# 2. We need the final model space transformations used by the shader
 		# We will keep the 'm' used in the importer
+		# The pose is evaluated from the action itself, so we don't need to update the whole scene for every time
 		keyframe_poses = {}
-		for time in keyframe_times:
-			bpy.context.scene.frame_set(time)
-
+		for time, pose_matrices in pose_sampler.sample_pose_matrices(self.b_armature_object, action, keyframe_times):
 			poses = {}
 			for name, skin in self.bones_skin.items():
 				pose_bone = self.b_armature_object.pose.bones[name]
+				pose_matrix = pose_matrices[name]
 
 				# In importer:  world_r = m @ skin.matrix.inverted()
 				# In importer:  world_t = t + (m @ skin.translation)
-				world_r = pose_bone.matrix.to_3x3() @ pose_bone.bone.matrix_local.to_3x3().inverted()
+				world_r = pose_matrix.to_3x3() @ pose_bone.bone.matrix_local.to_3x3().inverted()
 
 				# in vertex shader, final pos would be world_r @ pos
-				# we need to move it to pose_bone.matrix.to_translation()
+				# we need to move it to pose_matrix.to_translation()
 				final_pos = world_r @ pose_bone.bone.head_local
-				world_t = pose_bone.matrix.to_translation() - final_pos
+				world_t = pose_matrix.to_translation() - final_pos
 
 				m = world_r @ skin.matrix
 				t = world_t - (m @ skin.translation)
@@ -1200,10 +1368,14 @@ class RW4Exporter:
 			keyframe_anim.flags = 3
 
 			if is_shape_key:
-				self.process_blend_shape_action(action, keyframe_anim)
+				with self.profiler.stage('process_blend_shape_action', action.name):
+					self.process_blend_shape_action(action, keyframe_anim)
 			else:
 				self.b_armature_object.animation_data.action = action
-				self.process_skeleton_action(action, keyframe_anim)
+				with self.profiler.stage('process_skeleton_action', action.name):
+					self.process_skeleton_action(action, keyframe_anim)
+
+			self.profiler.count('keyframes', sum(len(channel.keyframes) for channel in keyframe_anim.channels))
 
 			# Remove trailing numbers from action name
 			action_name = action.name.split('.')[0]
@@ -1282,6 +1454,17 @@ class RW4Exporter:
 			)
 			self.render_ware.add_object(self.bound_box)
 
+	def check_textures(self):
+		"""
+		Checks that the exported .dds files have not changed since they were read, so that the model is not
+		written with pixel data that does not match the texture format and size. This must be called
+		right before writing the file.
+		:raises IOError: If a texture file has been modified.
+		"""
+		for cached_texture in self.cached_textures:
+			if texture_cache.TextureCache.get_key(cached_texture.key[0]) != cached_texture.key:
+				raise IOError(f"'{cached_texture.key[0]}' has been modified during the export, export the model again")
+
 	def export_kdtree(self):
 		"""
 		Creates and exports the TriangleKDTreeProcedural based on the data collected from exported meshes.
@@ -1290,9 +1473,23 @@ class RW4Exporter:
 		kdtree = rw4_base.TriangleKDTreeProcedural(self.render_ware)
 		kdtree.bound_box = self.bound_box
 		kdtree.bound_box_2 = self.bound_box
-		kdtree.triangles = self.triangles
-		kdtree.vertices = self.vertices
-		kdtree.triangle_unknowns = self.triangle_unknowns
+		if self.vertices:
+			vertices = np.concatenate(self.vertices)
+			triangles = np.concatenate(self.triangles)
+			triangle_unknowns = np.concatenate(self.triangle_unknowns)
+
+			# The triangles must be sorted so that the ones in each leaf of the tree are contiguous
+			order, kdtree.unknown_data = rw4_kdtree.build_kdtree(vertices, triangles)
+			kdtree.vertices = vertices
+			kdtree.triangles = triangles[order]
+			kdtree.triangle_unknowns = triangle_unknowns[order]
+
+			# The bounds of the tree itself
+			if len(vertices):
+				kdtree.bound_box_2 = rw4_base.BoundingBox(
+					self.render_ware,
+					bound_box=[vertices[:, :3].min(axis=0).tolist(), vertices[:, :3].max(axis=0).tolist()]
+				)
 
 		self.render_ware.add_object(kdtree)
 
@@ -1371,18 +1568,31 @@ def get_active_collection():
 	print(f"Exporting from collection: {collection.name}")
 	return collection
 
-def export_rw4(file, export_symmetric, export_as_lod1):
+def export_rw4(file, export_symmetric, export_as_lod1, evaluated_shape_normals=False, warnings=None, profiler=None):
+	"""
+	Exports the active collection as a RenderWare4 model.
+	:param warnings: If it's a set, errors and warnings are added to it instead of being shown in a message box;
+	used when exporting without an user interface.
+	:param profiler: An optional ExportProfiler that measures the time of every export stage.
+	"""
 	# NOTE: We might not use Spore's conventional ordering of RW objects, since it's a lot easier to do it this way.
 	# Theoretically, this has no effect on the game so it should work fine.
 
 	current_keyframe = bpy.context.scene.frame_current
 	exporter = RW4Exporter()
+	exporter.evaluated_shape_normals = evaluated_shape_normals
+	if profiler is not None:
+		exporter.profiler = profiler
+	profiler = exporter.profiler
 
 	# Set active collection, or fall back to scene collection if missing or empty.
 	active_collection = get_active_collection()
 	if not active_collection.all_objects:
-		show_message_box("No objects to export in the active collection.",
-						 title="Export Error", icon="ERROR")
+		if warnings is not None:
+			warnings.add("No objects to export in the active collection.")
+		else:
+			show_message_box("No objects to export in the active collection.",
+							 title="Export Error", icon="ERROR")
 		return {'CANCELLED'}
 
 	# Detect if just one mesh and its armature are present. Used for gathering actions
@@ -1471,7 +1681,8 @@ def export_rw4(file, export_symmetric, export_as_lod1):
 						else:
 							for s in t.strips:
 								ignored_actions.append(s.action)
-			split_object(obj)
+			with profiler.stage('split_object', obj.name):
+				split_object(obj)
 
 	for action in bpy.data.actions:
 		# Disallow null actions
@@ -1480,27 +1691,43 @@ def export_rw4(file, export_symmetric, export_as_lod1):
 
 	# First process and export the skeleton (if any)
 	for obj in valid_armatures:
-		exporter.export_armature_object(obj)
+		with profiler.stage('export_armature_object', obj.name):
+			exporter.export_armature_object(obj)
 
 	# Then export meshes
 	for obj in valid_meshes:
-		exporter.export_mesh_object(obj)
+		with profiler.stage('export_mesh_object', obj.name):
+			exporter.export_mesh_object(obj)
 
 	exporter.export_bbox()
-	exporter.export_kdtree()
-	exporter.export_actions(ignored_actions, use_morphs = not export_as_lod1)
-	exporter.render_ware.write(file_io.FileWriter(file))
+	with profiler.stage('export_kdtree'):
+		exporter.export_kdtree()
+	with profiler.stage('export_actions'):
+		exporter.export_actions(ignored_actions, use_morphs = not export_as_lod1)
+	# Serialize the whole file in memory, and write it at once
+	with profiler.stage('RenderWare4.write') as record:
+		stream = file_io.ArrayFileWriter()
+		exporter.render_ware.write(stream)
+		record['bytes'] = len(stream)
+	with profiler.stage('write_file'):
+		exporter.check_textures()
+		stream.write_to(file)
 
 	# Export symmetric variant of this model and these actions
 	if export_symmetric:
-		export_rw4_symmetric(file, valid_armatures, valid_meshes, exporter.b_armature_actions, exporter.b_shape_keys_actions, export_as_lod1)
+		with profiler.stage('export_rw4_symmetric'):
+			export_rw4_symmetric(file, valid_armatures, valid_meshes, exporter.b_armature_actions, exporter.b_shape_keys_actions, export_as_lod1,
+								 evaluated_shape_normals, profiler, warnings=exporter.warnings)
 
 	# Reset frame
 	bpy.context.scene.frame_set(current_keyframe)
 	# Fix split meshes
-	remerge_objects()
+	with profiler.stage('remerge_objects'):
+		remerge_objects()
 
-	if exporter.warnings:
+	if warnings is not None:
+		warnings.update(exporter.warnings)
+	elif exporter.warnings:
 		show_multi_message_box(exporter.warnings, title=f"Exported with {len(exporter.warnings)} warnings", icon="ERROR")
 
 	print(f"Exported to {file.name}.")
@@ -1510,9 +1737,11 @@ def export_rw4(file, export_symmetric, export_as_lod1):
 
 
 
-def export_rw4_symmetric(file, armatures, meshes, armature_actions, shape_keys_actions, export_as_lod1):
+def export_rw4_symmetric(file, armatures, meshes, armature_actions, shape_keys_actions, export_as_lod1,
+						 evaluated_shape_normals=False, profiler=None, warnings=None):
 	# Mirrors the active collection's meshes and armatures across X axis,
 	# flips face normals, and mirrors armature action bone keyframes
+	# The warnings of the symmetric export are added to the `warnings` set, if given
 
 	# Store the current selection for later restoration
 	current_selection = bpy.context.active_object
@@ -1654,16 +1883,24 @@ def export_rw4_symmetric(file, armatures, meshes, armature_actions, shape_keys_a
 
 	# Start exporting
 	exporter_sym = RW4Exporter()
+	exporter_sym.evaluated_shape_normals = evaluated_shape_normals
+	if profiler is not None:
+		exporter_sym.profiler = profiler
 	exporter_sym.b_armature_actions = mirrored_actions
 	exporter_sym.b_shape_keys_actions = mirrored_shape_actions
 
+	profiler = exporter_sym.profiler
 	for arm in mirrored_armatures:
-		exporter_sym.export_armature_object(arm)
+		with profiler.stage('export_armature_object', arm.name):
+			exporter_sym.export_armature_object(arm)
 	for mesh in mirrored_objs:
-		exporter_sym.export_mesh_object(mesh)
+		with profiler.stage('export_mesh_object', mesh.name):
+			exporter_sym.export_mesh_object(mesh)
 	exporter_sym.export_bbox()
-	exporter_sym.export_kdtree()
-	exporter_sym.export_actions(ignored_actions, use_morphs = not export_as_lod1, mirrored = True)
+	with profiler.stage('export_kdtree', "symmetric"):
+		exporter_sym.export_kdtree()
+	with profiler.stage('export_actions', "symmetric"):
+		exporter_sym.export_actions(ignored_actions, use_morphs = not export_as_lod1, mirrored = True)
 
 	# Write symmetric model to file (append -symmetric)
 	sym_file_path = None
@@ -1672,8 +1909,14 @@ def export_rw4_symmetric(file, armatures, meshes, armature_actions, shape_keys_a
 		base, ext = os.path.splitext(file.name)
 		sym_file_path = base + "-symmetric" + ext
 
+	stream = file_io.ArrayFileWriter()
+	exporter_sym.render_ware.write(stream)
+	exporter_sym.check_textures()
 	with open(sym_file_path, 'wb') as sym_file:
-		exporter_sym.render_ware.write(file_io.FileWriter(sym_file))
+		stream.write_to(sym_file)
+
+	if warnings is not None:
+		warnings.update(exporter_sym.warnings)
 
 	# Restore the original selection
 	if current_selection and current_selection.name in bpy.data.objects:
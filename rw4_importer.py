@@ -4,13 +4,19 @@ from . import rw4_base, rw4_enums, rw4_material_config
 from .materials import rw_material_builder
 from .file_io import FileReader, FileWriter, ArrayFileReader, get_name
 from mathutils import Matrix, Quaternion, Vector
+import numpy as np
 import math
+import bisect
 import bpy
 import os
 from collections import OrderedDict
 from .message_box import show_message_box
 from . import mod_paths
 
+# Float blend weights are rounded to multiples of 1 / WEIGHT_LEVELS when importing, so that vertices with
+# almost the same weight are added to their vertex group in a single call
+WEIGHT_LEVELS = 65535
+
 def vec_roll_to_mat3(vec, roll):
 	target = Vector((0, 0.1, 0))
 	nor = vec.normalized()
@@ -51,33 +57,29 @@ class PoseBone:
 		self.s = s
 
 
-def interpolate_pose(animation, time, channel_index, keyframe_poses) -> PoseBone:
-	"""Returns the interpolated pose at 'time' for the given channel."""
-	# 1. Get the floor keyframe
-	floor_kf = None  # (time, pose)
-	for kf_time, pose_bones in sorted(keyframe_poses.items()):
-		if kf_time >= time:
-			break
-		if pose_bones[channel_index] is not None:
-			floor_kf = (kf_time, pose_bones[channel_index])
+def interpolate_pose(animation, time, channel_index, channel_times, channel_poses) -> PoseBone:
+	"""
+	Returns the interpolated pose at 'time' for the given channel.
+	:param channel_times: The sorted list of times that have a keyframe in this channel.
+	:param channel_poses: The PoseBone of every time in `channel_times`.
+	"""
+	# The last keyframe before 'time' and the first one after it
+	floor_index = bisect.bisect_left(channel_times, time) - 1
+	ceil_index = bisect.bisect_right(channel_times, time)
 
 	# No floor time? Malformed animation
-	if floor_kf is None:
+	if floor_index < 0:
 		raise rw4_base.ModelError(
 			f"Malformed animation: channel {channel_index} is missing floor keyframe for time {time}", animation)
 
-	# 2. Get the ceil keyframe
-	ceil_kf = None  # (time, pose)
-	for kf_time, pose_bones in sorted(keyframe_poses.items()):
-		if kf_time > time and pose_bones[channel_index] is not None:
-			ceil_kf = (kf_time, pose_bones[channel_index])
-			break
-
 	# No ceil time? Malformed animation
-	if ceil_kf is None:
+	if ceil_index == len(channel_times):
 		raise rw4_base.ModelError(
 			f"Malformed animation: channel {channel_index} is missing ceil keyframe for time {time}", animation)
 
+	floor_kf = (channel_times[floor_index], channel_poses[floor_index])
+	ceil_kf = (channel_times[ceil_index], channel_poses[ceil_index])
+
 	# Convert times to 0-1 range
 	floor_factor = floor_kf[0] / animation.length
 	ceil_factor = ceil_kf[0] / animation.length
@@ -89,6 +91,97 @@ def interpolate_pose(animation, time, channel_index, keyframe_poses) -> PoseBone
 	return PoseBone(r=r, t=t, s=s)
 
 
+def interpolate_missing_poses(animation, keyframe_poses):
+	"""
+	Interpolates the pose of every channel at the times where it doesn't have a keyframe.
+	:param keyframe_poses: A dictionary that maps every keyframe time to a list with the PoseBone of every channel,
+	or None if the channel doesn't have a keyframe at that time.
+	:returns: A dictionary that maps every keyframe time to a list with the interpolated PoseBone of every channel
+	that doesn't have a keyframe at that time, and None for the rest.
+	"""
+	times = sorted(keyframe_poses)
+	interpolated_poses = {time: [None] * len(animation.channels) for time in times}
+
+	for c in range(len(animation.channels)):
+		channel_times = []
+		channel_poses = []
+		missing_times = []
+		for time in times:
+			pose_bone = keyframe_poses[time][c]
+			if pose_bone is None:
+				missing_times.append(time)
+			else:
+				channel_times.append(time)
+				channel_poses.append(pose_bone)
+
+		for time in missing_times:
+			interpolated_poses[time][c] = interpolate_pose(animation, time, c, channel_times, channel_poses)
+
+	return interpolated_poses
+
+
+def get_bone_parents(bones):
+	"""
+	Returns the index of the bone whose transform is used as parent by every bone, or -1 if it has no parent.
+	This follows the same rules Spore uses when evaluating the skeleton, based on the flags of every bone.
+	"""
+	parents = []
+	branches = []  # Used as an stack
+	parent = -1
+	for b, bone in enumerate(bones):
+		parents.append(parent)
+
+		if bone.flags == rw4_base.SkeletonBone.TYPE_ROOT:
+			parent = b
+
+		elif bone.flags == rw4_base.SkeletonBone.TYPE_LEAF:
+			if branches:
+				parent = branches.pop()
+
+		elif bone.flags == rw4_base.SkeletonBone.TYPE_BRANCH:
+			branches.append(parent)
+			parent = b
+
+	return parents
+
+
+def quaternions_to_matrices(quaternions):
+	"""Converts an array of (..., 4) quaternions stored as (w, x, y, z) into an array of (..., 3, 3) matrices."""
+	w, x, y, z = np.moveaxis(np.asarray(quaternions, dtype=np.float64), -1, 0)
+	return np.stack((
+		np.stack((1.0 - 2.0 * (y*y + z*z), 2.0 * (x*y - w*z), 2.0 * (x*z + w*y)), axis=-1),
+		np.stack((2.0 * (x*y + w*z), 1.0 - 2.0 * (x*x + z*z), 2.0 * (y*z - w*x)), axis=-1),
+		np.stack((2.0 * (x*z - w*y), 2.0 * (y*z + w*x), 1.0 - 2.0 * (x*x + y*y)), axis=-1),
+	), axis=-2)
+
+
+def compute_pose_transforms(parents, rotations, locations, scales):
+	"""
+	Computes the model space transform of every bone for several poses at the same time.
+	:param parents: The parent index of every bone, as returned by get_bone_parents()
+	:param rotations: A (T, B, 3, 3) array with the local rotation matrix of every bone in every pose.
+	:param locations: A (T, B, 3) array with the local location of every bone in every pose.
+	:param scales: A (T, B, 3) array with the local scale of every bone in every pose.
+	:returns: A tuple (matrices, translations) of (T, B, 3, 3) and (T, B, 3) arrays.
+	"""
+	matrices = np.empty(rotations.shape, dtype=np.float64)
+	translations = np.empty(locations.shape, dtype=np.float64)
+
+	# Parents are always processed before their children
+	for b, parent in enumerate(parents):
+		# Apply the scale, removing the one inherited from the parent
+		scaled_m = rotations[:, b] * scales[:, b, None, :]
+		if parent == -1:
+			matrices[:, b] = scaled_m
+			translations[:, b] = locations[:, b]
+		else:
+			scaled_m /= scales[:, parent, :, None]
+			matrices[:, b] = matrices[:, parent] @ scaled_m
+			translations[:, b] = np.einsum('tij,tj->ti', matrices[:, parent], locations[:, b]) + translations[:, parent]
+
+	return matrices, translations
+
+
 class RW4ImporterSettings:
 	def __init__(self):
 		self.import_materials = True
@@ -116,6 +209,8 @@ class RW4Importer:
 		self.skins_ink = None
 		self.bones = []
 		self.skin_data = []
+		self.bone_parents = []
+		self.inverse_skin_matrices = None
 		self.b_animation_actions = []
 		self.base_bones = []
 		self.animation_bones = {}  # maps ID to list of channels, which are lists of PoseBone keyframes
@@ -138,10 +233,86 @@ class RW4Importer:
 		b_mesh.loops.add(len(indices))
 		b_mesh.polygons.add(tri_count)
 
-		b_mesh.loops.foreach_set("vertex_index", tuple(indices))
-		b_mesh.polygons.foreach_set("loop_start", [i * 3 for i in range(tri_count)])
-		b_mesh.polygons.foreach_set("loop_total", [3] * tri_count)
-		b_mesh.polygons.foreach_set("use_smooth", [True] * tri_count)
+		b_mesh.loops.foreach_set("vertex_index", indices.astype(np.int32))
+		b_mesh.polygons.foreach_set("loop_start", np.arange(0, tri_count * 3, 3, dtype=np.int32))
+		b_mesh.polygons.foreach_set("loop_total", np.full(tri_count, 3, dtype=np.int32))
+		b_mesh.polygons.foreach_set("use_smooth", np.ones(tri_count, dtype=bool))
+
+	@staticmethod
+	def set_mesh_texcoords(b_mesh, texcoords):
+		"""
+		Creates a new UV layer in the mesh from a per-vertex texcoords array. The loops must have already been added.
+		The V coordinate is flipped, since Spore uses the DirectX system.
+		"""
+		loop_vertices = np.empty(len(b_mesh.loops), dtype=np.int32)
+		b_mesh.loops.foreach_get("vertex_index", loop_vertices)
+
+		uvs = np.asarray(texcoords, dtype=np.float32)[loop_vertices, :2]
+		uvs[:, 1] *= -1.0
+
+		uv_layer = b_mesh.uv_layers.new()
+		uv_layer.data.foreach_set("uv", uvs.ravel())
+		return uv_layer
+
+	@staticmethod
+	def assign_vertex_groups(b_object, blend_indices, blend_weights, weight_divisor=1.0):
+		"""
+		Adds the vertices to the vertex groups of their bones. Blend indices are bone indices multiplied by 3,
+		as stored in Spore files. Vertices are grouped by (bone, weight) so that each group receives one call
+		per distinct weight, instead of one call per vertex. Integer weights are exact; float weights are rounded
+		to multiples of 1 / WEIGHT_LEVELS, otherwise almost every weight would be different.
+		:param b_object: The Blender object, which must already have one vertex group per bone.
+		:param blend_indices: A (vertex_count, influence_count) array of blend indices.
+		:param blend_weights: A (vertex_count, influence_count) array of blend weights.
+		:param weight_divisor: The weights are divided by this, e.g. 255 for ubyte weights.
+		"""
+		blend_indices = np.asarray(blend_indices)
+		blend_weights = np.asarray(blend_weights)
+		vertex_count, influence_count = blend_indices.shape
+
+		vertex_indices = np.repeat(np.arange(vertex_count, dtype=np.int64), influence_count)
+		bones = blend_indices.ravel().astype(np.int64) // 3
+		# The weights are grouped as integers, which are divided by `weight_divisor` when adding them
+		if np.issubdtype(blend_weights.dtype, np.integer):
+			weights = blend_weights.ravel().astype(np.int64)
+		else:
+			weights = np.round(blend_weights.ravel() * (WEIGHT_LEVELS / weight_divisor)).astype(np.int64)
+			weight_divisor = WEIGHT_LEVELS
+
+		mask = weights != 0
+		vertex_indices = vertex_indices[mask]
+		bones = bones[mask]
+		weights = weights[mask]
+		if len(weights) == 0:
+			return
+
+		# If a vertex references the same bone more than once, the last influence wins (as with 'REPLACE')
+		keys = vertex_indices * (int(bones.max()) + 1) + bones
+		_, last = np.unique(keys[::-1], return_index=True)
+		keep = len(keys) - 1 - last
+		vertex_indices = vertex_indices[keep]
+		bones = bones[keep]
+		weights = weights[keep]
+
+		order = np.lexsort((weights, bones))
+		vertex_indices = vertex_indices[order]
+		bones = bones[order]
+		weights = weights[order]
+
+		boundaries = np.flatnonzero((bones[1:] != bones[:-1]) | (weights[1:] != weights[:-1])) + 1
+		starts = np.concatenate(([0], boundaries))
+		ends = np.concatenate((boundaries, [len(bones)]))
+		for start, end in zip(starts, ends):
+			b_object.vertex_groups[int(bones[start])].add(
+				vertex_indices[start:end].tolist(), float(weights[start]) / weight_divisor, 'REPLACE')
+
+	@staticmethod
+	def set_mesh_normals(b_mesh, normals):
+		"""Sets a (vertex_count, 3) array of normals as the custom split normals of the mesh."""
+		# Before Blender 4.1 custom normals are ignored unless auto smooth is enabled
+		if bpy.app.version < (4, 1, 0):
+			b_mesh.use_auto_smooth = True
+		b_mesh.normals_split_custom_set_from_vertices(np.asarray(normals, dtype=np.float32).tolist())
 
 	def import_blend_shape_mesh(self, mesh_link):
 		buffers = self.render_ware.get_objects(rw4_base.BlendShapeBuffer.type_code)
@@ -169,14 +340,13 @@ class RW4Importer:
 
 		self.meshes_dict[None] = b_object  # For no vertex buffer
 
-		stream = ArrayFileReader(buffer.data)
+		# The base positions followed by the offsets of every shape
+		shape_positions = buffer.get_shape_vectors(rw4_base.BlendShapeBuffer.INDEX_POSITION)
+		positions = shape_positions[0]
 		vertex_count = buffer.vertex_count
 
-		stream.seek(buffer.offsets[rw4_base.BlendShapeBuffer.INDEX_POSITION])
 		b_mesh.vertices.add(vertex_count)
-		for i in range(vertex_count):
-			b_mesh.vertices[i].co = stream.unpack('<fff')
-			stream.skip_bytes(4)
+		b_mesh.vertices.foreach_set("co", positions.ravel())
 
 		self.process_index_buffer(mesh_link.mesh.index_buffer, b_mesh)
 		b_mesh.update(calc_edges=True)
@@ -184,28 +354,22 @@ class RW4Importer:
 		shape_key = b_object.shape_key_add(name='Basis')
 		shape_key.interpolation = 'KEY_LINEAR'
 
-		for i, shape_id in enumerate(blend_shapes[0].shape_ids):
+		shape_ids = blend_shapes[0].shape_ids
+		if len(shape_ids) > buffer.shape_count:
+			raise rw4_base.ModelError("Malformed model: BlendShape has more shapes than its BlendShapeBuffer")
+
+		shape_positions = shape_positions[1:len(shape_ids) + 1] + positions
+
+		for i, shape_id in enumerate(shape_ids):
 			shape_key = b_object.shape_key_add(name=get_name(shape_id))
 			shape_key.interpolation = 'KEY_LINEAR'
-
-			stream.seek(buffer.offsets[rw4_base.BlendShapeBuffer.INDEX_POSITION] + 16*(i+1)*vertex_count)
-			for v in range(vertex_count):
-				shape_key.data[v].co = Vector(stream.unpack('<fff')) + b_mesh.vertices[v].co
-				stream.skip_bytes(4)
+			shape_key.data.foreach_set("co", shape_positions[i].ravel())
 
 		b_mesh.shape_keys.use_relative = True
 
-		if buffer.offsets[rw4_base.BlendShapeBuffer.INDEX_TEXCOORD] != -1:
-			stream.seek(buffer.offsets[rw4_base.BlendShapeBuffer.INDEX_TEXCOORD])
-			texcoords = [None] * vertex_count
-			for i in range(vertex_count):
-				texcoords[i] = stream.unpack('<ff')
-				stream.skip_bytes(8)
-
-			uv_layer = b_mesh.uv_layers.new()
-			for loop in b_mesh.loops:
-				uv = texcoords[loop.vertex_index]
-				uv_layer.data[loop.index].uv = (uv[0], -uv[1])
+		texcoords = buffer.get_texcoords()
+		if texcoords is not None:
+			self.set_mesh_texcoords(b_mesh, texcoords)
 
 		# Configure skeleton if any
 		if self.b_armature is not None and buffer.offsets[rw4_base.BlendShapeBuffer.INDEX_BLENDINDICES] != -1:
@@ -213,26 +377,15 @@ class RW4Importer:
 			b_object.parent = self.b_armature_object
 			self.b_armature_object.name = b_object.name + "-Armature"
 
-			blend_indices = [-1] * vertex_count
-			blend_weights = [0.0] * vertex_count
-			stream.seek(buffer.offsets[rw4_base.BlendShapeBuffer.INDEX_BLENDINDICES])
-			fmt = '<' + 'H'*buffer.bone_indices_count
-			for i in range(vertex_count):
-				blend_indices[i] = stream.unpack(fmt)
-
-			stream.seek(buffer.offsets[rw4_base.BlendShapeBuffer.INDEX_BLENDWEIGHTS])
-			fmt = '<' + 'f' * buffer.bone_indices_count
-			for i in range(vertex_count):
-				blend_weights[i] = stream.unpack(fmt)
+			blend_indices = buffer.get_blend_indices()
+			blend_weights = buffer.get_blend_weights()
+			if blend_weights is None:
+				raise rw4_base.ModelError("Malformed model: BlendShapeBuffer does not have BLENDWEIGHTS")
 
 			for bbone in self.b_armature.bones:
 				b_object.vertex_groups.new(name=bbone.name)
 
-			for v, (blend_index, blend_weight) in enumerate(zip(blend_indices, blend_weights)):
-				for i in range(buffer.bone_indices_count):
-					if blend_weight[i] != 0:
-						b_object.vertex_groups[blend_index[i] // 3].add(
-							[v], blend_weight[i], 'REPLACE')
+			self.assign_vertex_groups(b_object, blend_indices, blend_weights)
 
 			b_modifier = b_object.modifiers.new(f"Skeleton: {self.b_armature.name}", 'ARMATURE')
 			b_modifier.object = self.b_armature_object
@@ -257,29 +410,26 @@ class RW4Importer:
 		self.meshes_dict[vbuffer] = b_object
 
 		# Add all vertices and triangles
-		vertices = vbuffer.process_data(self.file)
-		b_mesh.vertices.add(len(vertices))
-		for i, v in enumerate(vertices):
-			b_mesh.vertices[i].co = v.position
+		vertices = vbuffer.process_data_arrays(self.file)
+		positions = vertices['position']
+		b_mesh.vertices.add(len(positions))
+		b_mesh.vertices.foreach_set("co", np.ascontiguousarray(positions, dtype=np.float32).ravel())
 
 		self.process_index_buffer(mesh_link.mesh.index_buffer, b_mesh)
 
 		if vbuffer.has_element(rw4_enums.RWDECL_TEXCOORD0):
-			uv_layer = b_mesh.uv_layers.new()
-			for loop in b_mesh.loops:
-				uv = vertices[loop.vertex_index].texcoord0
-				uv_layer.data[loop.index].uv = (uv[0], -uv[1])
+			self.set_mesh_texcoords(b_mesh, vertices['texcoord0'])
 
 		# TODO: vertex colors?
 
 		b_mesh.update(calc_edges=True)
 
-		# Apply the normals after updating
-		 # In Blender 3 'normal' is read-only (and apparently it was being ignored anyways)
-		if bpy.app.version[0] == 2:
-			if vbuffer.has_element(rw4_enums.RWDECL_NORMAL):
-				for i, v in enumerate(vertices):
-					b_mesh.vertices[i].normal = rw4_enums.unpack_normals(v.normal)
+		# Apply the normals after updating, as custom split normals (vertex normals are read-only since Blender 3)
+		if vbuffer.has_element(rw4_enums.RWDECL_NORMAL):
+			normals = vertices['normal']
+			if normals.dtype == np.uint8:
+				normals = rw4_enums.unpack_normals_array(normals)
+			self.set_mesh_normals(b_mesh, normals[:, :3])
 
 		# Configure skeleton if any
 		if self.b_armature is not None:
@@ -290,11 +440,7 @@ class RW4Importer:
 			for bbone in self.b_armature.bones:
 				b_object.vertex_groups.new(name=bbone.name)
 
-			for v, vertex in enumerate(vertices):
-				for i in range(4):
-					if vertex.blendWeights[i] != 0:
-						b_object.vertex_groups[vertex.blendIndices[i] // 3].add(
-							[v], vertex.blendWeights[i] / 255.0, 'REPLACE')
+			self.assign_vertex_groups(b_object, vertices['blendIndices'], vertices['blendWeights'], 255.0)
 
 			b_modifier = b_object.modifiers.new(f"Skeleton: {self.b_armature.name}", 'ARMATURE')
 			b_modifier.object = self.b_armature_object
@@ -360,7 +506,8 @@ class RW4Importer:
 			material_index += 1
 
 		for b_mesh in self.b_meshes:
-			b_mesh.validate()
+			# Keep the custom split normals
+			b_mesh.validate(clean_customdata=False)
 
 	def get_bound_radius(self):
 		bound_box = self.render_ware.get_objects(rw4_base.BoundingBox.type_code)
@@ -385,6 +532,9 @@ class RW4Importer:
 
 		self.bones = self.skins_ink.skeleton.bones
 		self.skin_data = self.skins_ink.animation_skin.data
+		self.bone_parents = get_bone_parents(self.bones)
+		skin_matrices = np.array([skin.matrix for skin in self.skin_data], dtype=np.float64).reshape(-1, 3, 3)
+		self.inverse_skin_matrices = np.linalg.inv(skin_matrices)
 		pose_r = []
 		pose_t = []
 		for skin in self.skin_data:
@@ -466,53 +616,43 @@ class RW4Importer:
 		# This is the same algorithm used by Spore; the result is what is sent to the DirectX shader
 		# These are the transforms in model space from the rest pose to the animated pose
 		# This assumes that parents will always be processed before their children
-		# List of channels, which are list of PoseBone keyframes containing the transformation
+		# We must do it for every channel for every time even if the channel didn't have a keyframe there,
+		# because it might be used by other channels
+		times = sorted(keyframe_poses)
+		bone_count = min(len(animation.channels), len(self.bones), len(self.skin_data))
+		interpolated_poses = interpolate_missing_poses(animation, keyframe_poses)
+
+		has_keyframe = np.zeros((len(times), bone_count), dtype=bool)
+		quaternions = np.empty((len(times), bone_count, 4), dtype=np.float64)
+		locations = np.empty((len(times), bone_count, 3), dtype=np.float64)
+		scales = np.empty((len(times), bone_count, 3), dtype=np.float64)
+		for k, time in enumerate(times):
+			pose_bones = keyframe_poses[time]
+			missing_poses = interpolated_poses[time]
+			for c in range(bone_count):
+				pose_bone = pose_bones[c]
+				has_keyframe[k, c] = pose_bone is not None
+				if pose_bone is None:
+					pose_bone = missing_poses[c]
+
+				quaternions[k, c] = pose_bone.r
+				locations[k, c] = pose_bone.t
+				scales[k, c] = pose_bone.s
+
+		matrices, translations = compute_pose_transforms(
+			self.bone_parents[:bone_count], quaternions_to_matrices(quaternions), locations, scales)
+
+		# Transforms from the rest pose, as 4x4 matrices
+		skin_translations = np.array([skin.translation for skin in self.skin_data[:bone_count]], dtype=np.float64)
+		transforms = np.zeros((len(times), bone_count, 4, 4), dtype=np.float64)
+		transforms[:, :, :3, :3] = matrices @ self.inverse_skin_matrices[:bone_count]
+		transforms[:, :, :3, 3] = translations + np.einsum('tbij,bj->tbi', matrices, skin_translations)
+		transforms[:, :, 3, 3] = 1.0
+
+		# List of channels, which are list of Matrix keyframes containing the transformation
 		channel_keyframes = [[] for _ in animation.channels]
-
-		# Process for every channel for every time
-		# We must do it even if the channel didn't have a keyframe there, because it might be used by other channels
-		for time, pose_bones in sorted(keyframe_poses.items()):
-			branches = []  # Used as an stack
-			parent_rot = Matrix.Identity(3)
-			parent_loc = Vector((0, 0, 0))
-			parent_scale = Vector((1.0, 1.0, 1.0))  # inverse scale
-
-			for c, (pose_bone, bone, skin) in enumerate(zip(pose_bones, self.bones, self.skin_data)):
-				skip_bone = pose_bone is None
-				if skip_bone:
-					pose_bone = interpolate_pose(animation, time, c, keyframe_poses)
-
-				# Apply the scale
-				scale_matrix = Matrix.Diagonal(pose_bone.s)
-				parent_inv_scale = \
-					Matrix.Diagonal((1.0 / parent_scale.x, 1.0 / parent_scale.y, 1.0 / parent_scale.z))
-				scaled_m = parent_inv_scale @ (pose_bone.r.to_matrix() @ scale_matrix)
-				m = parent_rot @ scaled_m
-
-				t = parent_rot @ pose_bone.t + parent_loc
-
-				if not skip_bone:
-					dst_r = m @ skin.matrix.inverted()
-					dst_t = t + (m @ skin.translation)
-
-					#for i in range(3):
-					#    print(f"skin_bones_data += struct.pack('ffff', {dst_r[i][0]}, {dst_r[i][1]}, {dst_r[i][2]}, {dst_t[i]})")
-					channel_keyframes[c].append(Matrix.Translation(dst_t) @ dst_r.to_4x4())
-
-				if bone.flags == rw4_base.SkeletonBone.TYPE_ROOT:
-					parent_rot = m
-					parent_loc = t
-					parent_scale = pose_bone.s
-
-				elif bone.flags == rw4_base.SkeletonBone.TYPE_LEAF:
-					if branches:
-						parent_rot, parent_loc, parent_scale = branches.pop()
-
-				elif bone.flags == rw4_base.SkeletonBone.TYPE_BRANCH:
-					branches.append((parent_rot, parent_loc, parent_scale))
-					parent_rot = m
-					parent_loc = t
-					parent_scale = pose_bone.s
+		for c in range(bone_count):
+			channel_keyframes[c] = [Matrix(transform) for transform in transforms[has_keyframe[:, c], c].tolist()]
 
 		return channel_keyframes
 
@@ -753,15 +893,12 @@ class RW4Importer:
 
 
 def import_rw4(file, filepath, settings):
-	file_reader = FileReader(file)
-
-	render_ware = rw4_base.RenderWare4()
-
-	render_ware.read(file_reader)
-
-	importer = RW4Importer(render_ware, file_reader, filepath, settings)
 	try:
-		importer.process()
+		# Memory-map the file, so resources are zero-copy views of it that are only loaded from disk when used;
+		# everything is imported before the mapping is closed
+		with rw4_base.open_render_ware(file) as render_ware:
+			importer = RW4Importer(render_ware, None, filepath, settings)
+			importer.process()
 	except rw4_base.ModelError as e:
 		show_message_box(str(e), "Import Error")
 
@@ -0,0 +1,232 @@
+"""
+Inspects RenderWare4 files without Blender, using all the CPU cores. For every .rw4 file, it reports the
+section table, the vertex and triangle counts, the bones, the animations and the texture formats as JSON,
+and flags the files that cannot be read or whose data is inconsistent.
+
+	python rw4_inspect.py path/to/folder other/file.rw4 -o report.json
+
+Folders are searched recursively. Outside Blender, this needs the 'numpy' and 'mathutils' packages.
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+import types
+from concurrent.futures import ProcessPoolExecutor
+
+if not __package__:
+	# When run as a script, load the add-on folder as a package without executing its __init__.py,
+	# which needs Blender
+	__package__ = "sporemodder"
+	if __package__ not in sys.modules:
+		_package = types.ModuleType(__package__)
+		_package.__path__ = [os.path.dirname(os.path.abspath(__file__))]
+		sys.modules[__package__] = _package
+
+from . import rw4_base, rw4_enums
+from .file_io import get_name
+
+RW4_MAGIC = b'\x89RW4w32\x00'
+
+# Errors that can happen when reading a malformed file
+READ_ERRORS = (rw4_base.ModelError, IOError, ValueError, IndexError, KeyError, struct.error)
+
+
+def get_texture_format_name(texture_format):
+	"""
+	:returns: The name of a Direct3D texture format, or its FourCC code for compressed formats like DXT5.
+	"""
+	for name, value in vars(rw4_enums).items():
+		if name.startswith("D3DFMT_") and value == texture_format:
+			return name[len("D3DFMT_"):]
+
+	four_cc = texture_format.to_bytes(4, 'little')
+	if all(32 <= c < 127 for c in four_cc):
+		return four_cc.decode('ascii')
+	return f"0x{texture_format:x}"
+
+
+def get_type_name(type_code):
+	object_class = rw4_base.get_object_class(type_code)
+	return object_class.__name__ if object_class is not None else None
+
+
+def check_objects(render_ware, problems):
+	"""
+	Decodes the buffers of the file, adding a description of every inconsistency to `problems`.
+	"""
+	for vertex_buffer in render_ware.get_objects(rw4_base.VertexBuffer.type_code):
+		try:
+			vertex_buffer.process_data_arrays(None)
+		except READ_ERRORS as e:
+			problems.append(f"VertexBuffer {render_ware.get_index(vertex_buffer)}: {e}")
+
+	for index_buffer in render_ware.get_objects(rw4_base.IndexBuffer.type_code):
+		try:
+			index_buffer.process_data(None)
+		except READ_ERRORS as e:
+			problems.append(f"IndexBuffer {render_ware.get_index(index_buffer)}: {e}")
+
+	blend_shapes = render_ware.get_objects(rw4_base.BlendShape.type_code)
+	blend_shape_buffers = render_ware.get_objects(rw4_base.BlendShapeBuffer.type_code)
+	if blend_shapes and len(blend_shape_buffers) != 1:
+		problems.append("Malformed model: missing BlendShapeBuffer")
+	for buffer in blend_shape_buffers:
+		if buffer.offsets[rw4_base.BlendShapeBuffer.INDEX_POSITION] == -1:
+			problems.append("Malformed model: BlendShapeBuffer does not have POSITION")
+		try:
+			for index in (rw4_base.BlendShapeBuffer.INDEX_POSITION, rw4_base.BlendShapeBuffer.INDEX_NORMAL,
+						  rw4_base.BlendShapeBuffer.INDEX_TANGENT):
+				buffer.get_shape_vectors(index)
+			buffer.get_texcoords()
+			buffer.get_blend_indices()
+			buffer.get_blend_weights()
+		except READ_ERRORS as e:
+			problems.append(f"BlendShapeBuffer: {e}")
+
+	for raster in render_ware.get_objects(rw4_base.Raster.type_code):
+		if raster.texture_data is None:
+			problems.append(f"Raster {render_ware.get_index(raster)} has no texture data")
+
+
+def inspect_file(path):
+	"""
+	Reads a RenderWare4 file and returns a dictionary that describes its contents.
+	If the file is malformed, 'error' or 'problems' explain why.
+	"""
+	report = {
+		'path': path,
+		'size': 0,
+		'error': None,
+		'problems': [],
+	}
+
+	try:
+		report['size'] = os.path.getsize(path)
+		with open(path, 'rb') as file:
+			if file.read(len(RW4_MAGIC)) != RW4_MAGIC:
+				raise IOError("Not a RenderWare4 file")
+			file.seek(0)
+			# The mapping of the file is closed as soon as the report is built
+			with rw4_base.open_render_ware(file) as render_ware:
+				header = render_ware.header
+				report['rw_type_code'] = header.rw_type_code
+				report['sections'] = [
+					{
+						'index': i,
+						'type_code': f"0x{obj.section_info.type_code:x}" if obj is not None else None,
+						'type': get_type_name(obj.section_info.type_code) if obj is not None else None,
+						'offset': obj.section_info.p_data if obj is not None else None,
+						'size': obj.section_info.data_size if obj is not None else None,
+					}
+					for i, obj in enumerate(render_ware.objects)
+				]
+
+				meshes = render_ware.get_objects(rw4_base.Mesh.type_code)
+				report['meshes'] = [
+					{
+						'vertex_count': mesh.vertex_count,
+						'triangle_count': mesh.triangle_count,
+						'primitive_type': mesh.primitive_type,
+					}
+					for mesh in meshes
+				]
+				report['vertex_count'] = sum(buffer.vertex_count for buffer in render_ware.get_objects(
+					rw4_base.VertexBuffer.type_code))
+				report['triangle_count'] = sum(mesh.triangle_count for mesh in meshes)
+
+				blend_shape_buffers = render_ware.get_objects(rw4_base.BlendShapeBuffer.type_code)
+				if blend_shape_buffers:
+					report['vertex_count'] += sum(buffer.vertex_count for buffer in blend_shape_buffers)
+					report['shape_count'] = sum(buffer.shape_count for buffer in blend_shape_buffers)
+
+				skeletons = render_ware.get_objects(rw4_base.Skeleton.type_code)
+				report['bone_count'] = sum(len(skeleton.bones) for skeleton in skeletons)
+
+				report['animations'] = []
+				for animations in render_ware.get_objects(rw4_base.Animations.type_code):
+					for name, animation in animations.animations.items():
+						if animation is None:
+							report['problems'].append(f"Animation {get_name(name)} has no KeyframeAnim")
+							continue
+						report['animations'].append({
+							'name': get_name(name),
+							'length': animation.length,
+							'channel_count': len(animation.channels),
+						})
+
+				report['textures'] = [
+					{
+						'format': get_texture_format_name(raster.texture_format),
+						'width': raster.width,
+						'height': raster.height,
+						'mipmap_levels': raster.mipmap_levels,
+					}
+					for raster in render_ware.get_objects(rw4_base.Raster.type_code)
+				]
+
+				check_objects(render_ware, report['problems'])
+
+	except (*READ_ERRORS, OSError) as e:
+		report['error'] = f"{type(e).__name__}: {e}"
+
+	report['malformed'] = report['error'] is not None or bool(report['problems'])
+	return report
+
+
+def find_rw4_files(paths):
+	files = []
+	for path in paths:
+		if os.path.isdir(path):
+			for root, dirs, names in os.walk(path):
+				dirs.sort()
+				files.extend(os.path.join(root, name) for name in sorted(names) if name.lower().endswith(".rw4"))
+		else:
+			files.append(path)
+	return files
+
+
+def inspect_files(paths, max_workers=None):
+	"""
+	Inspects several files at the same time, in separate processes.
+	:returns: The list of reports, in the same order as `paths`.
+	"""
+	if len(paths) <= 1 or max_workers == 1:
+		return [inspect_file(path) for path in paths]
+
+	with ProcessPoolExecutor(max_workers=max_workers) as executor:
+		# Small chunks keep all the workers busy without sending every file separately
+		chunk_size = max(1, min(32, len(paths) // ((max_workers or os.cpu_count() or 1) * 4)))
+		return list(executor.map(inspect_file, paths, chunksize=chunk_size))
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Inspect RenderWare4 (.rw4) files and report malformed ones.")
+	parser.add_argument('paths', nargs='+', help="The .rw4 files or the folders that contain them.")
+	parser.add_argument('-o', '--output', help="Write the JSON report to this file instead of the standard output.")
+	parser.add_argument('-j', '--jobs', type=int, default=None, help="The number of processes to use.")
+	parser.add_argument('--malformed-only', action='store_true', help="Only report the malformed files.")
+	args = parser.parse_args()
+
+	reports = inspect_files(find_rw4_files(args.paths), args.jobs)
+	file_count = len(reports)
+	malformed_count = sum(1 for report in reports if report['malformed'])
+
+	if args.malformed_only:
+		reports = [report for report in reports if report['malformed']]
+
+	if args.output:
+		with open(args.output, 'w') as file:
+			json.dump(reports, file, indent=4)
+	else:
+		json.dump(reports, sys.stdout, indent=4)
+		sys.stdout.write("\n")
+
+	print(f"Inspected {file_count} files, {malformed_count} malformed.", file=sys.stderr)
+	return 1 if malformed_count else 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,241 @@
+"""
+Builds the triangle KD-trees stored in TriangleKDTreeProcedural, which the game uses for collisions and picking.
+This module does not depend on Blender.
+
+The tree is made of branch nodes, each one stored as (parent, axis, left_content, left_index, right_content,
+right_index, left_max, right_min), which is the format of TriangleKDTreeProcedural.unknown_data:
+ - parent: The index of the parent branch node; the root node uses 0.
+ - axis: The axis of the split, 0 for X, 1 for Y and 2 for Z.
+ - content, index: For a child that is another branch node, content is BRANCH_CONTENT and index is its node index.
+   For a leaf, content is the number of triangles in the leaf and index is the first of them.
+ - left_max: The maximum coordinate along the axis of the triangles of the left child.
+ - right_min: The minimum coordinate along the axis of the triangles of the right child.
+
+Every triangle belongs to exactly one leaf, and the triangles of each leaf are contiguous,
+so the triangles must be reordered as the builder says.
+"""
+
+import numpy as np
+
+# The content of a child reference that points to another branch node (0xFFFFFFFF, as a signed int)
+BRANCH_CONTENT = -1
+
+
+def _surface_areas(bbox_min, bbox_max):
+	extent = bbox_max - bbox_min
+	return 2.0 * (extent[..., 0] * extent[..., 1] + extent[..., 1] * extent[..., 2] + extent[..., 2] * extent[..., 0])
+
+
+def _segment_ids(counts):
+	"""For segments of the given lengths, returns the segment index of every element."""
+	return np.repeat(np.arange(len(counts)), counts)
+
+
+def _find_splits(tri_min, tri_max, centroids, counts, bin_count):
+	"""
+	Finds the split with the lowest surface area heuristic cost of several nodes at the same time, binning the
+	triangle centroids on every axis. The triangles of every node are contiguous in the arrays.
+	:returns: A tuple of arrays (costs, axes, splits). The cost is the sum of area * triangle count of both sides,
+	or inf if the node can't be split; triangles whose bin is greater than `split` go to the right child.
+	"""
+	node_count = len(counts)
+	offsets = np.cumsum(counts) - counts
+	segments = _segment_ids(counts)
+
+	best_costs = np.full(node_count, np.inf)
+	best_axes = np.zeros(node_count, dtype=np.int64)
+	best_splits = np.zeros(node_count, dtype=np.int64)
+
+	for axis in range(3):
+		values = centroids[:, axis]
+		centroid_min = np.minimum.reduceat(values, offsets)
+		extent = np.maximum.reduceat(values, offsets) - centroid_min
+		scale = np.divide(bin_count, extent, out=np.zeros(node_count), where=extent > 0.0)
+
+		bins = ((values - centroid_min[segments]) * scale[segments]).astype(np.int64)
+		np.minimum(bins, bin_count - 1, out=bins)
+
+		keys = segments * bin_count + bins
+		bin_counts = np.bincount(keys, minlength=node_count * bin_count)
+		used_bins = np.flatnonzero(bin_counts)
+		order = np.argsort(keys, kind='stable')
+		starts = (np.cumsum(bin_counts) - bin_counts)[used_bins]
+
+		bin_min = np.full((node_count * bin_count, 3), np.inf)
+		bin_max = np.full((node_count * bin_count, 3), -np.inf)
+		bin_min[used_bins] = np.minimum.reduceat(tri_min[order], starts, axis=0)
+		bin_max[used_bins] = np.maximum.reduceat(tri_max[order], starts, axis=0)
+		bin_min = bin_min.reshape(node_count, bin_count, 3)
+		bin_max = bin_max.reshape(node_count, bin_count, 3)
+		bin_counts = bin_counts.reshape(node_count, bin_count)
+
+		# Bounds and counts of the left side when splitting after each bin, and of the right side
+		left_min = np.minimum.accumulate(bin_min[:, :-1], axis=1)
+		left_max = np.maximum.accumulate(bin_max[:, :-1], axis=1)
+		right_min = np.minimum.accumulate(bin_min[:, :0:-1], axis=1)[:, ::-1]
+		right_max = np.maximum.accumulate(bin_max[:, :0:-1], axis=1)[:, ::-1]
+		left_counts = np.cumsum(bin_counts, axis=1)[:, :-1]
+		right_counts = counts[:, None] - left_counts
+
+		with np.errstate(invalid='ignore'):
+			costs = _surface_areas(left_min, left_max) * left_counts + \
+				_surface_areas(right_min, right_max) * right_counts
+		costs[(left_counts == 0) | (right_counts == 0)] = np.inf
+
+		splits = np.argmin(costs, axis=1)
+		axis_costs = costs[np.arange(node_count), splits]
+		better = axis_costs < best_costs
+		best_costs[better] = axis_costs[better]
+		best_axes[better] = axis
+		best_splits[better] = splits[better]
+
+	return best_costs, best_axes, best_splits
+
+
+def build_kdtree(vertices, triangles, max_leaf_size=8, bin_count=32, traversal_cost=2.0, intersection_cost=1.0,
+				 max_depth=48):
+	"""
+	Builds a KD-tree over the given triangles using a binned surface area heuristic (SAH).
+	All the nodes of each level of the tree are processed at the same time in linear time,
+	so the whole build is O(n log n).
+
+	:param vertices: A (N, 3) or (N, 4) array of vertex positions.
+	:param triangles: A (M, 3) or (M, 4) array of vertex indices.
+	:param max_leaf_size: Nodes with more triangles than this are always split.
+	:param bin_count: The number of split candidates tested on each axis.
+	:param traversal_cost: The estimated cost of visiting a branch node, relative to `intersection_cost`.
+	:param intersection_cost: The estimated cost of testing a triangle.
+	:param max_depth: Below this depth, nodes are split in half instead of using the heuristic.
+	:returns: A tuple (order, nodes), where `order` is an array with the new order of the triangles,
+	and `nodes` is the list of branch nodes. If all triangles fit in a single leaf, there are no nodes.
+	"""
+	vertices = np.asarray(vertices, dtype=np.float64)
+	triangles = np.asarray(triangles, dtype=np.int64)
+	triangle_count = len(triangles)
+
+	corners = vertices[triangles[:, :3], :3]
+	tri_min = corners.min(axis=1)
+	tri_max = corners.max(axis=1)
+	centroids = (tri_min + tri_max) * 0.5
+
+	# The triangles of every node are always a contiguous range of `order`
+	order = np.arange(triangle_count)
+
+	# A binary tree with single-triangle leaves has triangle_count - 1 branch nodes at most
+	capacity = max(triangle_count - 1, 0)
+	node_ints = np.zeros((capacity, 6), dtype=np.int64)
+	node_extents = np.zeros((capacity, 2), dtype=np.float64)
+	node_count = 0
+
+	# The nodes of the current level: triangle range, index of the parent branch node (-1 for the root) and side
+	starts = np.zeros(1 if triangle_count else 0, dtype=np.int64)
+	ends = np.full(len(starts), triangle_count, dtype=np.int64)
+	parents = np.full(len(starts), -1, dtype=np.int64)
+	sides = np.zeros(len(starts), dtype=np.int64)
+	depth = 0
+
+	while len(starts):
+		counts = ends - starts
+		is_branch = np.zeros(len(starts), dtype=bool)
+		axes = np.zeros(len(starts), dtype=np.int64)
+		# For every triangle of the nodes that are split, whether it goes to the right child
+		candidates = np.flatnonzero(counts > 1)
+
+		if len(candidates):
+			candidate_counts = counts[candidates]
+			segments = _segment_ids(candidate_counts)
+			local_offsets = np.cumsum(candidate_counts) - candidate_counts
+			positions = starts[candidates][segments] + np.arange(len(segments)) - local_offsets[segments]
+			tris = order[positions]
+
+			# There is no point in having more bins than triangles
+			level_bin_count = int(min(bin_count, max(4, candidate_counts.max())))
+			if depth < max_depth:
+				costs, axes[candidates], splits = _find_splits(
+					tri_min[tris], tri_max[tris], centroids[tris], candidate_counts, level_bin_count)
+			else:
+				costs = np.full(len(candidates), np.inf)
+				splits = np.zeros(len(candidates), dtype=np.int64)
+
+			node_min = np.minimum.reduceat(tri_min[tris], local_offsets, axis=0)
+			node_max = np.maximum.reduceat(tri_max[tris], local_offsets, axis=0)
+			node_areas = np.maximum(_surface_areas(node_min, node_max), 1e-12)
+			split_costs = traversal_cost + intersection_cost * costs / node_areas
+
+			use_heuristic = np.isfinite(costs) & (
+				(candidate_counts > max_leaf_size) | (split_costs < intersection_cost * candidate_counts))
+			# When there is no valid split (for example, all the centroids are the same), split in half
+			use_half = ~np.isfinite(costs) & (candidate_counts > max_leaf_size)
+			is_branch[candidates] = use_heuristic | use_half
+			axes[candidates[use_half]] = np.argmax(node_max - node_min, axis=1)[use_half]
+
+			# Recompute the bins of the chosen axis to know on which side every triangle goes
+			candidate_axes = axes[candidates]
+			values = centroids[tris, candidate_axes[segments]]
+			centroid_min = np.minimum.reduceat(values, local_offsets)
+			extent = np.maximum.reduceat(values, local_offsets) - centroid_min
+			scale = np.divide(level_bin_count, extent, out=np.zeros(len(candidates)), where=extent > 0.0)
+			bins = np.minimum(((values - centroid_min[segments]) * scale[segments]).astype(np.int64), level_bin_count - 1)
+			goes_right = np.where(use_half[segments],
+								  np.arange(len(segments)) - local_offsets[segments] >= candidate_counts[segments] // 2,
+								  bins > splits[segments])
+
+			# Partition the triangles of every split node, keeping the relative order
+			split_mask = is_branch[candidates][segments]
+			split_positions = positions[split_mask]
+			child_keys = segments[split_mask] * 2 + goes_right[split_mask]
+			partition = np.argsort(child_keys, kind='stable')
+			order[split_positions] = order[split_positions][partition]
+			goes_right_sorted = goes_right[split_mask][partition]
+			left_counts = np.bincount(segments[split_mask], weights=~goes_right[split_mask],
+									  minlength=len(candidates)).astype(np.int64)
+
+		branches = np.flatnonzero(is_branch)
+		leaves = np.flatnonzero(~is_branch)
+		branch_indices = node_count + np.arange(len(branches))
+		node_count += len(branches)
+
+		# Link every node to its parent
+		for nodes_of_kind, contents, indices in (
+				(leaves, counts[leaves], starts[leaves]),
+				(branches, np.full(len(branches), BRANCH_CONTENT), branch_indices)):
+			has_parent = parents[nodes_of_kind] != -1
+			parent_rows = parents[nodes_of_kind][has_parent]
+			columns = 2 + sides[nodes_of_kind][has_parent] * 2
+			node_ints[parent_rows, columns] = contents[has_parent]
+			node_ints[parent_rows, columns + 1] = indices[has_parent]
+
+		if len(branches) == 0:
+			break
+
+		# In the tree the root is its own parent
+		node_ints[branch_indices, 0] = np.maximum(parents[branches], 0)
+		node_ints[branch_indices, 1] = axes[branches]
+
+		branch_left_counts = left_counts[np.searchsorted(candidates, branches)]
+		middles = starts[branches] + branch_left_counts
+
+		# Extents: maximum of the left triangles and minimum of the right triangles along the split axis
+		branch_axes = np.repeat(axes[branches], counts[branches])
+		split_tris = order[split_positions]
+		left_mask = ~goes_right_sorted
+		child_ids = np.repeat(np.arange(len(branches)), counts[branches])
+		left_max = np.full(len(branches), -np.inf)
+		right_min = np.full(len(branches), np.inf)
+		np.maximum.at(left_max, child_ids[left_mask], tri_max[split_tris[left_mask], branch_axes[left_mask]])
+		np.minimum.at(right_min, child_ids[~left_mask], tri_min[split_tris[~left_mask], branch_axes[~left_mask]])
+		node_extents[branch_indices, 0] = left_max
+		node_extents[branch_indices, 1] = right_min
+
+		# The children of the split nodes form the next level, left before right
+		starts = np.column_stack((starts[branches], middles)).ravel()
+		ends = np.column_stack((middles, ends[branches])).ravel()
+		parents = np.repeat(branch_indices, 2)
+		sides = np.tile([0, 1], len(branches))
+		depth += 1
+
+	nodes = [
+		tuple(ints) + tuple(extents)
+		for ints, extents in zip(node_ints[:node_count].tolist(), node_extents[:node_count].tolist())
+	]
+	return order, nodes
@@ -6,16 +6,20 @@ def error_no_material(obj):
 	return f"Mesh {obj.name} has no material."
 
 
-def error_vertex_bone_limit(obj):
-	return f"There are vertices with more than 4 bones assigned in mesh {obj.name}."
+def error_vertex_bone_limit(obj, vertex_count=None):
+	if vertex_count is None:
+		return f"There are vertices with more than 4 bones assigned in mesh {obj.name}."
+	return f"There are {vertex_count} vertices with more than 4 bones assigned in mesh {obj.name}."
 
 
 def error_too_many_bones(obj):
 	return f"Armature {obj.name} has more than 86 bones, which is the maximum a mesh can have."
 
 
-def error_not_normalized(obj):
-	return f"Mesh {obj.name} weights are not normalized."
+def error_not_normalized(obj, vertex_count=None):
+	if vertex_count is None:
+		return f"Mesh {obj.name} weights are not normalized."
+	return f"Mesh {obj.name} weights are not normalized in {vertex_count} vertices."
 
 
 def error_bone_weight_limit(mesh, bone_name):
@@ -89,8 +93,10 @@ def error_action_but_no_object(action):
 	return f"Shape key action {action.name} is not assigned to any object and will not be exported."
 
 
-def error_no_bone_for_vertex_group(v_group):
-	return f"There is a vertex group called {v_group.name}, but no bone exists with that name."
+def error_no_bone_for_vertex_group(v_group, vertex_count=None):
+	if vertex_count is None:
+		return f"There is a vertex group called {v_group.name}, but no bone exists with that name."
+	return f"There is a vertex group called {v_group.name}, used by {vertex_count} vertices, but no bone exists with that name."
 
 
 def error_action_with_missing_shapes(action, shape_name):
@@ -0,0 +1,20 @@
+"""
+Loads the add-on folder as the 'sporemodder' package without executing its __init__.py, so that the modules
+can be tested outside Blender. Tests of modules that use Blender are skipped unless the 'bpy' module
+(for example, from 'pip install bpy') is available. Run them with:
+
+	python -m pytest tests
+
+The pytest.ini in this folder keeps pytest from importing the add-on's __init__.py as a test package.
+"""
+
+import os
+import sys
+import types
+
+PACKAGE_NAME = "sporemodder"
+
+if PACKAGE_NAME not in sys.modules:
+	_package = types.ModuleType(PACKAGE_NAME)
+	_package.__path__ = [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+	sys.modules[PACKAGE_NAME] = _package
@@ -0,0 +1,24 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("bpy")
+from mathutils import Euler, Matrix, Vector
+from sporemodder import anim_exporter
+
+
+def test_secondary_basis_uses_secondary_y_axis():
+	# The matrix of this rotation is not symmetric, so multiplying the Y axis on the wrong side gives another vector
+	rotation = Euler((0.3, 0.5, 0.7)).to_matrix()
+	assert rotation != rotation.transposed()
+	secondary_matrix = Matrix.Translation((1.0, 0.0, 0.0)) @ rotation.to_4x4()
+	secondary_y = rotation @ Vector((0.0, 1.0, 0.0))
+
+	bone = SimpleNamespace(bone=SimpleNamespace(head_local=Vector((0.0, 0.0, 0.0))))
+	channel = SimpleNamespace(relative_pos=False, ground_relative=False)
+	bone_matrix = Matrix.Translation(secondary_y * 2.0)
+
+	pos = anim_exporter.get_position(Matrix.Identity(4), channel, bone, bone_matrix, object(), secondary_matrix)
+
+	# A bone moved along the Y axis of the secondary bone only has a Y coordinate in the secondary basis
+	assert (pos - Vector((0.0, 2.0, 0.0))).length < 1e-5
@@ -0,0 +1,42 @@
+import os
+import sys
+
+import pytest
+
+from sporemodder import batch_export
+
+
+def test_missing_blender(tmp_path):
+	job = batch_export.run_job(str(tmp_path / "missing" / "blender"), "model.blend", [], "sporemodder", None)
+
+	assert job['return_code'] is None
+	assert job['exports'] == []
+	assert job['error'].startswith("FileNotFoundError")
+
+
+@pytest.mark.skipif(os.name == 'nt', reason="The fake Blender is a script with a shebang")
+def test_truncated_results(tmp_path):
+	# A fake Blender that writes an incomplete results file
+	blender_path = tmp_path / "blender"
+	blender_path.write_text(
+		f"#!{sys.executable}\n"
+		"import sys\n"
+		"with open(sys.argv[sys.argv.index('--result') + 1], 'w') as file:\n"
+		"\tfile.write('[{\"status\": ')\n"
+	)
+	blender_path.chmod(0o755)
+
+	job = batch_export.run_job(str(blender_path), "model.blend", [], "sporemodder", None)
+
+	assert job['return_code'] == 0
+	assert job['exports'] == []
+	assert job['error'].startswith("JSONDecodeError")
+
+
+def test_failed_job_does_not_stop_batch(tmp_path):
+	summary = batch_export.run_batch(["a.blend", "b.blend"], str(tmp_path / "missing" / "blender"),
+									 addon="sporemodder", max_workers=2)
+
+	assert summary['files'] == 2
+	assert summary['failed'] == 2
+	assert all(job['error'] is not None for job in summary['jobs'])
@@ -0,0 +1,141 @@
+import io
+
+import pytest
+
+from sporemodder import file_io
+from sporemodder.file_io import ArrayFileWriter, FileRange, write_alignment
+
+
+@pytest.fixture
+def source_path(tmp_path):
+	path = tmp_path / "source.bin"
+	path.write_bytes(bytes(range(256)) * 16)
+	return str(path)
+
+
+def read_range(path, offset, size):
+	with open(path, 'rb') as file:
+		file.seek(offset)
+		return file.read(size)
+
+
+def create_writer(source_path):
+	"""
+	Writes like RenderWare4.write: a header, two file ranges with data and alignment between them,
+	and then patches the header. :returns: A tuple (writer, expected bytes).
+	"""
+	writer = ArrayFileWriter(capacity=4)
+	writer.write_int(0)
+	writer.write_int(0)
+
+	first_position = writer.tell()
+	writer.write_file_range(FileRange(source_path, 10, 33))
+	write_alignment(writer, 16)
+	writer.write(b'middle')
+	second_position = writer.tell()
+	writer.write_file_range(FileRange(source_path, 1000, 100))
+	writer.write(b'end')
+
+	writer.seek(0)
+	writer.write_int(first_position)
+	writer.write_int(second_position)
+
+	expected = (first_position.to_bytes(4, 'little') + second_position.to_bytes(4, 'little') +
+				read_range(source_path, 10, 33) + bytes(7) + b'middle' + read_range(source_path, 1000, 100) + b'end')
+	return writer, expected
+
+
+def test_positions(source_path):
+	writer, expected = create_writer(source_path)
+
+	assert len(writer) == len(expected)
+	assert writer.tell() == 8
+	writer.seek(len(writer))
+	assert writer.tell() == len(expected)
+
+	# After the first range, the alignment padding and the data between both ranges
+	writer.seek(8 + 33)
+	assert writer.tell() == 8 + 33
+	writer.write(b'\xff')
+	expected = expected[:8 + 33] + b'\xff' + expected[8 + 33 + 1:]
+
+	stream = io.BytesIO()
+	writer.write_to(stream)
+	assert stream.getvalue() == expected
+
+
+def test_seek_into_file_range(source_path):
+	writer, expected = create_writer(source_path)
+
+	with pytest.raises(ValueError):
+		writer.seek(8)
+	with pytest.raises(ValueError):
+		writer.seek(8 + 20)
+	with pytest.raises(ValueError):
+		writer.seek(len(expected) - 3 - 1)
+
+	# Writing past the end of the data before a file range would overwrite the data after it
+	writer.seek(4)
+	with pytest.raises(ValueError):
+		writer.write(bytes(8))
+
+
+def test_file_range_only_at_end(source_path):
+	writer, expected = create_writer(source_path)
+
+	writer.seek(0)
+	with pytest.raises(ValueError):
+		writer.write_file_range(FileRange(source_path, 0, 4))
+
+
+def test_write_to_file(source_path, tmp_path, monkeypatch):
+	copied_sizes = []
+	copy_with_system_calls = file_io._copy_with_system_calls
+
+	def record_copy(src_fd, dst_fd, offset, size):
+		copied_sizes.append(size)
+		return copy_with_system_calls(src_fd, dst_fd, offset, size)
+
+	monkeypatch.setattr(file_io, '_copy_with_system_calls', record_copy)
+	writer, expected = create_writer(source_path)
+
+	output_path = tmp_path / "output.bin"
+	with open(output_path, 'wb') as file:
+		file.write(b'prefix')
+		writer.write_to(file)
+		file.write(b'suffix')
+
+	assert copied_sizes == [33, 100]
+	assert output_path.read_bytes() == b'prefix' + expected + b'suffix'
+
+
+def test_write_to_stream_in_chunks(source_path, monkeypatch):
+	monkeypatch.setattr(file_io, 'COPY_CHUNK_SIZE', 7)
+	writer, expected = create_writer(source_path)
+
+	stream = io.BytesIO()
+	writer.write_to(stream)
+	assert stream.getvalue() == expected
+
+
+def test_buffer_with_file_ranges(source_path):
+	writer, expected = create_writer(source_path)
+	with pytest.raises(ValueError):
+		writer.buffer
+
+	writer = ArrayFileWriter()
+	writer.write(b'data')
+	writer.write_file_range(FileRange(source_path, 0, 0))
+	assert bytes(writer.buffer) == b'data'
+
+
+def test_write_to_checks_ranges_first(source_path):
+	writer, expected = create_writer(source_path)
+	# The second range no longer fits in the file
+	with open(source_path, 'r+b') as file:
+		file.truncate(1050)
+
+	stream = io.BytesIO()
+	with pytest.raises(IOError):
+		writer.write_to(stream)
+	assert stream.getvalue() == b''
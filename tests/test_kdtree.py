@@ -0,0 +1,100 @@
+import struct
+
+import numpy as np
+import pytest
+
+pytest.importorskip("mathutils")
+from sporemodder import rw4_base, rw4_kdtree
+from sporemodder.file_io import ArrayFileReader, ArrayFileWriter
+
+
+def create_mesh(rng, triangle_count=500):
+	vertices = np.zeros((triangle_count * 3, 4), dtype=np.float32)
+	centers = rng.random((triangle_count, 3)) * 10.0
+	vertices[:, :3] = np.repeat(centers, 3, axis=0) + rng.random((triangle_count * 3, 3))
+	triangles = np.zeros((triangle_count, 4), dtype=np.int32)
+	triangles[:, :3] = np.arange(triangle_count * 3).reshape(-1, 3)
+	return vertices, triangles
+
+
+def create_kdtree(vertices, triangles, triangle_unknowns):
+	render_ware = rw4_base.RenderWare4()
+	kdtree = rw4_base.TriangleKDTreeProcedural(render_ware)
+	bound_box = [vertices[:, :3].min(axis=0).tolist(), vertices[:, :3].max(axis=0).tolist()]
+	kdtree.bound_box = rw4_base.BoundingBox(render_ware, bound_box=bound_box)
+	kdtree.bound_box_2 = kdtree.bound_box
+	order, kdtree.unknown_data = rw4_kdtree.build_kdtree(vertices, triangles)
+	kdtree.vertices = vertices
+	kdtree.triangles = triangles[order]
+	kdtree.triangle_unknowns = triangle_unknowns[order]
+	return kdtree
+
+
+def collect_leaves(nodes, node_index=0):
+	"""
+	:returns: A list of (first triangle, triangle count, [(axis, side, extent) of every ancestor]) for every leaf.
+	"""
+	parent, axis, left_content, left_index, right_content, right_index, left_max, right_min = nodes[node_index]
+	leaves = []
+	for side, content, index, extent in ((0, left_content, left_index, left_max), (1, right_content, right_index, right_min)):
+		if content == rw4_kdtree.BRANCH_CONTENT:
+			assert nodes[index][0] == node_index
+			children = collect_leaves(nodes, index)
+		else:
+			children = [(index, content, [])]
+		leaves.extend((first, count, [(axis, side, extent)] + path) for first, count, path in children)
+	return leaves
+
+
+def test_round_trip():
+	rng = np.random.default_rng(0)
+	vertices, triangles = create_mesh(rng)
+	triangle_unknowns = rng.integers(0, 16, len(triangles)).astype(np.uint8)
+	kdtree = create_kdtree(vertices, triangles, triangle_unknowns)
+
+	stream = ArrayFileWriter()
+	kdtree.write(stream)
+	data = bytes(stream.buffer)
+
+	read_kdtree = rw4_base.TriangleKDTreeProcedural(rw4_base.RenderWare4())
+	read_kdtree.read(ArrayFileReader(data))
+
+	assert np.array_equal(read_kdtree.vertices, kdtree.vertices)
+	assert np.array_equal(read_kdtree.triangles, kdtree.triangles)
+	assert np.array_equal(read_kdtree.triangle_unknowns, kdtree.triangle_unknowns)
+	assert read_kdtree.bound_box_2.bound_box == kdtree.bound_box_2.bound_box
+	assert len(read_kdtree.unknown_data) == len(kdtree.unknown_data) > 0
+	for read_node, node in zip(read_kdtree.unknown_data, kdtree.unknown_data):
+		assert read_node[:6] == node[:6]
+		assert np.allclose(read_node[6:], node[6:])
+
+	# The header of the nodes points 8 * 4 bytes before the vertices, as in the files of the game
+	p_vertices, p4 = struct.unpack_from('<iI', data, 0x38)
+	assert struct.unpack_from('<iii', data, p4) == (p_vertices - 8 * 4, len(kdtree.unknown_data), len(triangles))
+
+
+def test_nodes_cover_all_triangles():
+	rng = np.random.default_rng(1)
+	vertices, triangles = create_mesh(rng)
+	kdtree = create_kdtree(vertices, triangles, np.zeros(len(triangles), dtype=np.uint8))
+
+	leaves = collect_leaves(kdtree.unknown_data)
+	covered = np.zeros(len(triangles), dtype=int)
+	for first, count, path in leaves:
+		covered[first:first + count] += 1
+		corners = vertices[kdtree.triangles[first:first + count, :3], :3]
+		# The triangles of every leaf are inside the extents of all its ancestors
+		for axis, side, extent in path:
+			if side == 0:
+				assert corners[..., axis].max() <= extent + 1e-4
+			else:
+				assert corners[..., axis].min() >= extent - 1e-4
+	assert np.all(covered == 1)
+
+
+def test_single_leaf():
+	rng = np.random.default_rng(2)
+	vertices, triangles = create_mesh(rng, triangle_count=1)
+	order, nodes = rw4_kdtree.build_kdtree(vertices, triangles)
+	assert nodes == []
+	assert order.tolist() == [0]
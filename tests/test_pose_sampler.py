@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("bpy")
+from mathutils import Matrix, Vector
+from sporemodder import pose_sampler
+
+
+class FCurve:
+	def __init__(self, data_path, array_index, value):
+		self.data_path = data_path
+		self.array_index = array_index
+		self.value = value
+		self.mute = False
+		self.is_valid = True
+
+	def evaluate(self, frame):
+		return self.value * frame
+
+
+class BoneCollection(list):
+	def __getitem__(self, key):
+		if isinstance(key, str):
+			return next(bone for bone in self if bone.name == key)
+		return super().__getitem__(key)
+
+
+def create_pose_bone(name, matrix_local, parent=None, use_connect=False):
+	bone = SimpleNamespace(
+		matrix_local=matrix_local, parent=parent.bone if parent is not None else None, use_connect=use_connect,
+		inherit_scale='FULL', use_inherit_rotation=True, use_local_location=True, use_relative_parent=False)
+	pose_bone = SimpleNamespace(
+		name=name, bone=bone, parent=parent, children=[], constraints=[], rotation_mode='QUATERNION',
+		location=Vector((0.0, 0.0, 0.0)), rotation_quaternion=(1.0, 0.0, 0.0, 0.0), scale=Vector((1.0, 1.0, 1.0)),
+		path_from_id=lambda prop: f'pose.bones["{name}"].{prop}')
+	if parent is not None:
+		parent.children.append(pose_bone)
+	return pose_bone
+
+
+def create_armature(use_connect, animation_data=None):
+	root = create_pose_bone("root", Matrix.Identity(4))
+	child = create_pose_bone("child", Matrix.Translation((0.0, 1.0, 0.0)), root, use_connect)
+	armature_object = SimpleNamespace(
+		animation_data=animation_data, data=SimpleNamespace(animation_data=None),
+		pose=SimpleNamespace(bones=BoneCollection([root, child])))
+	action = SimpleNamespace(fcurves=[FCurve('pose.bones["child"].location', 0, 1.0)])
+	return armature_object, action
+
+
+@pytest.mark.parametrize('use_connect', [False, True])
+def test_connected_bones_ignore_location(use_connect):
+	armature_object, action = create_armature(use_connect)
+	sampler = pose_sampler.PoseSampler(armature_object, action)
+	assert sampler.is_supported
+
+	matrices = sampler.evaluate(2.0)
+	expected_x = 0.0 if use_connect else 2.0
+	assert (matrices["child"].to_translation() - Vector((expected_x, 1.0, 0.0))).length < 1e-6
+
+
+def test_animation_data_without_blending():
+	# Before Blender 2.91, there is no action_influence or action_blend_type
+	animation_data = SimpleNamespace(drivers=[], use_nla=False, nla_tracks=[])
+	armature_object, action = create_armature(False, animation_data)
+	assert pose_sampler.PoseSampler(armature_object, action).is_supported
+
+	animation_data.action_influence = 0.5
+	animation_data.action_blend_type = 'REPLACE'
+	assert not pose_sampler.PoseSampler(armature_object, action).is_supported
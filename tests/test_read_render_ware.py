@@ -0,0 +1,111 @@
+import mmap
+
+import numpy as np
+import pytest
+
+pytest.importorskip("mathutils")
+from sporemodder import rw4_base, rw4_enums
+from sporemodder.file_io import ArrayFileWriter
+
+
+def create_model():
+	render_ware = rw4_base.RenderWare4()
+	render_ware.header.rw_type_code = rw4_enums.RW_MODEL
+
+	index_data = np.arange(12, dtype='<u2')
+	index_buffer = rw4_base.IndexBuffer(render_ware, primitive_count=len(index_data),
+										index_data=rw4_base.BaseResource(render_ware, data=index_data.tobytes()))
+	texture_data = rw4_base.BaseResource(render_ware, data=bytes(range(256)) * 4)
+
+	kdtree = rw4_base.TriangleKDTreeProcedural(render_ware)
+	kdtree.bound_box = rw4_base.BoundingBox(render_ware, bound_box=[[0.0, 0.0, 0.0], [1.0, 1.0, 0.0]])
+	kdtree.bound_box_2 = kdtree.bound_box
+	kdtree.vertices = np.array([[0, 0, 0, 0], [1, 0, 0, 0], [0, 1, 0, 0]], dtype=np.float32)
+	kdtree.triangles = np.array([[0, 1, 2, 0]], dtype=np.int32)
+	kdtree.triangle_unknowns = np.array([1], dtype=np.uint8)
+
+	for obj in (index_buffer, index_buffer.index_data, texture_data, kdtree.bound_box, kdtree):
+		render_ware.add_object(obj)
+
+	stream = ArrayFileWriter()
+	render_ware.write(stream)
+	return bytes(stream.buffer), index_data, texture_data.data
+
+
+class RecordingMmap(mmap.mmap):
+	instances = []
+
+	def __init__(self, *args, **kwargs):
+		super().__init__()
+		RecordingMmap.instances.append(self)
+
+
+@pytest.fixture
+def model_path(tmp_path):
+	data, index_data, texture_data = create_model()
+	path = tmp_path / "model.rw4"
+	path.write_bytes(data)
+	return str(path), index_data, texture_data
+
+
+@pytest.fixture
+def recorded_mappings(monkeypatch):
+	RecordingMmap.instances = []
+	monkeypatch.setattr(rw4_base.mmap, 'mmap', RecordingMmap)
+	monkeypatch.setattr(rw4_base.os, 'name', 'posix')
+	return RecordingMmap.instances
+
+
+def test_mapping_is_closed(model_path, recorded_mappings):
+	path, index_data, texture_data = model_path
+	with open(path, 'rb') as file:
+		with rw4_base.open_render_ware(file) as render_ware:
+			index_buffer = render_ware.get_objects(rw4_base.IndexBuffer.type_code)[0]
+			assert np.array_equal(index_buffer.process_data(None), index_data)
+			assert not recorded_mappings[0].closed
+
+	assert len(recorded_mappings) == 1
+	assert recorded_mappings[0].closed
+
+
+def test_data_outlives_mapping(model_path, recorded_mappings):
+	path, index_data, texture_data = model_path
+	with open(path, 'rb') as file:
+		render_ware = rw4_base.read_render_ware(file)
+
+	assert recorded_mappings[0].closed
+	index_buffer = render_ware.get_objects(rw4_base.IndexBuffer.type_code)[0]
+	kdtree = render_ware.get_objects(rw4_base.TriangleKDTreeProcedural.type_code)[0]
+	resources = render_ware.get_objects(rw4_base.BaseResource.type_code)
+	# The data that was not used is read from the file when needed
+	assert bytes(resources[1].data) == texture_data
+	assert np.array_equal(index_buffer.process_data(None), index_data)
+	assert np.array_equal(kdtree.triangles, [[0, 1, 2, 0]])
+	assert kdtree.vertices.base is None
+
+
+def test_data_outlives_file_without_path(model_path, recorded_mappings):
+	path, index_data, texture_data = model_path
+	with open(path, 'rb') as file, open(file.fileno(), 'rb', closefd=False) as unnamed_file:
+		render_ware = rw4_base.read_render_ware(unnamed_file)
+
+	resources = render_ware.get_objects(rw4_base.BaseResource.type_code)
+	assert bytes(resources[1].data) == texture_data
+
+
+def test_read_without_mapping(model_path, monkeypatch):
+	path, index_data, texture_data = model_path
+	monkeypatch.setattr(rw4_base.os, 'name', 'nt')
+	with open(path, 'rb') as file:
+		render_ware = rw4_base.read_render_ware(file)
+
+	resources = render_ware.get_objects(rw4_base.BaseResource.type_code)
+	assert bytes(resources[1].data) == texture_data
+
+
+def test_empty_file(tmp_path):
+	path = tmp_path / "empty.rw4"
+	path.write_bytes(b'')
+	with open(path, 'rb') as file:
+		with pytest.raises(rw4_base.ModelError):
+			rw4_base.read_render_ware(file)
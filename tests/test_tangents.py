@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("bpy")
+from mathutils import Vector
+from sporemodder import rw4_exporter
+
+
+def reference_calculate_tangents(vertices, faces):
+	"""The per-face implementation that compute_tangents() replaced, kept to check that both give the same result."""
+	positions = [Vector(v) for v in vertices["position"]]
+	texcoord0 = vertices["texcoord0"]
+	normals = [Vector(v) for v in vertices["normal"]]
+	vertex_count = len(positions)
+	tangents = [Vector((0.0, 0.0, 0.0)) for _ in range(vertex_count)]
+	bitangents = [Vector((0.0, 0.0, 0.0)) for _ in range(vertex_count)]
+
+	for f, face in enumerate(faces):
+		v0_co = positions[face[0]]
+		v1_co = positions[face[1]]
+		v2_co = positions[face[2]]
+
+		v0_uv = texcoord0[face[0]]
+		v1_uv = texcoord0[face[1]]
+		v2_uv = texcoord0[face[2]]
+
+		dco1 = v1_co - v0_co
+		dco2 = v2_co - v0_co
+		duv1 = Vector((v1_uv[0], v1_uv[1])) - Vector((v0_uv[0], v0_uv[1]))
+		duv2 = Vector((v2_uv[0], v2_uv[1])) - Vector((v0_uv[0], v0_uv[1]))
+		tangent = dco2 * duv1.y - dco1 * duv2.y
+		bitangent = dco2 * duv1.x - dco1 * duv2.x
+		if dco2.cross(dco1).dot(bitangent.cross(tangent)) < 0:
+			tangent.negate()
+			bitangent.negate()
+		tangents[face[0]] += tangent
+		tangents[face[1]] += tangent
+		tangents[face[2]] += tangent
+		bitangents[face[0]] += bitangent
+		bitangents[face[1]] += bitangent
+		bitangents[face[2]] += bitangent
+
+	for i in range(len(tangents)):
+		tangents[i] = (tangents[i] - normals[i] * tangents[i].dot(normals[i])).normalized()
+
+	return np.array([tuple(t) for t in tangents], dtype=np.float64)
+
+
+def create_grid(side, rng):
+	x, y = np.meshgrid(np.linspace(-1.0, 1.0, side), np.linspace(-1.0, 1.0, side))
+	z = 0.2 * rng.standard_normal(x.shape)
+	positions = np.column_stack((x.ravel(), y.ravel(), z.ravel()))
+	texcoords = np.column_stack(((x.ravel() + 1.0) * 0.5, (y.ravel() + 1.0) * 0.5))
+
+	corners = (np.arange(side - 1)[:, None] * side + np.arange(side - 1)[None, :]).ravel()
+	faces = np.concatenate((
+		np.column_stack((corners, corners + 1, corners + side)),
+		np.column_stack((corners + 1, corners + side + 1, corners + side)),
+	))
+	faces = np.column_stack((faces, np.zeros(len(faces), dtype=faces.dtype)))
+
+	normals = rng.standard_normal(positions.shape) * 0.1 + (0.0, 0.0, 1.0)
+	normals /= np.linalg.norm(normals, axis=1)[:, None]
+	return positions, texcoords, normals, faces
+
+
+def check_parity(positions, texcoords, normals, faces):
+	# The reference uses the single precision vectors of mathutils
+	positions = positions.astype(np.float32)
+	texcoords = texcoords.astype(np.float32)
+	normals = normals.astype(np.float32)
+
+	vertices = {'position': positions, 'texcoord0': texcoords, 'normal': normals}
+	expected = reference_calculate_tangents(vertices, faces)
+	rw4_exporter.calculate_tangents(vertices, faces)
+	result = np.array(vertices['tangent'])
+
+	assert result.shape == expected.shape
+	np.testing.assert_allclose(result, expected, atol=1e-5)
+
+
+def test_grid():
+	check_parity(*create_grid(8, np.random.default_rng(0)))
+
+
+def test_random_uvs():
+	rng = np.random.default_rng(1)
+	positions, _, normals, faces = create_grid(6, rng)
+	check_parity(positions, rng.random((len(positions), 2)), normals, faces)
+
+
+def test_mirrored_uvs():
+	positions, texcoords, normals, faces = create_grid(8, np.random.default_rng(2))
+	# Mirror the U coordinate of the right half, as in symmetric models that share the UV space
+	right = positions[:, 0] > 0.0
+	texcoords[right, 0] = 1.0 - texcoords[right, 0]
+	check_parity(positions, texcoords, normals, faces)
+
+
+def test_degenerate_uvs():
+	positions, texcoords, normals, faces = create_grid(6, np.random.default_rng(3))
+	# All the faces around the first vertices have the same UV in every corner
+	used = np.unique(faces[:12, :3])
+	texcoords[:] = 0.5
+	texcoords[np.setdiff1d(np.arange(len(positions)), used)] += np.random.default_rng(4).random((len(positions) - len(used), 2))
+	check_parity(positions, texcoords, normals, faces)
+
+	vertices = {'position': positions, 'texcoord0': np.full_like(texcoords, 0.5), 'normal': normals}
+	rw4_exporter.calculate_tangents(vertices, faces)
+	assert np.all(np.array(vertices['tangent']) == 0.0)
@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("bpy")
+from sporemodder import rw4_importer
+
+
+class VertexGroup:
+	def __init__(self):
+		self.calls = []
+		self.weights = {}
+
+	def add(self, indices, weight, mode):
+		assert mode == 'REPLACE'
+		self.calls.append(len(indices))
+		for index in indices:
+			self.weights[index] = weight
+
+
+def assign(blend_indices, blend_weights, weight_divisor=1.0, bone_count=4):
+	b_object = SimpleNamespace(vertex_groups=[VertexGroup() for _ in range(bone_count)])
+	rw4_importer.RW4Importer.assign_vertex_groups(b_object, blend_indices, blend_weights, weight_divisor)
+	return b_object.vertex_groups
+
+
+def test_float_weights_are_quantized():
+	rng = np.random.default_rng(0)
+	vertex_count = 1000
+	# Weights that are almost equal, like the ones exported from float32 data
+	levels = rng.integers(1, 6, vertex_count)
+	weights = (levels / 5.0 + rng.normal(0.0, 1e-7, vertex_count)).astype(np.float32)
+	blend_indices = np.zeros((vertex_count, 1), dtype=np.int64)
+
+	group = assign(blend_indices, weights[:, None])[0]
+
+	assert len(group.calls) == 5
+	assert sorted(group.weights) == list(range(vertex_count))
+	for index, level in enumerate(levels):
+		assert abs(group.weights[index] - weights[index]) <= 0.5 / rw4_importer.WEIGHT_LEVELS
+		assert abs(group.weights[index] - level / 5.0) < 1e-5
+
+
+def test_ubyte_weights_are_exact():
+	blend_indices = np.array([[0, 3], [0, 6], [3, 6]], dtype=np.uint8)
+	blend_weights = np.array([[255, 0], [128, 127], [1, 254]], dtype=np.uint8)
+
+	groups = assign(blend_indices, blend_weights, 255.0)
+
+	assert groups[0].weights == {0: 1.0, 1: 128 / 255}
+	assert groups[1].weights == {2: 1 / 255}
+	assert groups[2].weights == {1: 127 / 255, 2: 254 / 255}
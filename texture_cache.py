@@ -0,0 +1,150 @@
+"""
+Keeps the DDS textures used by the exporter in memory between exports. Materials often share the same large
+textures across many models, so exporting them again does not need to read and parse those files again.
+
+Textures are identified by their absolute path, modification time and size, so a texture that is modified
+on disk is read again. The exporter copies the pixel data directly from the file when writing the model
+(see CachedTexture.file_range); if the data itself is needed, it is a memory-mapped view of the file, so the
+operating system can share it between Blender processes.
+"""
+
+import mmap
+import os
+from collections import OrderedDict
+from .file_io import FileReader, FileRange
+from . import rw4_base
+
+# The size of the DDS header, including the magic
+DDS_HEADER_SIZE = 128
+
+
+class CachedTexture:
+	def __init__(self, key, dds_texture, use_mmap=True):
+		"""
+		:param key: The (path, mtime_ns, size) tuple that identifies the file.
+		:param dds_texture: The DDSTexture with the header of the file; its data is not read.
+		:param use_mmap: If False, the pixel data is read into memory instead of memory-mapped.
+		"""
+		self.key = key
+		self.dds_texture = dds_texture
+		self.use_mmap = use_mmap
+		self._data = None
+
+	@property
+	def size(self):
+		return max(0, self.key[2] - DDS_HEADER_SIZE)
+
+	@property
+	def file_range(self):
+		"""The FileRange of the pixel data, which can be copied from the file without loading it."""
+		return FileRange(self.key[0], DDS_HEADER_SIZE, self.size)
+
+	@property
+	def data(self):
+		"""A read-only buffer with the pixel data, which is loaded the first time it's used."""
+		if self._data is None:
+			if TextureCache.get_key(self.key[0]) != self.key:
+				raise IOError(f"'{self.key[0]}' has been modified")
+
+			with open(self.key[0], 'rb') as file:
+				if self.size == 0:
+					self._data = b''
+				elif self.use_mmap:
+					# The mapping is closed when the last view of it is released, even if the texture is evicted
+					# while an export still uses it
+					mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+					self._data = memoryview(mapped)[DDS_HEADER_SIZE:]
+				else:
+					file.seek(DDS_HEADER_SIZE)
+					self._data = file.read()
+		return self._data
+
+	def apply(self, raster):
+		"""Sets the format and dimensions of a Raster from this texture."""
+		raster.from_dds(self.dds_texture)
+
+
+class TextureCache:
+	def __init__(self, max_bytes=1024 * 1024 * 1024, max_entries=256, use_mmap=None):
+		"""
+		:param max_bytes: When the pixel data of all cached textures is bigger than this, the least recently used
+		textures are removed. Only the data that has been loaded takes memory.
+		:param max_entries: The maximum number of cached textures.
+		:param use_mmap: If False, the pixel data is read into memory instead of memory-mapped. By default it is
+		not used on Windows, where the files that are mapped cannot be overwritten, for example by an image editor.
+		"""
+		self.max_bytes = max_bytes
+		self.max_entries = max_entries
+		self.use_mmap = os.name != 'nt' if use_mmap is None else use_mmap
+		# Maps the file key to its CachedTexture, from the least to the most recently used
+		self._entries = OrderedDict()
+		# Maps the absolute path to the key of its cached version
+		self._keys = {}
+		self.total_bytes = 0
+		self.hits = 0
+		self.misses = 0
+
+	def __len__(self):
+		return len(self._entries)
+
+	@staticmethod
+	def get_key(path):
+		path = os.path.abspath(path)
+		stat = os.stat(path)
+		return path, stat.st_mtime_ns, stat.st_size
+
+	def get(self, path):
+		"""
+		Returns the texture of a DDS file, reading it only if it is not cached or has changed since.
+		:param path: The path to the .dds file.
+		:returns: The CachedTexture.
+		"""
+		key = self.get_key(path)
+		entry = self._entries.get(key)
+		if entry is not None:
+			self._entries.move_to_end(key)
+			self.hits += 1
+			return entry
+
+		self.misses += 1
+		entry = self._read_texture(key)
+
+		# An older version of the same file will never be used again
+		old_key = self._keys.get(key[0])
+		if old_key is not None:
+			self._remove(old_key)
+
+		self._entries[key] = entry
+		self._keys[key[0]] = key
+		self.total_bytes += entry.size
+		self._evict()
+		return entry
+
+	def _read_texture(self, key):
+		with open(key[0], 'rb') as file:
+			dds_texture = rw4_base.DDSTexture()
+			dds_texture.read(FileReader(file), read_data=False)
+			# Check that the format is supported before keeping it
+			rw4_base.Raster(None).from_dds(dds_texture)
+
+		return CachedTexture(key, dds_texture, self.use_mmap)
+
+	def _remove(self, key):
+		entry = self._entries.pop(key)
+		if self._keys.get(key[0]) == key:
+			del self._keys[key[0]]
+		self.total_bytes -= entry.size
+
+	def _evict(self):
+		# The most recent texture is kept even if it is bigger than the limit
+		while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes):
+			self._remove(next(iter(self._entries)))
+
+	def clear(self):
+		self._entries.clear()
+		self._keys.clear()
+		self.total_bytes = 0
+
+
+# Shared by all exports in this Blender session
+texture_cache = TextureCache()